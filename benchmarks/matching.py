@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+"""
+Seeded benchmark and quality suite for the matching algorithms.
+
+Every registered algorithm (random1on1.matching.ALGORITHMS), as well as the MeetingCounts / sample_round path of random1on1.matching.pairing (as
+"pairing.sample_round", with gamma SAMPLE_ROUND_GAMMA), is run against synthetic programs of increasing size. The history of a synthetic program is made of `history_weeks` previous weeks
+of uniformly random perfect matchings between the participants (plus a share of former participants who are no longer in the program), so the
+density of the history grows with the number of weeks. For every (algorithm, participants, history_weeks) cell the suite records:
+
+    - time: wall-clock seconds to construct the algorithm and generate pairs (min / median over the repeats)
+    - peak memory: peak traced Python allocations (tracemalloc) of one extra run
+    - failure rate: share of the repeats that raised NotImplementedError (or any other exception)
+    - quality: repeated pairs (pairs that already met), unmatched participants and the largest group size
+
+Every cell runs in its own process, which is stopped after --timeout seconds; larger sizes of an algorithm that timed out are skipped. Results are
+written as one JSON object per line so two runs (e.g. on two commits) can be compared with --compare.
+
+Usage:
+    python benchmarks/matching.py --output before.jsonl
+    python benchmarks/matching.py --sizes 10 100 1000 --history_weeks 0 10 --algorithms IndexedMatchingAlgorithm
+    python benchmarks/matching.py --compare before.jsonl after.jsonl
+"""
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime
+from queue import Empty
+
+import numpy
+from networkx import connected_components
+from networkx import Graph
+
+# Running the script as `python benchmarks/matching.py` puts benchmarks/ on the path instead of the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random1on1.api.pairings import Pairings
+from random1on1.matching import ALGORITHMS
+from random1on1.matching import load_algorithm
+from random1on1.matching import pairing
+from random1on1.matching.pairing import MeetingCounts
+from random1on1.matching.pairing import sample_round
+
+DEFAULT_SIZES = [10, 100, 1000, 5000, 20000]
+DEFAULT_HISTORY_WEEKS = [0, 10, 50]
+FORMER_PARTICIPANT_SHARE = 0.2
+SAMPLE_ROUND = "pairing.sample_round"
+SAMPLE_ROUND_GAMMA = 0.1
+BENCHMARKS = list(ALGORITHMS) + [SAMPLE_ROUND]
+
+
+class SampleRoundAlgorithm:
+    """ Runs the MeetingCounts / sample_round path of random1on1.matching.pairing behind the interface of the registered algorithms. """
+
+    def __init__(self, participants, previous_pairings_merged, seed=None):
+        pairing.random = numpy.random.default_rng(seed=seed)
+        self.participants = participants
+        participant_index = {
+            participant: index
+            for index, participant in enumerate(participants)
+        }
+        self.meeting_counts = MeetingCounts(len(participants))
+        for person_1, person_2, _ in previous_pairings_merged.edges():
+            if person_1 in participant_index and person_2 in participant_index:
+                self.meeting_counts.record_group([
+                    participant_index[person_1], participant_index[person_2]
+                ])
+
+    def generate_pairs(self, dry_run: bool) -> Pairings:
+        graph = Graph()
+        for group in sample_round(self.meeting_counts.counts,
+                                  numpy.log(SAMPLE_ROUND_GAMMA)):
+            members = [self.participants[index] for index in group]
+            graph.add_edges_from((person_1, person_2)
+                                 for position, person_1 in enumerate(members)
+                                 for person_2 in members[position + 1:])
+        return Pairings(pairing_graph=graph,
+                        date_of_pairing=datetime.now(),
+                        dry_run=dry_run)
+
+
+def synthetic_history(num_participants: int, history_weeks: int,
+                      random: numpy.random.Generator) -> Pairings:
+    """ History of history_weeks random perfect matchings among the participants and FORMER_PARTICIPANT_SHARE as many former participants. """
+    num_people = num_participants + int(num_participants *
+                                        FORMER_PARTICIPANT_SHARE)
+    graph = Graph()
+    for week in range(history_weeks):
+        order = random.permutation(num_people)
+        graph.add_edges_from(
+            zip(order[0:num_people - 1:2].tolist(),
+                order[1:num_people:2].tolist()),
+            meetings=1,
+            last_met=datetime(2022, 1, 1))
+    return Pairings(pairing_graph=graph,
+                    date_of_pairing=datetime.now(),
+                    dry_run=False)
+
+
+def run_once(algorithm_class, participants, history, seed):
+    start = time.perf_counter()
+    algorithm = algorithm_class(participants, history, seed=seed)
+    pairings = algorithm.generate_pairs(dry_run=True)
+    return time.perf_counter() - start, pairings
+
+
+def quality(pairings: Pairings, participants, history: Pairings) -> dict:
+    groups = list(connected_components(pairings.pairing_graph))
+    matched = set().union(*groups) if groups else set()
+    return {
+        "repeat_pairs":
+        sum(1 for person_1, person_2 in pairings.pairing_graph.edges
+            if history.pairing_graph.has_edge(person_1, person_2)),
+        "unmatched":
+        len(set(participants) - matched) +
+        sum(1 for group in groups if len(group) < 2),
+        "max_group_size":
+        max((len(group) for group in groups), default=0),
+    }
+
+
+def benchmark_cell(name, num_participants, history_weeks, repeats, seed):
+    random = numpy.random.default_rng(seed=seed)
+    participants = list(range(num_participants))
+    history = synthetic_history(num_participants, history_weeks, random)
+    algorithm_class = (SampleRoundAlgorithm
+                       if name == SAMPLE_ROUND else load_algorithm(name))
+
+    times, failures, qualities = [], 0, []
+    for repeat in range(repeats):
+        try:
+            elapsed, pairings = run_once(algorithm_class, participants,
+                                         history, seed + repeat)
+        except Exception:
+            failures += 1
+            continue
+        times.append(elapsed)
+        qualities.append(quality(pairings, participants, history))
+
+    tracemalloc.start()
+    try:
+        run_once(algorithm_class, participants, history, seed)
+    except Exception:
+        pass
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "algorithm": name,
+        "participants": num_participants,
+        "history_weeks": history_weeks,
+        "history_edges": history.pairing_graph.number_of_edges(),
+        "repeats": repeats,
+        "seed": seed,
+        "min_seconds": min(times) if times else None,
+        "median_seconds": statistics.median(times) if times else None,
+        "peak_memory_bytes": peak_memory,
+        "failure_rate": failures / repeats,
+        "mean_repeat_pairs":
+        statistics.mean(q["repeat_pairs"] for q in qualities) if qualities else None,
+        "mean_unmatched":
+        statistics.mean(q["unmatched"] for q in qualities) if qualities else None,
+        "max_group_size":
+        max(q["max_group_size"] for q in qualities) if qualities else None,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                                capture_output=True,
+                                text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "machine": platform.machine(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def cell_worker(queue, *args):
+    queue.put(benchmark_cell(*args))
+
+
+def run_cell(name, num_participants, history_weeks, repeats, seed, timeout):
+    """ Runs one cell in a fresh process so that a slow algorithm can be stopped after timeout seconds. """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=cell_worker,
+                              args=(queue, name, num_participants,
+                                    history_weeks, repeats, seed))
+    process.start()
+    try:
+        result = queue.get(timeout=timeout)
+    except Empty:
+        process.kill()
+        result = {
+            "algorithm": name,
+            "participants": num_participants,
+            "history_weeks": history_weeks,
+            "skipped": f"timed out after {timeout} seconds",
+        }
+    process.join()
+    return result
+
+
+def run(algorithms, sizes, history_weeks, repeats, seed, timeout, output):
+    env = environment()
+    for name in algorithms:
+        timed_out = False
+        for num_participants in sizes:
+            for weeks in history_weeks:
+                if timed_out:
+                    result = {
+                        "algorithm": name,
+                        "participants": num_participants,
+                        "history_weeks": weeks,
+                        "skipped": "a smaller size timed out",
+                    }
+                else:
+                    result = run_cell(name, num_participants, weeks, repeats,
+                                      seed, timeout)
+                    timed_out = "skipped" in result
+                result["environment"] = env
+                print(json.dumps(result), file=output, flush=True)
+
+
+def compare(before_path, after_path):
+    """ Prints the median time, peak memory and failure rate of every cell in both files side by side. """
+
+    def load(path):
+        with open(path, "r") as results_file:
+            return {(r["algorithm"], r["participants"], r["history_weeks"]): r
+                    for r in map(json.loads, results_file)
+                    if "skipped" not in r}
+
+    before, after = load(before_path), load(after_path)
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        speedup = (old["median_seconds"] / new["median_seconds"]
+                   if old["median_seconds"] and new["median_seconds"] else
+                   float("nan"))
+        print(
+            "{:<28} n={:<6} weeks={:<4} time {} -> {} ({:.2f}x)  memory {} -> {}  failures {:.2f} -> {:.2f}"
+            .format(*key, old["median_seconds"], new["median_seconds"],
+                    speedup, old["peak_memory_bytes"],
+                    new["peak_memory_bytes"], old["failure_rate"],
+                    new["failure_rate"]))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark the matching algorithms")
+    parser.add_argument("--algorithms",
+                        nargs="+",
+                        default=BENCHMARKS,
+                        choices=BENCHMARKS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--history_weeks",
+                        nargs="+",
+                        type=int,
+                        default=DEFAULT_HISTORY_WEEKS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=120.0,
+        help="Seconds after which a cell is stopped and larger sizes of that algorithm are skipped")
+    parser.add_argument("--output",
+                        type=str,
+                        help="JSON lines output file (defaults to stdout)")
+    parser.add_argument("--compare",
+                        nargs=2,
+                        metavar=("BEFORE", "AFTER"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.output:
+        with open(args.output, "w") as output:
+            run(args.algorithms, args.sizes, args.history_weeks, args.repeats,
+                args.seed, args.timeout, output)
+    else:
+        run(args.algorithms, args.sizes, args.history_weeks, args.repeats,
+            args.seed, args.timeout, sys.stdout)
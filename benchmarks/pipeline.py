@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark of the bot's pipeline against in-memory guilds (see random1on1.testing.fakes).
+
+For every (members, history_weeks, startup) cell a guild with `members` members, a `participant_share` of whom hold the random1on1 role, and
+`history_weeks` weeks of pairings in its history channel is generated, and a FakeRandom1on1Bot runs the whole program on it: setup, participants,
+history, matching, writing the history, the announcement and the introductions. Every request to the fake guild takes --latency seconds, and the
+introductions are paced by the MessageDispatcher like they are against discord (see --sends_per_second). For every cell the suite records:
+
+    - time: wall-clock seconds of the run (min / median over the repeats), and the seconds and requests of every phase of the last repeat
+    - requests: the number of requests the run sent to the guild
+    - peak memory: peak resident memory of the process before the run (i.e. of the generated guild) and after it
+
+Every cell runs in its own process, which is stopped after --timeout seconds. The matching runs in worker processes like it does in the bot, so
+their memory is not part of the peak memory. Results are written as one JSON object per line so two runs (e.g. on two commits) can be compared with
+--compare.
+
+Usage:
+    python benchmarks/pipeline.py --output before.jsonl
+    python benchmarks/pipeline.py --members 1000 50000 --history_weeks 156 --startup lean --latency 0
+    python benchmarks/pipeline.py --compare before.jsonl after.jsonl
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from queue import Empty
+
+import discord
+
+# Running the script as `python benchmarks/pipeline.py` puts benchmarks/ on the path instead of the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from random1on1.api.config import Random1on1BotConfig
+from random1on1.api.dispatch import DEFAULT_SENDS_PER_SECOND
+from random1on1.api.dispatch import MessageDispatcher
+from random1on1.api.logs import STDOUT_HANDLER_NAME
+from random1on1.api.members import peak_memory_mib
+from random1on1.api.workers import MatchingWorkerPool
+from random1on1.matching import ALGORITHMS
+from random1on1.testing import FakeRandom1on1Bot
+from random1on1.testing import generate_guild
+
+DEFAULT_MEMBERS = [1000, 10000, 50000]
+DEFAULT_HISTORY_WEEKS = [52, 156]
+DEFAULT_PARTICIPANT_SHARE = 0.05
+DEFAULT_LATENCY = 0.05
+STARTUP_MODES = ["default", "lean"]
+
+
+def run_once(num_members, num_participants, history_weeks, lean_startup,
+             algorithm, latency, sends_per_second, seed):
+    config = Random1on1BotConfig(guild_id=1, algorithm=algorithm)
+    guild = generate_guild(num_members=num_members,
+                           num_participants=num_participants,
+                           history_weeks=history_weeks,
+                           config=config,
+                           latency=latency,
+                           seed=seed)
+    fixture_memory = peak_memory_mib()
+    bot = FakeRandom1on1Bot(
+        [guild],
+        config=config,
+        worker_pool=MatchingWorkerPool(),
+        dispatcher=MessageDispatcher(sends_per_second=sends_per_second),
+        lean_startup=lean_startup)
+    # The bot logs every step to stdout, which would end up between the results
+    for handler in logging.getLogger("discord").handlers:
+        if handler.get_name() == STDOUT_HANDLER_NAME:
+            handler.setLevel(logging.WARNING)
+    start = time.perf_counter()
+    asyncio.run(bot.on_ready())
+    elapsed = time.perf_counter() - start
+    failures = [result.error for result in bot.results if not result.succeeded]
+    if failures:
+        raise RuntimeError(failures[0])
+    return elapsed, guild.api.num_requests, fixture_memory, bot.report
+
+
+def benchmark_cell(num_members, history_weeks, startup, participant_share,
+                   algorithm, latency, sends_per_second, repeats, seed):
+    num_participants = max(2, int(num_members * participant_share))
+    times = []
+    for repeat in range(repeats):
+        elapsed, num_requests, fixture_memory, report = run_once(
+            num_members, num_participants, history_weeks, startup == "lean",
+            algorithm, latency, sends_per_second, seed + repeat)
+        times.append(elapsed)
+    return {
+        "members": num_members,
+        "participants": num_participants,
+        "history_weeks": history_weeks,
+        "startup": startup,
+        "algorithm": algorithm,
+        "latency": latency,
+        "sends_per_second": sends_per_second,
+        "repeats": repeats,
+        "seed": seed,
+        "min_seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "requests": num_requests,
+        "fixture_memory_mib": fixture_memory,
+        "peak_memory_mib": peak_memory_mib(),
+        "phases": {
+            phase: {
+                "seconds": metrics.seconds,
+                "api_calls": metrics.api_calls
+            }
+            for phase, metrics in report.runs[0].phases.items()
+        },
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                                capture_output=True,
+                                text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "discord.py": discord.__version__,
+        "machine": platform.machine(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def cell_worker(queue, *args):
+    try:
+        queue.put(benchmark_cell(*args))
+    except Exception as error:
+        queue.put({"skipped": f"failed with {error!r}"})
+
+
+def run_cell(num_members, history_weeks, startup, timeout, *args):
+    """ Runs one cell in a fresh process, so its peak memory is its own and a slow cell can be stopped after timeout seconds. """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=cell_worker,
+                              args=(queue, num_members, history_weeks,
+                                    startup, *args))
+    process.start()
+    try:
+        result = queue.get(timeout=timeout)
+    except Empty:
+        process.kill()
+        result = {"skipped": f"timed out after {timeout} seconds"}
+    process.join()
+    if "skipped" in result:
+        result.update(members=num_members,
+                      history_weeks=history_weeks,
+                      startup=startup)
+    return result
+
+
+def run(members, history_weeks, startup_modes, participant_share, algorithm,
+        latency, sends_per_second, repeats, seed, timeout, output):
+    env = environment()
+    for num_members in members:
+        for weeks in history_weeks:
+            for startup in startup_modes:
+                result = run_cell(num_members, weeks, startup, timeout,
+                                  participant_share, algorithm, latency,
+                                  sends_per_second, repeats, seed)
+                result["environment"] = env
+                print(json.dumps(result), file=output, flush=True)
+
+
+def compare(before_path, after_path):
+    """ Prints the median time, requests and peak memory of every cell in both files side by side. """
+
+    def load(path):
+        with open(path, "r") as results_file:
+            return {(r["members"], r["history_weeks"], r["startup"]): r
+                    for r in map(json.loads, results_file)
+                    if "skipped" not in r}
+
+    before, after = load(before_path), load(after_path)
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        speedup = (old["median_seconds"] / new["median_seconds"]
+                   if new["median_seconds"] else float("nan"))
+        print(
+            "members={:<7} weeks={:<4} {:<8} time {:.2f} -> {:.2f} ({:.2f}x)  requests {} -> {}  memory {} -> {}"
+            .format(*key, old["median_seconds"], new["median_seconds"],
+                    speedup, old["requests"], new["requests"],
+                    old["peak_memory_mib"], new["peak_memory_mib"]))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Benchmark the bot's pipeline against in-memory guilds")
+    parser.add_argument("--members",
+                        nargs="+",
+                        type=int,
+                        default=DEFAULT_MEMBERS)
+    parser.add_argument("--history_weeks",
+                        nargs="+",
+                        type=int,
+                        default=DEFAULT_HISTORY_WEEKS)
+    parser.add_argument("--startup",
+                        nargs="+",
+                        default=STARTUP_MODES,
+                        choices=STARTUP_MODES)
+    parser.add_argument("--participant_share",
+                        type=float,
+                        default=DEFAULT_PARTICIPANT_SHARE,
+                        help="Share of the members who hold the random1on1 role")
+    # The default algorithm of the config does not scale to thousands of participants, see benchmarks/matching.py
+    parser.add_argument("--algorithm",
+                        default="IndexedMatchingAlgorithm",
+                        choices=list(ALGORITHMS))
+    parser.add_argument("--latency",
+                        type=float,
+                        default=DEFAULT_LATENCY,
+                        help="Seconds every request to the guild takes")
+    parser.add_argument(
+        "--sends_per_second",
+        type=float,
+        default=DEFAULT_SENDS_PER_SECOND,
+        help="Pacing of the introductions, raise it to benchmark everything but the pacing")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout",
+                        type=float,
+                        default=900.0,
+                        help="Seconds after which a cell is stopped")
+    parser.add_argument("--output",
+                        type=str,
+                        help="JSON lines output file (defaults to stdout)")
+    parser.add_argument("--compare",
+                        nargs=2,
+                        metavar=("BEFORE", "AFTER"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    options = (args.members, args.history_weeks, args.startup,
+               args.participant_share, args.algorithm, args.latency,
+               args.sends_per_second, args.repeats, args.seed, args.timeout)
+    if args.compare:
+        compare(*args.compare)
+    elif args.output:
+        with open(args.output, "w") as output:
+            run(*options, output)
+    else:
+        run(*options, sys.stdout)
@@ -1,12 +1,16 @@
 from abc import ABC
 from abc import abstractmethod
 from typing import List
+from typing import Union
 
-from discord import Member
 from numpy.random import default_rng
 
+from random1on1.api.history import HistoryEdgeTable
 from random1on1.api.pairings import Pairings
 
+# The merged history handed to the algorithms: anything whose edges() yields (participant, participant, attributes) for every pair that met
+MergedHistory = Union[Pairings, HistoryEdgeTable]
+
 
 class MatchingAlgorithm(ABC):
     """
@@ -20,8 +24,8 @@ class MatchingAlgorithm(ABC):
     @abstractmethod
     def __init__(
         self,
-        participants: List[Member],
-        previous_pairings_merged: Pairings,
+        participants: List[int],
+        previous_pairings_merged: MergedHistory,
         seed=None,
     ):
         # TODO: Add preconditions on participant graph
@@ -0,0 +1,81 @@
+"""
+random1on1.api.announcements
+
+Renders the weekly pairing announcement. A single message holds at most 2000 characters (an embed description 4096), which a guild with a few
+hundred participants exceeds, so the announcement is rendered one pairing line at a time and packed into as many size-limited chunks as it needs.
+Every chunk ends on a line boundary; only a line that is longer than a whole chunk by itself is split. Two layouts are supported:
+
+    - "text": plain messages, the first of which starts with the @everyone header.
+    - "embed": an @everyone message whose embed holds the header as its title, and the pairings in the descriptions of as many embeds as needed.
+"""
+from datetime import datetime
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
+
+from random1on1.api.wire import MAX_MESSAGE_LENGTH
+
+MAX_EMBED_DESCRIPTION_LENGTH = 4096
+ANNOUNCEMENT_LAYOUTS = ["text", "embed"]
+DEFAULT_ANNOUNCEMENT_LAYOUT = "text"
+
+
+def announcement_title(date_of_pairing: datetime) -> str:
+    return f"Announcing the pairings for Random 1 on 1s week of {date_of_pairing.strftime('%Y-%m-%d')}"
+
+
+def render_pairing_lines(groups: Iterable[Iterable[int]],
+                         mentions: Mapping[int, str]) -> Iterator[str]:
+    """ Yields one line per pairing group with the mentions of its members, leaving out members without a mention (e.g. who left the guild). """
+    for group in groups:
+        line = "/".join(mentions[member_id] for member_id in group
+                        if member_id in mentions)
+        if line:
+            yield line + "\n"
+
+
+def pack_lines(lines: Iterable[str],
+               max_length: int,
+               prefix: str = "") -> Iterator[str]:
+    """
+    Packs lines into chunks of at most max_length characters, the first of which starts with prefix. Lines are consumed lazily and every chunk is
+    joined once, so packing is linear in the total length.
+
+    Args:
+        lines (Iterable[str]) - the lines to pack, each including its line break
+        max_length (int) - the maximum length of a chunk
+        prefix (str) - text the first chunk starts with, which must fit into a chunk
+    """
+    if len(prefix) > max_length:
+        raise ValueError("The prefix of the first chunk exceeds max_length")
+    chunk: List[str] = [prefix] if prefix else []
+    length = len(prefix)
+    for line in lines:
+        if length + len(line) > max_length and length > 0:
+            yield "".join(chunk)
+            chunk, length = [], 0
+        while len(line) > max_length:
+            yield line[:max_length]
+            line = line[max_length:]
+        chunk.append(line)
+        length += len(line)
+    if length > 0:
+        yield "".join(chunk)
+
+
+def text_announcement(date_of_pairing: datetime,
+                      lines: Iterable[str],
+                      max_length: int = MAX_MESSAGE_LENGTH) -> Iterator[str]:
+    """ The contents of the messages of a plain text announcement. """
+    return pack_lines(
+        lines, max_length,
+        f"@everyone {announcement_title(date_of_pairing)}:\n---\n")
+
+
+def embed_announcement(
+        lines: Iterable[str],
+        max_length: int = MAX_EMBED_DESCRIPTION_LENGTH) -> Iterator[str]:
+    """ The descriptions of the embeds of an embed announcement. """
+    return pack_lines(lines, max_length)
+
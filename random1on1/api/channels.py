@@ -15,35 +15,74 @@ channel). This abstract class has three implementations:
 
     3. LoggingChannel: The logging channel is a utility channel that is by default only visible to the administrators. The logging channel serves as
                         an easy way to surface matching runtime logs to the server administrators in a persistent and timely manner. The bot is 
-                        designed to be run on ephemeral infrastructure, so these logs can become essential for debugging purposes.
+                        designed to be run on ephemeral infrastructure, so these logs can become essential for debugging purposes. The logs are
+                        batched and sent in the background by a LoggingChannelHandler (see random1on1.api.logs).
 """
-import json
+import asyncio
 import logging
-import sys
+import time
 from abc import ABC
 from abc import abstractmethod
 from datetime import datetime
-from functools import reduce
+from io import BytesIO
+from typing import AsyncIterator
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
 
 from discord import AllowedMentions
 from discord import CategoryChannel
+from discord import Embed
+from discord import File
+from discord import Forbidden
+from discord import HTTPException
+from discord import Message
+from discord import MessageType
+from discord import Object
+from discord import PermissionOverwrite
 from discord import Role
 from discord import TextChannel
-from networkx import compose
-from networkx import connected_components
-from networkx import Graph
 
+from .announcements import announcement_title
+from .announcements import DEFAULT_ANNOUNCEMENT_LAYOUT
+from .announcements import embed_announcement
+from .announcements import render_pairing_lines
+from .announcements import text_announcement
+from .checkpoints import CHECKPOINT_FILENAME
+from .checkpoints import CHECKPOINT_HEADER
+from .checkpoints import HistoryCheckpoint
+from .history import HistoryEdgeTable
+from .history import WeeklyHistoryIndex
+from .logs import LoggingChannelHandler
+from .metrics import measure
+from .metrics import record_bytes_fetched
+from .metrics import record_time
 from .pairings import Pairings
-from .pairings import pairings_from_json
+from .pairings import resolve_members
+from .wire import encode_pairing
+from .wire import EncodedPairing
+from .wire import is_legacy_message
+from .wire import is_wire_message
+from .wire import MalformedPairingMessage
+from .wire import PairingMessageDecoder
+
+if TYPE_CHECKING:
+    from .dispatch import MessageDispatcher
+    from .members import MemberDirectory
 
 logger = logging.getLogger('discord')
-stream = logging.StreamHandler(sys.stdout)
-stream.setLevel(logging.DEBUG)
-logger.addHandler(stream)
 
+PROGRAM_START = datetime(year=2022, month=1, day=1)
+CHECKPOINT_INTERVAL = 8
+PREFETCH_MESSAGES = 200
 
-async def fetch_or_create_channel_in_category(name: str,
-                                              category: CategoryChannel):
+
+async def fetch_or_create_channel_in_category(
+        name: str,
+        category: CategoryChannel,
+        overwrites: Optional[Dict[Role, PermissionOverwrite]] = None):
     """
     Discord natively supports servers with multiple channels by the same name. This helper function either fetchs or creates a channel with a given 
     name in a category. If there are already multiple channels with the same name in the category, it throws an error (because the bot will not know
@@ -52,6 +91,7 @@ async def fetch_or_create_channel_in_category(name: str,
     Args:
         name (str) - the name of the channel to fetch or create 
         category (CategoryChannel) - the CategoryChannel in which to fetch or create the channel
+        overwrites (Optional[Dict[Role, PermissionOverwrite]]) - permission overwrites a newly created channel starts out with
     
     Return:
         A TextChannel object corresponding to the channel it found/created
@@ -67,7 +107,11 @@ async def fetch_or_create_channel_in_category(name: str,
         logger.debug(
             "Found zero channels with name %s in category %s. Creating new channel now...",
             name, category.name)
-        channel = await category.create_text_channel(name=name)
+        if overwrites is None:
+            channel = await category.create_text_channel(name=name)
+        else:
+            channel = await category.create_text_channel(name=name,
+                                                         overwrites=overwrites)
         logger.debug("Succesfully created channel with name %s in category %s",
                      name, category.name)
     elif len(channels) == 1:
@@ -82,6 +126,18 @@ async def fetch_or_create_channel_in_category(name: str,
     return channel
 
 
+def is_checkpoint_message(message: Message) -> bool:
+    return message.content == CHECKPOINT_HEADER and len(
+        message.attachments) == 1
+
+
+def is_pairing_message(message: Message) -> bool:
+    """ Tells pairing messages apart from checkpoints and the system messages discord adds to the channel (e.g. when a checkpoint is pinned). """
+    return message.type == MessageType.default and (
+        is_wire_message(message.content)
+        or is_legacy_message(message.content))
+
+
 class AbstractRandom1on1Channel(ABC):
     """ Abstract base class for channels that provides a generic constructor and a method signature for setting permissions on the underlying chanenl """
 
@@ -91,17 +147,63 @@ class AbstractRandom1on1Channel(ABC):
         self.category = category
         self.channel = channel
 
+    @classmethod
     @abstractmethod
-    async def set_permissions(self, default_role: Role, random1on1_role: Role):
+    def permission_overwrites(
+            cls, default_role: Role,
+            random1on1_role: Role) -> Dict[Role, PermissionOverwrite]:
+        """ The permission overwrites the channel should have for the default_role and the random1on1_role. """
         raise NotImplementedError(
             "AbstractRandom1on1Channel leaves the permissions implementation to its extensions"
         )
 
+    @classmethod
+    async def fetch_or_create(cls, name: str, category: CategoryChannel,
+                              default_role: Optional[Role],
+                              random1on1_role: Optional[Role]) -> TextChannel:
+        overwrites = None
+        if default_role is not None and random1on1_role is not None:
+            overwrites = cls.permission_overwrites(default_role,
+                                                   random1on1_role)
+        return await fetch_or_create_channel_in_category(
+            name, category, overwrites)
+
+    async def set_permissions(self, default_role: Role,
+                              random1on1_role: Role) -> bool:
+        """
+        Reconciles the permission overwrites of the channel with permission_overwrites(). The overwrites the channel already has are known from the
+        cached channel, so nothing is sent to discord when they match, and otherwise every missing overwrite is applied in a single channel edit
+        (keeping the overwrites of any other role or member).
+
+        Returns:
+            True if the channel had to be edited
+        """
+        desired = self.permission_overwrites(default_role, random1on1_role)
+        current = self.channel.overwrites
+        changed = {
+            target: overwrite
+            for target, overwrite in desired.items()
+            if current.get(target) != overwrite
+        }
+        if len(changed) == 0:
+            logger.debug("Permissions of %s: %s are already up to date",
+                         type(self).__name__, self.name)
+            return False
+        logger.debug("Updating permissions of %s: %s for roles: %s",
+                     type(self).__name__, self.name,
+                     ", ".join(target.name for target in changed))
+        _ = await self.channel.edit(overwrites={**current, **desired})
+        return True
+
 
 class AnnouncementChannel(AbstractRandom1on1Channel):
 
     @classmethod
-    async def create(cls, name: str, category: CategoryChannel):
+    async def create(cls,
+                     name: str,
+                     category: CategoryChannel,
+                     default_role: Optional[Role] = None,
+                     random1on1_role: Optional[Role] = None):
         """
         Class method that creates an announcment channel and sends the opening announcement. This method is used to avoid issues with async/await 
         method signatures from discord.py which do not interact easily with python 'magic methods' like __init__(...).
@@ -114,19 +216,32 @@ class AnnouncementChannel(AbstractRandom1on1Channel):
         Args: 
             name (str) - The name of the announcement channel
             category (CategoryChannel) - the category that you want to put the announcement channel in 
+            default_role (Optional[Role]) - if given with random1on1_role, a new channel is created with its permission overwrites in place
+            random1on1_role (Optional[Role]) - see default_role
 
         Returns: 
             An AnnouncementChannel object which has already sent any necesary announcements. This object can later be used to log announcments of 
             pairings to the broader group of random 1 on 1 participants.
         """
-        channel = await fetch_or_create_channel_in_category(name, category)
+        channel = await cls.fetch_or_create(name, category, default_role,
+                                            random1on1_role)
         announcement_channel = AnnouncementChannel(name, category, channel)
         _ = await announcement_channel.send_opening_announcement()
         return announcement_channel
 
     async def send_opening_announcement(self):
-        """ Sends a generic introduction message to the announcement channel if the channel has not received any messages yet."""
-        messages = await self.channel.history(limit=10).flatten()
+        """
+        Sends a generic introduction message to the announcement channel if the channel has not received any messages yet. A channel whose cached
+        last_message_id is set has received messages, so only channels without one are checked by fetching their newest message.
+        """
+        if self.channel.last_message_id is not None:
+            logger.debug(
+                "AnnouncementChannel %s already has messages. Opting to not send an introductory message",
+                self.name)
+            return True
+        messages = [
+            message async for message in self.channel.history(limit=1)
+        ]
         if len(messages) == 0:
             logger.debug(
                 "Found zero previous messages in AnnouncementChannel %s. Sending introductory announcement.",
@@ -147,45 +262,97 @@ Have fun!
                 self.name)
             return True
 
-    async def set_permissions(self, default_role: Role, random1on1_role: Role):
-        """ Sets appropriate read and write permissions for the announcments channel (everyone can read but only people participating in the program
-        can send messages to the channel). """
-        logger.debug(
-            "Setting permissions for AnnouncementChannel: %s for default_role: %s and random1on1_role: %s",
-            self.name, default_role.name, random1on1_role.name)
-        logger.debug(
-            "Setting permissions for roles. default_role is %s and is_role=%r",
-            default_role.name, isinstance(default_role, Role))
-        logger.debug(
-            "Setting permissions for roles. random1on1_role is %s and is_role=%r",
-            random1on1_role.name, isinstance(random1on1_role, Role))
-        _ = await self.channel.set_permissions(target=default_role,
-                                               read_messages=True,
-                                               send_messages=False)
-        _ = await self.channel.set_permissions(target=random1on1_role,
-                                               read_messages=True,
-                                               send_messages=True)
-
-    async def announce_pairings(self, pairings: Pairings):
-        """ Creates a simple announcement message from a collection of pairings and send it the announcement channel. """
+    @classmethod
+    def permission_overwrites(
+            cls, default_role: Role,
+            random1on1_role: Role) -> Dict[Role, PermissionOverwrite]:
+        """ Everyone can read the announcements channel but only people participating in the program can send messages to it. """
+        return {
+            default_role:
+            PermissionOverwrite(read_messages=True, send_messages=False),
+            random1on1_role:
+            PermissionOverwrite(read_messages=True, send_messages=True),
+        }
+
+    async def announce_pairings(self,
+                                pairings: Pairings,
+                                layout: str = DEFAULT_ANNOUNCEMENT_LAYOUT,
+                                dispatcher: Optional["MessageDispatcher"] = None,
+                                guild_members: Optional["MemberDirectory"] = None):
+        """
+        Announces a collection of pairings in the announcement channel, in as many messages as it takes (see random1on1.api.announcements). The
+        member IDs of the pairings are only resolved here; members who left the guild since they were matched are left out of the announcement.
+        The messages are sent in order, and through the dispatcher's retries if one is given.
+
+        Args:
+            pairings (Pairings) - the pairings to announce
+            layout (str) - one of ANNOUNCEMENT_LAYOUTS
+            dispatcher (Optional[MessageDispatcher]) - retries messages that fail with transient errors
+            guild_members (Optional[MemberDirectory]) - where to look the members up, defaulting to the guild's member cache
+        """
         logger.debug(
             "Received for pairings week of %s, constructing announcement message",
             pairings.date_of_pairing.strftime('%Y-%m-%d'))
-        announcement_message = f"""@everyone Announcing the pairings for Random 1 on 1s week of {datetime.now().strftime('%Y-%m-%d')}:\n---\n"""
-        for component in connected_components(pairings.pairing_graph):
-            announcement_message += ("/".join(
-                [f"{participant.mention}"
-                 for participant in component]) + "\n")
-        _ = await self.channel.send(announcement_message,
-                                    allowed_mentions=AllowedMentions.all())
+        from networkx import connected_components
+
+        members, departed = resolve_members(
+            guild_members if guild_members is not None else self.channel.guild,
+            pairings.pairing_graph.nodes)
+        if departed:
+            logger.debug("Leaving %d departed members out of the announcement",
+                         len(departed))
+        lines = render_pairing_lines(
+            connected_components(pairings.pairing_graph),
+            {member_id: member.mention
+             for member_id, member in members.items()})
+
+        async def send(**kwargs):
+
+            def send_once():
+                return self.channel.send(
+                    allowed_mentions=AllowedMentions.all(), **kwargs)
+
+            if dispatcher is None:
+                return await send_once()
+            return await dispatcher.call_with_retries(send_once)
+
+        num_messages = 0
+        if layout == "embed":
+            title = announcement_title(pairings.date_of_pairing)
+            for description in embed_announcement(lines):
+                # Only the first message has a title and pings everyone, discord.py 1 would render title=None as "None"
+                if num_messages == 0:
+                    _ = await send(content="@everyone",
+                                   embed=Embed(title=title,
+                                               description=description))
+                else:
+                    _ = await send(embed=Embed(description=description))
+                num_messages += 1
+            if num_messages == 0:
+                _ = await send(content="@everyone", embed=Embed(title=title))
+                num_messages += 1
+        else:
+            for content in text_announcement(pairings.date_of_pairing, lines):
+                _ = await send(content=content)
+                num_messages += 1
         logger.debug(
-            "Finished announcing pairings to the announcement channel")
+            "Finished announcing pairings to the announcement channel in %d messages",
+            num_messages)
 
 
 class HistoryChannel(AbstractRandom1on1Channel):
 
+    def __init__(self, name: str, category: CategoryChannel,
+                 channel: TextChannel):
+        super().__init__(name, category, channel)
+        self.checkpoint_messages = []
+
     @classmethod
-    async def create(cls, name: str, category: CategoryChannel):
+    async def create(cls,
+                     name: str,
+                     category: CategoryChannel,
+                     default_role: Optional[Role] = None,
+                     random1on1_role: Optional[Role] = None):
         """
         Class method that creates a history channel. This method is used to avoid issues with async/await method signatures from discord.py which 
         do not interact easily with python 'magic methods' like __init__(...).
@@ -198,40 +365,235 @@ class HistoryChannel(AbstractRandom1on1Channel):
         Args: 
             name (str) - The name of the history channel
             category (CategoryChannel) - the category that you want to put the announcement channel in 
+            default_role (Optional[Role]) - if given with random1on1_role, a new channel is created with its permission overwrites in place
+            random1on1_role (Optional[Role]) - see default_role
 
         Returns: 
             An HistoryChannel object. This object can later be used to log the history of pairings for uwse by the matching algorithm on future 
             script runs. 
         """
-        channel = await fetch_or_create_channel_in_category(name, category)
+        channel = await cls.fetch_or_create(name, category, default_role,
+                                            random1on1_role)
         history_channel = HistoryChannel(name, category, channel)
         return history_channel
 
-    async def set_permissions(self, default_role: Role, random1on1_role: Role):
-        """ Sets appropriate read and write permissions for the history channel (only server admins can read -- messages are for the bots internal 
-        use only)."""
+    @classmethod
+    def permission_overwrites(
+            cls, default_role: Role,
+            random1on1_role: Role) -> Dict[Role, PermissionOverwrite]:
+        """ Only server admins can read the history channel -- messages are for the bots internal use only. """
+        return {
+            default_role: PermissionOverwrite(read_messages=False),
+            random1on1_role: PermissionOverwrite(read_messages=False),
+        }
+
+    async def write_pairings(self, pairings: Pairings):
+        """ Sends the pairings to the channel in the compact wire format (see random1on1.api.wire), split over as many messages as needed. """
+        messages = encode_pairing(
+            EncodedPairing(date_of_pairing=pairings.date_of_pairing,
+                           dry_run=pairings.dry_run,
+                           pairs=tuple(pairings.to_json()["pairing_graph"])))
+        logger.debug("Writing pairings of %d pairs in %d messages",
+                     pairings.pairing_graph.number_of_edges(), len(messages))
+        for content in messages:
+            _ = await self.channel.send(content)
+
+    async def read_checkpoint(self) -> Optional[HistoryCheckpoint]:
+        """
+        Loads the newest checkpoint among the pinned messages of the channel, or None if the channel has no checkpoint yet or its newest checkpoint
+        is in an outdated format.
+        """
+        self.checkpoint_messages = [
+            message for message in await self.channel.pins()
+            if is_checkpoint_message(message)
+        ]
+        if len(self.checkpoint_messages) == 0:
+            return None
+        newest = max(self.checkpoint_messages, key=lambda message: message.id)
+        data = await newest.attachments[0].read()
+        record_bytes_fetched("history_checkpoint", len(data))
+        try:
+            checkpoint = HistoryCheckpoint.from_bytes(data)
+        except ValueError as error:
+            logger.warning(
+                "Ignoring history checkpoint in HistoryChannel: %s (%s), the full history is read instead",
+                self.name, error)
+            return None
         logger.debug(
-            "Setting permissions for AnnouncementChannel: %s for default_role: %s and random1on1_role: %s",
-            self.name, default_role.name, random1on1_role.name)
+            "Found history checkpoint of %d pairings up to message %d in HistoryChannel: %s",
+            checkpoint.num_pairings, checkpoint.last_message_id, self.name)
+        return checkpoint
+
+    async def write_checkpoint(self, checkpoint: HistoryCheckpoint):
+        """ Sends and pins a new checkpoint and unpins the checkpoints it replaces. """
+        message = await self.channel.send(
+            CHECKPOINT_HEADER,
+            file=File(BytesIO(checkpoint.to_bytes()),
+                      filename=CHECKPOINT_FILENAME))
+        try:
+            _ = await message.pin()
+            for old_message in self.checkpoint_messages:
+                _ = await old_message.unpin()
+        except (Forbidden, HTTPException):
+            logger.warning(
+                "Could not pin the history checkpoint in HistoryChannel: %s, the next run will read the full history",
+                self.name)
+            return
+        self.checkpoint_messages = [message]
         logger.debug(
-            "Setting permissions for roles. default_role is %s and is_role=%r",
-            default_role.name, isinstance(default_role, Role))
+            "Wrote history checkpoint of %d pairings up to message %d in HistoryChannel: %s",
+            checkpoint.num_pairings, checkpoint.last_message_id, self.name)
+
+    async def iterate_pairing_messages(
+            self, after: Union[datetime, Object],
+            before: Optional[datetime]) -> AsyncIterator[Message]:
+        """
+        Yields the pairing messages between after and before, oldest first. The messages are fetched page by page by a producer task that runs
+        ahead of the consumer by up to PREFETCH_MESSAGES messages, so the next page is already being downloaded while the current one is decoded,
+        and at most a couple of pages are held in memory no matter how long the history is.
+        """
+        queue = asyncio.Queue(maxsize=PREFETCH_MESSAGES)
+        end_of_history = object()
+
+        async def produce():
+            try:
+                async for message in self.channel.history(limit=None,
+                                                          after=after,
+                                                          before=before,
+                                                          oldest_first=True):
+                    record_bytes_fetched("history_fetch",
+                                         len(message.content))
+                    if is_pairing_message(message):
+                        _ = await queue.put(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                _ = await queue.put(error)
+            else:
+                _ = await queue.put(end_of_history)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is end_of_history:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
+
+    async def iterate_pairings(
+        self,
+        after: Union[datetime, Object],
+        before: Optional[datetime],
+        include_dry_runs: bool,
+    ) -> AsyncIterator[Tuple[Message, Optional[EncodedPairing], bool]]:
+        """
+        Decodes the pairing messages between after and before as they stream in. Yields every pairing message together with the pairing it
+        completes (None for skipped dry runs, parts of unfinished multi-part pairings and malformed messages, which are logged and skipped) and
+        whether no multi-part pairing is waiting for more parts after it.
+        """
+        decoder = PairingMessageDecoder(include_dry_runs=include_dry_runs)
+        async for message in self.iterate_pairing_messages(after, before):
+            start = time.perf_counter()
+            try:
+                pairing = decoder.feed(message.content)
+            except MalformedPairingMessage as error:
+                logger.warning("Skipping history message %d: %s", message.id,
+                               error)
+                pairing = None
+            record_time("history_decode", time.perf_counter() - start)
+            yield message, pairing, len(decoder.incomplete_pairings()) == 0
+
+    async def read_history_table(
+        self,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> HistoryEdgeTable:
+        """
+        Merges every official (i.e. non-dry-run) pairing logged between date_from (defaulting to the start of the program) and date_to (defaulting
+        to now) into a HistoryEdgeTable of member IDs in a single pass over the streamed history. Unlike read_historical_pairings this does not
+        resolve members, so the table is cheap to build and can be handed to a MatchingWorkerPool as is.
+
+        The history is read with read_history_index, and only the weekly buckets that overlap date_from to date_to are merged. The steps are
+        measured as phases of the current run (see random1on1.api.metrics): history_checkpoint, history_fetch (which includes decoding and merging
+        the messages as they stream in), history_decode, history_merge and history_checkpoint_write.
+        """
+        index = await self.read_history_index(date_from=date_from,
+                                              date_to=date_to)
+        start = time.perf_counter()
+        table = index.merged(date_from=date_from, date_to=date_to)
+        record_time("history_merge", time.perf_counter() - start)
+        return table
+
+    async def read_history_index(
+        self,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> WeeklyHistoryIndex:
+        """
+        Reads the official pairings into a WeeklyHistoryIndex that covers at least date_from to date_to (and the whole history if neither is
+        given).
+
+        Unless date_to is given, the newest pinned checkpoint is used and only the messages after the checkpoint are fetched. Once
+        CHECKPOINT_INTERVAL messages have piled up after the checkpoint, a fresh one is written. Without a usable checkpoint the whole history is
+        read once, even if only the weeks since date_from are needed, so that the first checkpoint can be seeded.
+        """
+        checkpoint = None
+        if date_to is None:
+            with measure("history_checkpoint"):
+                checkpoint = await self.read_checkpoint()
+
+        if checkpoint is not None:
+            after = Object(id=checkpoint.last_message_id)
+        elif date_to is None:
+            # Reading only the weeks since date_from could never produce a checkpoint, so later reads would never get faster
+            after = PROGRAM_START
+        else:
+            after = date_from if date_from is not None else PROGRAM_START
+        # Only a read that covers everything after the checkpoint (or the whole history) can produce a new checkpoint
+        can_checkpoint = date_to is None
+
+        new_index = WeeklyHistoryIndex()
+        num_new_messages = 0
+        last_message_id = None
+        with measure("history_fetch"):
+            async for message, pairing, settled in self.iterate_pairings(
+                    after, date_to, include_dry_runs=False):
+                num_new_messages += 1
+                if pairing is not None:
+                    start = time.perf_counter()
+                    new_index.add_pairing(pairing.pairs,
+                                          pairing.date_of_pairing)
+                    record_time("history_merge", time.perf_counter() - start)
+                if settled:
+                    # A checkpoint may only cover messages up to here, otherwise it would cut a multi-part pairing in half
+                    last_message_id = message.id
         logger.debug(
-            "Setting permissions for roles. random1on1_role is %s and is_role=%r",
-            random1on1_role.name, isinstance(random1on1_role, Role))
-        _ = await self.channel.set_permissions(target=default_role,
-                                               read_messages=False)
-        _ = await self.channel.set_permissions(target=random1on1_role,
-                                               read_messages=False)
+            "Found %d official pairings in %d new messages in HistoryChannel: %s",
+            new_index.num_pairings, num_new_messages, self.name)
 
-    async def write_pairings(self, pairings: Pairings):
-        """ Sends the pairings to the channel. """
-        _ = await self.channel.send(json.dumps(pairings.to_json()))
+        if checkpoint is None:
+            index = new_index
+        else:
+            start = time.perf_counter()
+            index = checkpoint.index
+            index.update(new_index)
+            record_time("history_merge", time.perf_counter() - start)
+        if (can_checkpoint and num_new_messages >= CHECKPOINT_INTERVAL
+                and last_message_id is not None):
+            with measure("history_checkpoint_write"):
+                _ = await self.write_checkpoint(
+                    HistoryCheckpoint(last_message_id=last_message_id,
+                                      index=index))
+        return index
 
     async def read_historical_pairings(
             self,
-            date_from: datetime = datetime(year=2022, month=1, day=1),
-            date_to: datetime = datetime.now(),
+            date_from: datetime = PROGRAM_START,
+            date_to: Optional[datetime] = None,
     ) -> Pairings:
         """
         Collects previous pairings from all recent messages (recent as in within a certain time frame) and merges their matching-graphs into a single
@@ -246,79 +608,69 @@ class HistoryChannel(AbstractRandom1on1Channel):
 
         Args: 
             date_from (datetime) - The datetime to start looking for messages from 
-            date_to (datetime) - The datetime to serach for messages up until
+            date_to (Optional[datetime]) - The datetime to serach for messages up until (defaults to now)
 
         Returns: 
-            A Pairings object with Pairings.pairing_graph representing the merged state of all previous graphs merged together.
+            A Pairings object with Pairings.pairing_graph representing the merged state of all previous graphs merged together. The nodes are
+            member IDs, and every edge carries the `meetings`, `first_met` and `last_met` attributes of the HistoryEdgeTable.
         """
         # TODO: Remove all literals for translating datetime to from string and opt for some global constant
+        date_to = date_to if date_to is not None else datetime.now()
         logger.debug(
             "Searching for previous pairings logged in HistoryChannel: %s that took place between %s and %s.",
             self.name, date_from.strftime('%Y-%m-%d'),
             date_to.strftime('%Y-%m-%d'))
-        all_official_pairings = []
-        for message in await self.channel.history(after=date_from,
-                                                  before=date_to).flatten():
-            pairing = await pairings_from_json(message.content,
-                                               self.channel.guild)
-            logger.debug(
-                "Found pairing object associated with date %s and dry_run=%r",
-                pairing.date_of_pairing.strftime('%Y-%m-%d'), pairing.dry_run)
-            if not pairing.dry_run:
-                all_official_pairings.append(pairing)
+        table = HistoryEdgeTable()
+        async for _, pairing, _ in self.iterate_pairings(
+                date_from, date_to, include_dry_runs=False):
+            if pairing is not None:
+                logger.debug(
+                    "Found official pairing associated with date %s",
+                    pairing.date_of_pairing.strftime('%Y-%m-%d'))
+                table.add_pairing(pairing.pairs, pairing.date_of_pairing)
+        logger.debug(
+            "Merged %d official (i.e. non-dry-run) pairings into %d pairs",
+            table.num_pairings, len(table))
 
-        if len(all_official_pairings) > 0:
-            logger.debug(
-                "Found total of %f official (i.e. non-dry-run) pairings",
-                len(all_official_pairings))
-        else:
-            logger.debug(
-                "Found no previous pairings, indicating this is a first time pairings. Returning an empty pairings object"
-            )
-            return Pairings(
-                pairing_graph=Graph(),
-                date_of_pairing=datetime.now(),
-                dry_run=False,
-            )
-
-        logger.debug("Unioning the pairing graphs together now")
-        # TODO: Change this to a manual union method to add metadata for edges (e.g. the number of and dates of the meetings between two members).
-        merged_pairing_graph = reduce(
-            lambda G, H: compose(G, H),
-            [p.pairing_graph for p in all_official_pairings])
-
-        merged_pairings = Pairings(
-            pairing_graph=merged_pairing_graph,
+        return Pairings(
+            pairing_graph=table.to_graph(),
             date_of_pairing=datetime.now(),
             dry_run=False,
         )
 
-        logger.debug("Completed merging of pairings")
-        return merged_pairings
-
 
 class LoggingChannel(AbstractRandom1on1Channel):
 
     @classmethod
-    async def create(cls, name: str, category: CategoryChannel):
+    async def create(cls,
+                     name: str,
+                     category: CategoryChannel,
+                     default_role: Optional[Role] = None,
+                     random1on1_role: Optional[Role] = None):
         """ Creates a logging channel to be used with discord and python logging"""
-        # TODO: This class requires proper implementation.
-        channel = await fetch_or_create_channel_in_category(name, category)
+        channel = await cls.fetch_or_create(name, category, default_role,
+                                            random1on1_role)
         logging_channel = LoggingChannel(name, category, channel)
         return logging_channel
 
-    async def set_permissions(self, default_role: Role, random1on1_role: Role):
-        """ Sets appropriate read and write permissions for the logging channel (only server admins can read -- messages are debugging purposes)."""
-        logger.debug(
-            "Setting permissions for AnnouncementChannel: %s for default_role: %s and random1on1_role: %s",
-            self.name, default_role.name, random1on1_role.name)
-        logger.debug(
-            "Setting permissions for roles. default_role is %s and is_role=%r",
-            default_role.name, isinstance(default_role, Role))
-        logger.debug(
-            "Setting permissions for roles. random1on1_role is %s and is_role=%r",
-            random1on1_role.name, isinstance(random1on1_role, Role))
-        _ = await self.channel.set_permissions(target=default_role,
-                                               read_messages=False)
-        _ = await self.channel.set_permissions(target=random1on1_role,
-                                               read_messages=False)
+    @classmethod
+    def permission_overwrites(
+            cls, default_role: Role,
+            random1on1_role: Role) -> Dict[Role, PermissionOverwrite]:
+        """ Only server admins can read the logging channel -- messages are debugging purposes. """
+        return {
+            default_role: PermissionOverwrite(read_messages=False),
+            random1on1_role: PermissionOverwrite(read_messages=False),
+        }
+
+    def start_logging(self, guild_id: int, **kwargs) -> LoggingChannelHandler:
+        """
+        Starts sending the bot's log records of a guild to the channel, see random1on1.api.logs. The keyword arguments are passed on to the
+        LoggingChannelHandler.
+
+        Returns:
+            The started handler, which has to be stopped with LoggingChannelHandler.stop() once the run is over
+        """
+        handler = LoggingChannelHandler(self.channel, guild_id, **kwargs)
+        handler.start()
+        return handler
@@ -0,0 +1,57 @@
+"""
+random1on1.api.checkpoints
+
+A HistoryCheckpoint is a compacted snapshot of the pairing history: the WeeklyHistoryIndex of every official pairing up to (and including) the
+history message with ID last_message_id. The HistoryChannel keeps its newest checkpoint as a pinned message with the snapshot attached as a file, so
+reading the history only has to fetch the pinned messages and the pairings written after the checkpoint.
+
+The attachment is CHECKPOINT_MAGIC, the version byte, the varint last_message_id and the index's encoding (WeeklyHistoryIndex.to_bytes). Only the
+current version is read; a checkpoint in any other format is replaced by a fresh one after reading the whole history.
+"""
+from dataclasses import dataclass
+
+from random1on1.api.history import WeeklyHistoryIndex
+from random1on1.api.wire import read_varint
+from random1on1.api.wire import write_varint
+
+CHECKPOINT_HEADER = "random1on1-history-checkpoint"
+CHECKPOINT_FILENAME = "history-checkpoint.bin"
+CHECKPOINT_MAGIC = b"R1O1CKPT"
+CHECKPOINT_VERSION = 3
+
+
+@dataclass(frozen=True)
+class HistoryCheckpoint:
+    """
+    Args:
+        last_message_id (int) - ID of the newest history message covered by the checkpoint
+        index (WeeklyHistoryIndex) - the history of every official pairing covered by the checkpoint
+    """
+
+    last_message_id: int
+    index: WeeklyHistoryIndex
+
+    @property
+    def num_pairings(self) -> int:
+        return self.index.num_pairings
+
+    def to_bytes(self) -> bytes:
+        output = bytearray(CHECKPOINT_MAGIC)
+        output.append(CHECKPOINT_VERSION)
+        write_varint(self.last_message_id, output)
+        return bytes(output) + self.index.to_bytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HistoryCheckpoint":
+        """
+        Raises:
+            ValueError - if data is not a checkpoint of the current version
+        """
+        if not data.startswith(CHECKPOINT_MAGIC):
+            raise ValueError("Not a history checkpoint")
+        version = data[len(CHECKPOINT_MAGIC)]
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported history checkpoint version {version}")
+        last_message_id, position = read_varint(data, len(CHECKPOINT_MAGIC) + 1)
+        return cls(last_message_id=last_message_id,
+                   index=WeeklyHistoryIndex.from_bytes(data[position:]))
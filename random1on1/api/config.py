@@ -1,7 +1,25 @@
 import json
 from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
 from typing import Union
 
+from random1on1.api.announcements import ANNOUNCEMENT_LAYOUTS
+from random1on1.api.announcements import DEFAULT_ANNOUNCEMENT_LAYOUT
+from random1on1.api.schedule import CronSchedule
+from random1on1.api.schedule import DEFAULT_SCHEDULE
+from random1on1.api.storage import DEFAULT_HISTORY_DATABASE
+from random1on1.api.storage import DEFAULT_HISTORY_STORE
+from random1on1.api.storage import HISTORY_STORES
+from random1on1.matching import DEFAULT_ALGORITHM
+from random1on1.matching import validate_algorithm
+from random1on1.matching import validate_algorithm_options
+
 DEFAULT_ANNOUNCEMENT_CHANNEL = "random-1-on-1-announcements"
 DEFAULT_CATEGORY = "Random 1-on-1s"
 DEFAULT_HISTORY_CHANNEL = "random-1-on-1-bot-history"
@@ -9,6 +27,8 @@ DEFAULT_LOGGING_CHANNEL = "random-1-on-1-bot-logs"
 DEFAULT_ROLE = "Random 1-on-1s"
 DEFAULT_ANNOUNCE_MATCHES = True
 DEFAULT_DM_MATCHES = True
+INTRO_MESSAGES = ["dm", "thread"]
+DEFAULT_INTRO_MESSAGES = "dm"
 
 
 @dataclass(frozen=True)
@@ -22,6 +42,15 @@ class Random1on1BotConfig(object):
     logging_channel: str = DEFAULT_LOGGING_CHANNEL
     announce_matches: bool = True
     dm_matches: bool = True
+    algorithm: str = DEFAULT_ALGORITHM
+    # Stored as sorted (name, value) items so the config stays immutable and hashable, see algorithm_kwargs()
+    algorithm_options: Tuple[Tuple[str, Any], ...] = ()
+    history_store: str = DEFAULT_HISTORY_STORE
+    history_database: str = DEFAULT_HISTORY_DATABASE
+    lookback_weeks: Optional[int] = None
+    intro_messages: str = DEFAULT_INTRO_MESSAGES
+    announcement_layout: str = DEFAULT_ANNOUNCEMENT_LAYOUT
+    schedule: str = DEFAULT_SCHEDULE
 
     def __post_init__(self):
         validate_announcement_prefs(
@@ -30,14 +59,85 @@ class Random1on1BotConfig(object):
                 'dm_matches': self.dm_matches,
                 'announce_matches': self.announce_matches
             })
+        validate_algorithm(self.algorithm)
+        options = self.algorithm_options
+        if isinstance(options, Mapping):
+            options = tuple(sorted(options.items()))
+        elif not (isinstance(options, tuple) and all(
+                isinstance(item, tuple) and len(item) == 2
+                for item in options)):
+            raise ValueError("algorithm_options must be a JSON object")
+        if options:
+            validate_algorithm_options(self.algorithm, dict(options))
+        object.__setattr__(self, "algorithm_options", options)
+        if self.history_store not in HISTORY_STORES:
+            raise ValueError(
+                f"Unknown history_store {self.history_store}, choose one of {', '.join(HISTORY_STORES)}"
+            )
+        if self.lookback_weeks is not None and (
+                isinstance(self.lookback_weeks, bool)
+                or not isinstance(self.lookback_weeks, int)
+                or self.lookback_weeks < 1):
+            raise ValueError("lookback_weeks must be a positive integer")
+        if self.intro_messages not in INTRO_MESSAGES:
+            raise ValueError(
+                f"Unknown intro_messages {self.intro_messages}, choose one of {', '.join(INTRO_MESSAGES)}"
+            )
+        if self.announcement_layout not in ANNOUNCEMENT_LAYOUTS:
+            raise ValueError(
+                f"Unknown announcement_layout {self.announcement_layout}, choose one of {', '.join(ANNOUNCEMENT_LAYOUTS)}"
+            )
+        if not isinstance(self.schedule, str):
+            raise ValueError("schedule must be a string")
+        # Raises a ValueError for schedules that are malformed or never due
+        _ = CronSchedule.parse(self.schedule).next_after(datetime.now())
+
+    def algorithm_kwargs(self) -> dict:
+        """ The algorithm_options as keyword arguments for the constructor of the algorithm. """
+        return dict(self.algorithm_options)
+
+    def history_window_start(self,
+                             now: Optional[datetime] = None
+                             ) -> Optional[datetime]:
+        """ Start of the history the matching algorithm looks at, or None to look at the whole history. """
+        if self.lookback_weeks is None:
+            return None
+        now = now if now is not None else datetime.now()
+        return now - timedelta(weeks=self.lookback_weeks)
 
     def to_json(self) -> str:
-        return json.dumps(self,
-                          default=lambda obj: obj.__dict__,
+        return json.dumps(dict(self.__dict__,
+                               algorithm_options=self.algorithm_kwargs()),
                           sort_keys=True,
                           indent=4)
 
 
+def read_config(location) -> Random1on1BotConfig:
+    with open(location, "r") as config_file:
+        config = config_from_json(config_file.read())
+    return config
+
+
+def read_configs(location) -> List[Random1on1BotConfig]:
+    """ Reads a config file holding either a single config object or a list of config objects (one per guild). """
+    with open(location, "r") as config_file:
+        configs = configs_from_json(config_file.read())
+    return configs
+
+
+def configs_from_json(
+        json_data: Union[str, dict, list]) -> List[Random1on1BotConfig]:
+    if isinstance(json_data, str):
+        json_data = json.loads(json_data)
+    if isinstance(json_data, dict):
+        json_data = [json_data]
+    configs = [config_from_dict(dictionary=data) for data in json_data]
+    guild_ids = [config.guild_id for config in configs]
+    if len(set(guild_ids)) != len(guild_ids):
+        raise ValueError("Every guild_id can only be configured once")
+    return configs
+
+
 def config_from_json(json_data: Union[str, dict]) -> Random1on1BotConfig:
     if isinstance(json_data, str):
         return config_from_dict(dictionary=json.loads(json_data))
@@ -74,4 +174,15 @@ def config_from_dict(dictionary) -> Random1on1BotConfig:
         announce_matches=dictionary.get("announce_matches",
                                         DEFAULT_ANNOUNCE_MATCHES),
         dm_matches=dictionary.get("dm_matches", DEFAULT_DM_MATCHES),
+        algorithm=dictionary.get("algorithm", DEFAULT_ALGORITHM),
+        algorithm_options=dictionary.get("algorithm_options", {}),
+        history_store=dictionary.get("history_store", DEFAULT_HISTORY_STORE),
+        history_database=dictionary.get("history_database",
+                                        DEFAULT_HISTORY_DATABASE),
+        lookback_weeks=dictionary.get("lookback_weeks"),
+        intro_messages=dictionary.get("intro_messages",
+                                      DEFAULT_INTRO_MESSAGES),
+        announcement_layout=dictionary.get("announcement_layout",
+                                           DEFAULT_ANNOUNCEMENT_LAYOUT),
+        schedule=dictionary.get("schedule", DEFAULT_SCHEDULE),
     )
@@ -0,0 +1,265 @@
+"""
+random1on1.api.dispatch
+
+Introducing every pairing group means one message per participant, and sending them one at a time makes the DM phase the slowest part of a run for
+large guilds, while a single member with closed DMs used to abort every message after theirs. The MessageDispatcher sends the introductions
+concurrently instead:
+
+    - at most max_concurrent_sends messages are in flight, and sends are spaced out to at most sends_per_second so the bot stays well below
+      discord's global rate limit. discord.py itself waits out the rate-limit bucket of every route (e.g. each DM channel), so messages to
+      different members never queue behind each other's buckets.
+    - rate-limited (429), server side (5xx) and connection errors are retried with exponential backoff (or after the Retry-After discord asks
+      for), while permanent errors like closed DMs (403) fail right away.
+    - every member gets a DeliveryResult, so failures are logged and the remaining messages are still sent.
+
+Instead of a DM to every member, a pairing group can also be introduced in a private thread of the announcement channel, which takes one thread and
+one message per group (see MessageDispatcher.introduce_in_threads).
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from discord import AllowedMentions
+from discord import ChannelType
+from discord import Forbidden
+from discord import HTTPException
+from discord import Member
+from discord import NotFound
+from discord import TextChannel
+
+from random1on1.api.metrics import record_rate_limit_wait
+
+logger = logging.getLogger("discord")
+
+DEFAULT_MAX_CONCURRENT_SENDS = 16
+DEFAULT_SENDS_PER_SECOND = 20.0
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 1.0
+MAX_THREAD_NAME_LENGTH = 100
+
+
+@dataclass(frozen=True)
+class DeliveryResult:
+    """ Outcome of introducing a member to their pairing group. """
+
+    member_id: int
+    succeeded: bool
+    attempts: int
+    error: Optional[str] = None
+
+
+class RateLimiter:
+    """
+    Spaces out acquisitions to at most rate per second.
+
+    Args:
+        rate (float) - number of acquisitions per second
+    """
+
+    def __init__(self,
+                 rate: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable] = asyncio.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.interval = 1 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = 0.0
+
+    async def acquire(self):
+        now = self.clock()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            record_rate_limit_wait(slot - now)
+            _ = await self.sleep(slot - now)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (Forbidden, NotFound)):
+        return False
+    if isinstance(error, HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (asyncio.TimeoutError, OSError))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """ The delay discord asked for in the Retry-After header of a rate-limited response, if any. """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers or headers.get("Retry-After") is None:
+        return None
+    try:
+        return float(headers["Retry-After"])
+    except ValueError:
+        return None
+
+
+def intro_message(member: Member, group: Sequence[Member]) -> str:
+    mentions = "/".join(m.mention for m in group)
+    return f"Hey {member.name}!, this week for random 1-on-1s you have mattched with the following group: "\
+        + f"[{mentions}]. \n\n Feel free to reach out to your group directly to setup some time to get "\
+        + "to know eachother!"
+
+
+def group_intro_message(group: Sequence[Member]) -> str:
+    mentions = "/".join(m.mention for m in group)
+    return f"Hey {mentions}! This week for random 1-on-1s you have matched with each other. \n\n Feel free to use this thread to setup some "\
+        + "time to get to know eachother!"
+
+
+class MessageDispatcher:
+    """
+    Sends the introductions of pairing groups concurrently, see the module docstring. One dispatcher can be shared by every guild a bot serves, as
+    the global rate limit applies to the bot as a whole.
+
+    Args:
+        max_concurrent_sends (int) - maximum number of messages in flight
+        sends_per_second (float) - maximum number of messages started per second
+        max_attempts (int) - number of attempts before a message is given up on
+        base_delay (float) - seconds to wait before the first retry, doubling with every further retry
+    """
+
+    def __init__(self,
+                 max_concurrent_sends: int = DEFAULT_MAX_CONCURRENT_SENDS,
+                 sends_per_second: float = DEFAULT_SENDS_PER_SECOND,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_delay: float = DEFAULT_BASE_DELAY,
+                 sleep: Callable[[float], Awaitable] = asyncio.sleep):
+        if max_concurrent_sends < 1:
+            raise ValueError("max_concurrent_sends must be at least 1")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_concurrent_sends = max_concurrent_sends
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.sleep = sleep
+        self.rate_limiter = RateLimiter(sends_per_second, sleep=sleep)
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore belongs to the event loop the dispatcher is used in
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent_sends)
+        return self.semaphore
+
+    async def call_with_retries(self, send: Callable[[], Awaitable]) -> int:
+        """ Calls send until it succeeds and returns the number of attempts it took, or raises the last error. """
+        attempt = 0
+        while True:
+            attempt += 1
+            async with self.get_semaphore():
+                _ = await self.rate_limiter.acquire()
+                try:
+                    _ = await send()
+                    return attempt
+                except Exception as error:
+                    if attempt >= self.max_attempts or not is_retryable(error):
+                        raise
+                    delay = retry_after(error)
+                    if delay is None:
+                        delay = self.base_delay * 2**(attempt - 1)
+                    logger.debug(
+                        "Attempt %d of sending a message failed with %r, retrying in %.2f seconds",
+                        attempt, error, delay)
+            # Back off outside of the semaphore so other messages can be sent in the meantime
+            record_rate_limit_wait(delay)
+            _ = await self.sleep(delay)
+
+    async def send(self, member: Member, content: str) -> DeliveryResult:
+        """ Sends a direct message to a member, retrying transient errors. """
+        attempts = 0
+
+        async def send_once():
+            nonlocal attempts
+            attempts += 1
+            _ = await member.send(content,
+                                  allowed_mentions=AllowedMentions.all())
+
+        try:
+            _ = await self.call_with_retries(send_once)
+        except Exception as error:
+            logger.warning("Could not send a direct message to member %d: %r",
+                           member.id, error)
+            return DeliveryResult(member_id=member.id,
+                                  succeeded=False,
+                                  attempts=attempts,
+                                  error=repr(error))
+        return DeliveryResult(member_id=member.id,
+                              succeeded=True,
+                              attempts=attempts)
+
+    async def send_all(
+            self,
+            messages: Iterable[Tuple[Member, str]]) -> List[DeliveryResult]:
+        """ Sends every (member, content) direct message concurrently and returns the results in the same order. """
+        return list(await asyncio.gather(
+            *[self.send(member, content) for member, content in messages]))
+
+    async def introduce_in_dms(
+            self, groups: Iterable[Sequence[Member]]) -> List[DeliveryResult]:
+        """ Sends every member of every pairing group a direct message introducing the rest of their group. """
+        return await self.send_all((member, intro_message(member, group))
+                                   for group in groups for member in group)
+
+    async def introduce_in_thread(self, channel: TextChannel, name: str,
+                                  group: Sequence[Member]) -> List[DeliveryResult]:
+        """ Opens a private thread in channel and mentions every member of the group in it, which adds them to the thread. """
+        attempts = 0
+        thread = None
+
+        async def create_and_send():
+            nonlocal attempts, thread
+            attempts += 1
+            if thread is None:
+                thread = await channel.create_thread(
+                    name=name[:MAX_THREAD_NAME_LENGTH],
+                    type=ChannelType.private_thread,
+                    invitable=False)
+            _ = await thread.send(group_intro_message(group),
+                                  allowed_mentions=AllowedMentions.all())
+
+        try:
+            _ = await self.call_with_retries(create_and_send)
+        except Exception as error:
+            logger.warning("Could not introduce pairing group %r in a thread: %r",
+                           [member.id for member in group], error)
+            return [
+                DeliveryResult(member_id=member.id,
+                               succeeded=False,
+                               attempts=attempts,
+                               error=repr(error)) for member in group
+            ]
+        return [
+            DeliveryResult(member_id=member.id,
+                           succeeded=True,
+                           attempts=attempts) for member in group
+        ]
+
+    async def introduce_in_threads(
+            self, channel: TextChannel, name: str,
+            groups: Iterable[Sequence[Member]]) -> List[DeliveryResult]:
+        """ Introduces every pairing group in its own private thread of channel, named name followed by the group's member names. """
+        results = await asyncio.gather(*[
+            self.introduce_in_thread(
+                channel, f"{name}: {', '.join(m.name for m in group)}", group)
+            for group in groups
+        ])
+        return [result for group_results in results for result in group_results]
+
+
+def log_delivery_results(results: List[DeliveryResult]):
+    failed = [result for result in results if not result.succeeded]
+    logger.info("Introduced %d members to their pairing groups, %d failed",
+                len(results) - len(failed), len(failed))
+    for result in failed:
+        logger.info("Could not introduce member %d after %d attempts: %s",
+                    result.member_id, result.attempts, result.error)
@@ -0,0 +1,279 @@
+"""
+random1on1.api.history
+
+The HistoryEdgeTable is the merged pairing history as a flat table with one row per pair of members that have met, keyed by their member IDs. Every
+row records how often the pair met and the dates of their first and last meeting. Pairings are added one at a time, so merging the whole history is a
+single pass over the pairings instead of repeatedly composing growing graphs.
+
+Matching algorithms consume the table directly through HistoryEdgeTable.edges(), which yields the same (member, member, attributes) triples as
+Pairings.edges() does for a merged pairing graph, with the attributes `meetings`, `first_met` and `last_met`.
+
+The WeeklyHistoryIndex buckets the history by week, with one HistoryEdgeTable per week. A lookback window then only merges the buckets it covers,
+and the encoded buckets of older weeks are never even decompressed.
+"""
+import zlib
+from array import array
+from datetime import datetime
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from random1on1.api.wire import read_varint
+from random1on1.api.wire import write_varint
+
+UNKNOWN_DATE = 0
+ID_BITS = 64
+
+
+def to_ordinal(date: Optional[datetime]) -> int:
+    return UNKNOWN_DATE if date is None else date.toordinal()
+
+
+def from_ordinal(ordinal: int) -> Optional[datetime]:
+    return None if ordinal == UNKNOWN_DATE else datetime.fromordinal(ordinal)
+
+
+class HistoryEdgeTable:
+    """
+    Edge table of the merged pairing history. Rows live in parallel arrays (member IDs, meeting count, and the first and last meeting dates as
+    ordinals), and the row of a pair is found through a dictionary keyed by the pair packed into a single integer, so a row costs a few dozen bytes.
+    Dates may be unknown (e.g. for rows restored from old checkpoints), in which case they are exported as None.
+    """
+
+    def __init__(self):
+        self.rows: Dict[int, int] = {}
+        self.person_1_ids = array("Q")
+        self.person_2_ids = array("Q")
+        self.meetings = array("I")
+        self.first_met = array("i")
+        self.last_met = array("i")
+        self.num_pairings = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @staticmethod
+    def key(person_1_id: int, person_2_id: int) -> Tuple[int, int, int]:
+        if person_1_id > person_2_id:
+            person_1_id, person_2_id = person_2_id, person_1_id
+        return (person_1_id << ID_BITS) | person_2_id, person_1_id, person_2_id
+
+    def add_meeting(self,
+                    person_1_id: int,
+                    person_2_id: int,
+                    first_met: int = UNKNOWN_DATE,
+                    last_met: int = UNKNOWN_DATE,
+                    meetings: int = 1):
+        """ Records that a pair met (meetings times, between the date ordinals first_met and last_met). """
+        if person_1_id == person_2_id:
+            return
+        key, person_1_id, person_2_id = self.key(person_1_id, person_2_id)
+        row = self.rows.get(key)
+        if row is None:
+            self.rows[key] = len(self.meetings)
+            self.person_1_ids.append(person_1_id)
+            self.person_2_ids.append(person_2_id)
+            self.meetings.append(meetings)
+            self.first_met.append(first_met)
+            self.last_met.append(last_met)
+            return
+        self.meetings[row] += meetings
+        if first_met != UNKNOWN_DATE and (self.first_met[row] == UNKNOWN_DATE
+                                          or first_met < self.first_met[row]):
+            self.first_met[row] = first_met
+        if last_met > self.last_met[row]:
+            self.last_met[row] = last_met
+
+    def add_pairing(self, pairs: Iterable[Tuple[int, int]],
+                    date_of_pairing: Optional[datetime]):
+        """ Adds every pair of a pairing that took place on date_of_pairing. """
+        ordinal = to_ordinal(date_of_pairing)
+        for person_1_id, person_2_id in pairs:
+            self.add_meeting(person_1_id, person_2_id, ordinal, ordinal)
+        self.num_pairings += 1
+
+    def update(self, other: "HistoryEdgeTable"):
+        """ Merges another table (e.g. the pairings written after a checkpoint) into this one. """
+        for row in range(len(other.meetings)):
+            self.add_meeting(other.person_1_ids[row], other.person_2_ids[row],
+                             other.first_met[row], other.last_met[row],
+                             other.meetings[row])
+        self.num_pairings += other.num_pairings
+
+    def has_pair(self, person_1_id: int, person_2_id: int) -> bool:
+        return self.key(person_1_id, person_2_id)[0] in self.rows
+
+    def pairs(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.person_1_ids, self.person_2_ids)
+
+    def edges(self) -> Iterator[Tuple[int, int, dict]]:
+        """ Yields (member ID, member ID, attributes) for every pair that has met, like Pairings.edges(). """
+        for row in range(len(self.meetings)):
+            yield self.person_1_ids[row], self.person_2_ids[row], {
+                "meetings": self.meetings[row],
+                "first_met": from_ordinal(self.first_met[row]),
+                "last_met": from_ordinal(self.last_met[row]),
+            }
+
+    def to_graph(self, resolve: Optional[Callable] = None):
+        """ Builds a networkx Graph with the table's attributes on its edges. resolve maps member IDs to nodes; unresolvable pairs are dropped. """
+        from networkx import Graph
+
+        graph = Graph()
+        for person_1_id, person_2_id, data in self.edges():
+            if resolve is not None:
+                person_1_id, person_2_id = resolve(person_1_id), resolve(
+                    person_2_id)
+                if person_1_id is None or person_2_id is None:
+                    continue
+            graph.add_edge(person_1_id, person_2_id, **data)
+        return graph
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary encoding: the sorted, distinct member IDs delta coded as varints, then every row as two indices into that table, the
+        meeting count, the first meeting ordinal and the number of days from the first to the last meeting, all zlib-compressed.
+        """
+        ids = sorted(set(self.person_1_ids) | set(self.person_2_ids))
+        index = {member_id: position for position, member_id in enumerate(ids)}
+
+        output = bytearray()
+        write_varint(self.num_pairings, output)
+        write_varint(len(ids), output)
+        previous = 0
+        for member_id in ids:
+            write_varint(member_id - previous, output)
+            previous = member_id
+        write_varint(len(self.meetings), output)
+        for row in range(len(self.meetings)):
+            write_varint(index[self.person_1_ids[row]], output)
+            write_varint(index[self.person_2_ids[row]], output)
+            write_varint(self.meetings[row], output)
+            write_varint(self.first_met[row], output)
+            write_varint(self.last_met[row] - self.first_met[row], output)
+        return zlib.compress(bytes(output), 9)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HistoryEdgeTable":
+        data = zlib.decompress(data)
+        table = cls()
+        num_pairings, position = read_varint(data, 0)
+        num_ids, position = read_varint(data, position)
+        ids = []
+        previous = 0
+        for _ in range(num_ids):
+            delta, position = read_varint(data, position)
+            previous += delta
+            ids.append(previous)
+        num_rows, position = read_varint(data, position)
+        for _ in range(num_rows):
+            index_1, position = read_varint(data, position)
+            index_2, position = read_varint(data, position)
+            meetings, position = read_varint(data, position)
+            first_met, position = read_varint(data, position)
+            days, position = read_varint(data, position)
+            table.add_meeting(ids[index_1], ids[index_2], first_met,
+                              first_met + days, meetings)
+        table.num_pairings = num_pairings
+        return table
+
+
+def week_of(date: Optional[datetime]) -> int:
+    """ Ordinal of the Monday starting the week of date, or UNKNOWN_DATE for undated history. """
+    if date is None:
+        return UNKNOWN_DATE
+    return date.toordinal() - date.weekday()
+
+
+class WeeklyHistoryIndex:
+    """
+    The pairing history bucketed by week: one HistoryEdgeTable per week (keyed by the ordinal of its Monday, see week_of), plus an undated bucket
+    (UNKNOWN_DATE) for pairings without a date. Buckets restored from bytes stay encoded until they are needed.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[int, HistoryEdgeTable] = {}
+        self.encoded: Dict[int, Tuple[int, bytes]] = {}
+
+    def weeks(self) -> List[int]:
+        return sorted(set(self.buckets) | set(self.encoded))
+
+    @property
+    def num_pairings(self) -> int:
+        return sum(table.num_pairings for table in self.buckets.values()) + sum(
+            num_pairings for num_pairings, _ in self.encoded.values())
+
+    def bucket(self, week: int) -> HistoryEdgeTable:
+        """ The table of a week, decoding it first if needed and creating it if the week has no pairings yet. """
+        if week not in self.buckets:
+            if week in self.encoded:
+                _, data = self.encoded.pop(week)
+                self.buckets[week] = HistoryEdgeTable.from_bytes(data)
+            else:
+                self.buckets[week] = HistoryEdgeTable()
+        return self.buckets[week]
+
+    def add_pairing(self, pairs: Iterable[Tuple[int, int]],
+                    date_of_pairing: Optional[datetime]):
+        self.bucket(week_of(date_of_pairing)).add_pairing(pairs, date_of_pairing)
+
+    def update(self, other: "WeeklyHistoryIndex"):
+        for week in other.weeks():
+            self.bucket(week).update(other.bucket(week))
+
+    def covers(self, week: int, date_from: Optional[datetime],
+               date_to: Optional[datetime]) -> bool:
+        if week == UNKNOWN_DATE:
+            return date_from is None and date_to is None
+        if date_from is not None and week + 6 < date_from.toordinal():
+            return False
+        return date_to is None or week <= date_to.toordinal()
+
+    def merged(self,
+               date_from: Optional[datetime] = None,
+               date_to: Optional[datetime] = None) -> HistoryEdgeTable:
+        """ Merges the buckets of every week that overlaps date_from to date_to (both optional) into a single table. """
+        table = HistoryEdgeTable()
+        for week in self.weeks():
+            if self.covers(week, date_from, date_to):
+                table.update(self.bucket(week))
+        return table
+
+    def to_bytes(self) -> bytes:
+        """ The number of weeks followed by every week's ordinal, pairing count, encoded length and encoded table. """
+        output = bytearray()
+        weeks = self.weeks()
+        write_varint(len(weeks), output)
+        for week in weeks:
+            if week in self.encoded:
+                num_pairings, data = self.encoded[week]
+            else:
+                num_pairings, data = self.buckets[week].num_pairings, self.buckets[
+                    week].to_bytes()
+            write_varint(week, output)
+            write_varint(num_pairings, output)
+            write_varint(len(data), output)
+            output += data
+        return bytes(output)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "WeeklyHistoryIndex":
+        index = cls()
+        num_weeks, position = read_varint(data, 0)
+        for _ in range(num_weeks):
+            week, position = read_varint(data, position)
+            num_pairings, position = read_varint(data, position)
+            length, position = read_varint(data, position)
+            index.encoded[week] = (num_pairings,
+                                   data[position:position + length])
+            position += length
+        return index
+
+
+# The history as a store hands it to a MatchingJob: merged already, or as weekly buckets the worker merges (see random1on1.api.workers)
+StoredHistory = Union[HistoryEdgeTable, WeeklyHistoryIndex]
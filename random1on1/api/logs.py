@@ -0,0 +1,167 @@
+"""
+random1on1.api.logs
+
+Logging for the bot. Every module logs to the shared "discord" logger, and configure_logging() attaches its stdout handler exactly once, however
+often it is called.
+
+The LoggingChannelHandler persists a guild's logs in its LoggingChannel, so they outlive the ephemeral runs of the bot. Logging must never slow the
+run down, so the handler only formats a record and puts it on a bounded queue; a background task drains the queue every flush_interval seconds (and
+once more when the handler is stopped) and sends the records batched into as few messages as they fit in. When records arrive faster than they can
+be sent, the handler keeps going without them: records that do not fit into the queue are dropped, records that do not fit into a flush's messages
+are left out, and both are summarized in the next message.
+
+Records are attributed to a guild through the current_guild context variable, which every Random1on1GuildProgram sets in its own task, so the logs
+of concurrently running guilds do not end up in each other's channels. Records of discord.py itself (e.g. of the requests that send the logs) are
+never sent.
+"""
+import asyncio
+import logging
+import queue
+import sys
+from contextvars import ContextVar
+from typing import List
+from typing import Optional
+from typing import TYPE_CHECKING
+
+from random1on1.api.announcements import pack_lines
+from random1on1.api.wire import MAX_MESSAGE_LENGTH
+
+if TYPE_CHECKING:
+    from discord import TextChannel
+
+LOGGER_NAME = "discord"
+STDOUT_HANDLER_NAME = "random1on1-stdout"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+DEFAULT_MAX_QUEUE_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_MESSAGES_PER_FLUSH = 5
+CODE_BLOCK = "```"
+
+current_guild: ContextVar[Optional[int]] = ContextVar("current_guild",
+                                                      default=None)
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+def configure_logging(level: int = logging.DEBUG) -> logging.Logger:
+    """ Sets the level of the bot's logger and attaches a stdout handler to it, unless one is already attached. """
+    logger.setLevel(level)
+    if not any(handler.get_name() == STDOUT_HANDLER_NAME
+               for handler in logger.handlers):
+        stream = logging.StreamHandler(sys.stdout)
+        stream.set_name(STDOUT_HANDLER_NAME)
+        stream.setLevel(logging.DEBUG)
+        logger.addHandler(stream)
+    return logger
+
+
+class LoggingChannelHandler(logging.Handler):
+    """
+    Batches the bot's log records of one guild into messages in a channel, see the module docstring. Call start() from within the event loop
+    before logging and stop() when the run is over.
+
+    Args:
+        channel (TextChannel) - the channel the logs are sent to
+        guild_id (int) - only records logged while current_guild is this guild are sent
+        level (int) - the minimum level of the records that are sent
+        max_queue_size (int) - the number of records waiting to be sent after which records are dropped
+        flush_interval (float) - seconds between two flushes
+        max_messages_per_flush (int) - the number of messages a flush sends at most, the rest of its records are left out
+        max_message_length (int) - the maximum length of a message
+    """
+
+    def __init__(self,
+                 channel: "TextChannel",
+                 guild_id: int,
+                 level: int = logging.INFO,
+                 max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_messages_per_flush: int = DEFAULT_MAX_MESSAGES_PER_FLUSH,
+                 max_message_length: int = MAX_MESSAGE_LENGTH):
+        super().__init__(level=level)
+        self.channel = channel
+        self.guild_id = guild_id
+        self.flush_interval = flush_interval
+        self.max_messages_per_flush = max_messages_per_flush
+        self.max_chunk_length = max_message_length - 2 * len(
+            CODE_BLOCK) - 2
+        self.records: "queue.Queue[str]" = queue.Queue(maxsize=max_queue_size)
+        self.num_dropped = 0
+        self.closing: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (record.name == LOGGER_NAME
+                and current_guild.get() == self.guild_id
+                and super().filter(record))
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self.records.put_nowait(line)
+        except queue.Full:
+            self.num_dropped += 1
+
+    def drain(self) -> List[str]:
+        lines = []
+        while True:
+            try:
+                lines.append(self.records.get_nowait())
+            except queue.Empty:
+                return lines
+
+    async def flush_to_channel(self):
+        """ Sends every queued record, batched into at most max_messages_per_flush messages. """
+        lines = [line + "\n" for line in self.drain()]
+        if self.num_dropped:
+            lines.insert(
+                0,
+                f"... {self.num_dropped} log records were dropped because they were logged faster than they could be sent\n"
+            )
+            self.num_dropped = 0
+        chunks = list(pack_lines(lines, self.max_chunk_length))
+        if len(chunks) > self.max_messages_per_flush:
+            num_left_out = sum(
+                chunk.count("\n")
+                for chunk in chunks[self.max_messages_per_flush - 1:])
+            chunks = chunks[:self.max_messages_per_flush - 1] + [
+                f"... {num_left_out} more lines of logs were left out\n"
+            ]
+        for chunk in chunks:
+            try:
+                _ = await self.channel.send(f"{CODE_BLOCK}\n{chunk}{CODE_BLOCK}")
+            except Exception as error:
+                # Logging the error would queue it for this very channel, so it only goes to stderr
+                print(f"Could not send logs to the logging channel: {error!r}",
+                      file=sys.stderr)
+                return
+
+    async def run(self):
+        while not self.closing.is_set():
+            try:
+                _ = await asyncio.wait_for(self.closing.wait(),
+                                           timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                _ = await self.flush_to_channel()
+        _ = await self.flush_to_channel()
+
+    def start(self, target: logging.Logger = logger):
+        """ Starts flushing in the background and attaches the handler to target (the bot's logger by default). """
+        self.closing = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+        if self not in target.handlers:
+            target.addHandler(self)
+
+    async def stop(self, target: logging.Logger = logger):
+        """ Detaches the handler from target and sends the records that are still queued. """
+        target.removeHandler(self)
+        if self.task is None:
+            return
+        self.closing.set()
+        _ = await self.task
+        self.task = None
@@ -0,0 +1,150 @@
+"""
+random1on1.api.members
+
+By default the bot asks discord for every member of every guild when it connects (guild chunking) and then reads the participants off
+Role.members. In large guilds chunking dominates the time to ready and the memory of a run, although only the holders of the random1on1 role are
+ever needed. In lean startup mode the bot connects without chunking and without a member cache instead, and each program fetches the holders of its
+role itself with fetch_role_members: the guild's member list is paged through over REST, and only the role holders are kept. The fetched members are
+looked up through a MemberDirectory instead of the guild's (empty) member cache.
+
+Pairing histories only hold member IDs, so no other members need to be fetched.
+
+A bot that stays connected (see the daemon mode of Random1on1Bot) does not have to look for the participants again in every run either: a
+ParticipantIndex is built by the first run and then kept up to date from the member events of the gateway (members joining, leaving and having
+their roles changed), so later runs start from its ID array right away. Discord only sends these events for members in the member cache, so the
+index is not used with lean startup.
+"""
+import logging
+import time
+from array import array
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from discord import Guild
+    from discord import Member
+    from discord import Role
+
+logger = logging.getLogger("discord")
+
+
+class MemberDirectory:
+    """
+    Stands in for a guild's member cache: looks up members by ID among the members it was given, like Guild.get_member().
+
+    Args:
+        members (Iterable[Member]) - the members to look up
+    """
+
+    def __init__(self, members: Iterable["Member"]):
+        self.members: Dict[int, "Member"] = {
+            member.id: member
+            for member in members
+        }
+
+    def get_member(self, member_id: int) -> Optional["Member"]:
+        return self.members.get(member_id)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+
+def has_role(member: "Member", role: "Role") -> bool:
+    return any(member_role.id == role.id for member_role in member.roles)
+
+
+class ParticipantIndex:
+    """
+    The holders of a role as a dense array of member IDs, maintained incrementally instead of being read off Role.members in every run. Removing
+    a participant moves the last one into its place, so adding and removing participants are O(1) and the array never has gaps. Like a
+    MemberDirectory, the index looks up its participants by ID.
+
+    Args:
+        role (Role) - the role whose holders are indexed
+        members (Iterable[Member]) - the current holders of the role
+    """
+
+    def __init__(self, role: "Role", members: Iterable["Member"] = ()):
+        self.role = role
+        self.ids = array("Q")
+        self.positions: Dict[int, int] = {}
+        self.members: Dict[int, "Member"] = {}
+        for member in members:
+            _ = self.add(member)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self.positions
+
+    def get_member(self, member_id: int) -> Optional["Member"]:
+        return self.members.get(member_id)
+
+    def add(self, member: "Member") -> bool:
+        """ Adds a participant (or refreshes the Member of one already indexed) and tells whether it was new. """
+        self.members[member.id] = member
+        if member.id in self.positions:
+            return False
+        self.positions[member.id] = len(self.ids)
+        self.ids.append(member.id)
+        return True
+
+    def remove(self, member_id: int) -> bool:
+        """ Removes a participant and tells whether it was indexed. """
+        position = self.positions.pop(member_id, None)
+        if position is None:
+            return False
+        del self.members[member_id]
+        last_id = self.ids.pop()
+        if last_id != member_id:
+            self.ids[position] = last_id
+            self.positions[last_id] = position
+        return True
+
+    def update(self, member: "Member"):
+        """ Adds or removes a member depending on whether they currently hold the role. """
+        if has_role(member, self.role):
+            if self.add(member):
+                logger.debug("Member %d joined the participants", member.id)
+        elif self.remove(member.id):
+            logger.debug("Member %d left the participants", member.id)
+
+    def participant_ids(self) -> Tuple[int, ...]:
+        return tuple(self.ids)
+
+    def participants(self) -> List["Member"]:
+        return [self.members[member_id] for member_id in self.ids]
+
+
+async def fetch_role_members(guild: "Guild", role: "Role") -> List["Member"]:
+    """ Pages through the member list of a guild and returns the members holding role, without caching anyone else. """
+    start = time.monotonic()
+    members = []
+    num_scanned = 0
+    async for member in guild.fetch_members(limit=None):
+        num_scanned += 1
+        if has_role(member, role):
+            members.append(member)
+    logger.debug(
+        "Fetched %d holders of role %s among %d members of guild %d in %.2f seconds",
+        len(members), role.name, num_scanned, guild.id,
+        time.monotonic() - start)
+    return members
+
+
+def peak_memory_mib() -> Optional[float]:
+    """ Peak resident memory of the process in MiB, or None where the resource module is not available (e.g. on Windows). """
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
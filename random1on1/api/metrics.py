@@ -0,0 +1,220 @@
+"""
+random1on1.api.metrics
+
+Per-phase instrumentation of a run. Every Random1on1GuildProgram collects a RunMetrics for its guild, and the phases of the pipeline (setup, history
+read with its checkpoint/fetch/decode/merge steps, matching with its construct_potential_pairings/generate_pairs steps, announce and the introduction
+fan-out) each get a PhaseMetrics with
+
+    - seconds: wall time spent in the phase (for steps that are interleaved with others, like decoding the history while the next page is fetched,
+      the time spent in the step itself)
+    - api_calls: requests sent to discord while the phase was running
+    - rate_limit_waits / rate_limit_seconds: how often and how long requests waited for discord's rate limits (as reported by discord.py) or for
+      the MessageDispatcher's pacing and retries
+    - bytes_fetched: bytes of message contents and attachments read from discord
+    - peak_memory_mib: peak resident memory of the process when the phase ended
+
+Like the log records in random1on1.api.logs, measurements are attributed through context variables that each program sets in its own task, so the
+code being measured (e.g. the HistoryChannel) records into whatever run is current without having the metrics passed around, and records nothing
+outside of a run. The RunReport of a bot collects the RunMetrics of every guild and writes them as a JSON report and as a Prometheus textfile.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+from random1on1.api.members import peak_memory_mib
+
+PROMETHEUS_PREFIX = "random1on1"
+PROMETHEUS_METRICS = {
+    "seconds": "Wall time of a phase of the matching pipeline",
+    "api_calls": "Requests sent to discord during a phase",
+    "rate_limit_waits": "Times a request waited for a rate limit during a phase",
+    "rate_limit_seconds": "Seconds requests waited for rate limits during a phase",
+    "bytes_fetched": "Bytes of messages and attachments read from discord during a phase",
+    "peak_memory_mib": "Peak resident memory of the process at the end of a phase",
+}
+
+
+@dataclass
+class PhaseMetrics:
+
+    seconds: float = 0.0
+    api_calls: int = 0
+    rate_limit_waits: int = 0
+    rate_limit_seconds: float = 0.0
+    bytes_fetched: int = 0
+    peak_memory_mib: Optional[float] = None
+
+
+@dataclass
+class RunMetrics:
+    """ The metrics of every phase of one guild's run, in the order the phases started. """
+
+    guild_id: int
+    phases: Dict[str, PhaseMetrics] = field(default_factory=dict)
+    profile: Optional[str] = None
+
+    def get(self, phase: str) -> PhaseMetrics:
+        if phase not in self.phases:
+            self.phases[phase] = PhaseMetrics()
+        return self.phases[phase]
+
+    def to_dict(self) -> dict:
+        return {
+            "guild_id": self.guild_id,
+            "phases":
+            {phase: asdict(metrics)
+             for phase, metrics in self.phases.items()},
+            "profile": self.profile,
+        }
+
+
+current_run: ContextVar[Optional[RunMetrics]] = ContextVar("current_run",
+                                                           default=None)
+current_phase: ContextVar[Optional[PhaseMetrics]] = ContextVar(
+    "current_phase", default=None)
+
+
+@contextmanager
+def measure(phase: str) -> Iterator[Optional[PhaseMetrics]]:
+    """
+    Measures a phase of the current run: its wall time, and the API calls and rate-limit waits of everything running in the phase (including
+    tasks started from it). Phases can be nested, in which case requests are counted by the innermost phase. Does nothing outside of a run.
+    """
+    run = current_run.get()
+    if run is None:
+        yield None
+        return
+    metrics = run.get(phase)
+    token = current_phase.set(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.seconds += time.perf_counter() - start
+        metrics.peak_memory_mib = peak_memory_mib()
+        current_phase.reset(token)
+
+
+def record_time(phase: str, seconds: float):
+    """ Adds the time of a step that is interleaved with other steps (and so cannot be measured as a single block) to the current run. """
+    run = current_run.get()
+    if run is not None:
+        run.get(phase).seconds += seconds
+
+
+def record_bytes_fetched(phase: str, num_bytes: int):
+    run = current_run.get()
+    if run is not None:
+        run.get(phase).bytes_fetched += num_bytes
+
+
+def record_api_call():
+    metrics = current_phase.get()
+    if metrics is not None:
+        metrics.api_calls += 1
+
+
+def record_rate_limit_wait(seconds: float):
+    metrics = current_phase.get()
+    if metrics is not None:
+        metrics.rate_limit_waits += 1
+        metrics.rate_limit_seconds += seconds
+
+
+def instrument_http(http):
+    """ Counts every request of a discord.py HTTPClient towards the current phase. """
+    request = http.request
+
+    async def counted_request(*args, **kwargs):
+        record_api_call()
+        return await request(*args, **kwargs)
+
+    http.request = counted_request
+
+
+class RateLimitWaitHandler(logging.Handler):
+    """
+    discord.py waits out rate limits internally and only logs a warning with the delay when it does. This handler picks these warnings up (in the
+    task that waited, so they are attributed to its phase) and records the delay.
+    """
+
+    def emit(self, record: logging.LogRecord):
+        if "rate limit" not in str(record.msg) or "Retrying in" not in str(
+                record.msg):
+            return
+        delays = [arg for arg in record.args or () if isinstance(arg, float)]
+        record_rate_limit_wait(delays[0] if delays else 0.0)
+
+
+def instrument_rate_limits(logger_name: str = "discord.http"):
+    """ Attaches a RateLimitWaitHandler to discord.py's HTTP logger, unless one is already attached. """
+    http_logger = logging.getLogger(logger_name)
+    if not any(
+            isinstance(handler, RateLimitWaitHandler)
+            for handler in http_logger.handlers):
+        http_logger.addHandler(RateLimitWaitHandler(level=logging.WARNING))
+
+
+@dataclass
+class RunReport:
+    """ The metrics of a whole bot run: its startup and the RunMetrics of every guild. """
+
+    seconds_to_ready: Optional[float] = None
+    runs: List[RunMetrics] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds_to_ready": self.seconds_to_ready,
+            "peak_memory_mib": peak_memory_mib(),
+            "guilds": [run.to_dict() for run in self.runs],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=4)
+
+    def to_prometheus(self) -> str:
+        """ The report in the Prometheus text exposition format, one gauge per PhaseMetrics field labelled by guild and phase. """
+        lines = []
+        if self.seconds_to_ready is not None:
+            lines += [
+                f"# HELP {PROMETHEUS_PREFIX}_seconds_to_ready Seconds from starting the bot until it was connected to discord",
+                f"# TYPE {PROMETHEUS_PREFIX}_seconds_to_ready gauge",
+                f"{PROMETHEUS_PREFIX}_seconds_to_ready {self.seconds_to_ready}",
+            ]
+        for name, description in PROMETHEUS_METRICS.items():
+            metric = f"{PROMETHEUS_PREFIX}_phase_{name}"
+            lines += [
+                f"# HELP {metric} {description}", f"# TYPE {metric} gauge"
+            ]
+            for run in self.runs:
+                for phase, metrics in run.phases.items():
+                    value = getattr(metrics, name)
+                    if value is not None:
+                        lines.append(
+                            f'{metric}{{guild="{run.guild_id}",phase="{phase}"}} {value}'
+                        )
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str):
+        write_atomically(path, self.to_json())
+
+    def write_prometheus(self, path: str):
+        write_atomically(path, self.to_prometheus())
+
+
+def write_atomically(path: str, content: str):
+    """ Writes the file next to its destination first and then moves it in place, so readers (e.g. node_exporter) never see half a file. """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as output:
+        output.write(content)
+    os.replace(temporary_path, path)
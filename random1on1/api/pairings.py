@@ -1,16 +1,32 @@
+"""
+random1on1.api.pairings
+
+A Pairings object is one week's pairings (or a merged history of them) as a networkx graph whose nodes are plain integer discord member IDs. Members
+are only resolved when the pairings are presented (announced or sent as direct messages), so departed members never need to be looked up and never
+end up in the graph as placeholders.
+"""
 import json
 from datetime import datetime
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Tuple
+from typing import TYPE_CHECKING
 from typing import Union
 
-from discord import Guild
-from networkx import Graph
+if TYPE_CHECKING:
+    from discord import Guild
+    from discord import Member
+    from networkx import Graph
+
+    from random1on1.api.members import MemberDirectory
 
 
 class Pairings:
 
     def __init__(
         self,
-        pairing_graph: Graph,
+        pairing_graph: "Graph",
         date_of_pairing: datetime,
         dry_run: bool,
     ):
@@ -18,6 +34,10 @@ class Pairings:
         self.date_of_pairing = date_of_pairing
         self.dry_run = dry_run
 
+    def edges(self):
+        """ Yields (member ID, member ID, attributes) for every edge of the pairing graph, like HistoryEdgeTable.edges(). """
+        return self.pairing_graph.edges(data=True)
+
     def to_json(self) -> dict:
         json_dict = {
             "dry_run":
@@ -25,35 +45,49 @@ class Pairings:
             "date_of_pairing":
             self.date_of_pairing.strftime("%Y-%m-%d"),
             "pairing_graph":
-            [(edge[0].id, edge[1].id) for edge in self.pairing_graph.edges],
+            [(person_1_id, person_2_id)
+             for person_1_id, person_2_id in self.pairing_graph.edges],
         }
         return json_dict
 
 
-async def pairings_from_json(json_data: Union[str, dict],
-                             guild: Guild) -> Pairings:
+def pairings_from_json(json_data: Union[str, dict]) -> Pairings:
     if isinstance(json_data, str):
-        return await pairings_from_dict(dictionary=json.loads(json_data),
-                                        guild=guild)
+        return pairings_from_dict(dictionary=json.loads(json_data))
     else:
-        return await pairings_from_dict(dictionary=json_data, guild=guild)
+        return pairings_from_dict(dictionary=json_data)
 
 
-async def pairings_from_dict(dictionary: dict, guild: Guild) -> Pairings:
+def pairings_from_dict(dictionary: dict) -> Pairings:
+    from networkx import Graph
 
     dry_run = dictionary["dry_run"]
     date_of_pairing = datetime.strptime(dictionary["date_of_pairing"],
                                         "%Y-%m-%d")
 
-    pairing_edges = []
-    for person_1_id, person_2_id in dictionary["pairing_graph"]:
-        person_1 = guild.get_member(person_1_id)
-        person_2 = guild.get_member(person_2_id)
-        pairing_edges.append((person_1, person_2))
-
     pairing_graph = Graph()
-    pairing_graph.add_edges_from(pairing_edges)
+    pairing_graph.add_edges_from(
+        (person_1_id, person_2_id)
+        for person_1_id, person_2_id in dictionary["pairing_graph"])
 
     return Pairings(pairing_graph=pairing_graph,
                     date_of_pairing=date_of_pairing,
                     dry_run=dry_run)
+
+
+def resolve_members(
+        guild: Union["Guild", "MemberDirectory"],
+        member_ids: Iterable[int]) -> Tuple[Dict[int, "Member"], List[int]]:
+    """
+    Looks up the members with the given IDs in a guild's member cache (or a MemberDirectory). Returns the members that were found by ID and the
+    IDs of members who left the guild.
+    """
+    members = {}
+    departed = []
+    for member_id in member_ids:
+        member = guild.get_member(member_id)
+        if member is None:
+            departed.append(member_id)
+        else:
+            members[member_id] = member
+    return members, departed
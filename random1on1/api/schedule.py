@@ -0,0 +1,103 @@
+"""
+random1on1.api.schedule
+
+Cron-style schedules for the daemon mode of the Random1on1Bot, which stays connected and runs the program of every guild whenever its schedule is
+due. A schedule has the five fields of a crontab line, evaluated in the local time of the bot:
+
+    minute (0-59) hour (0-23) day-of-month (1-31) month (1-12) day-of-week (0-7, 0 and 7 are Sunday)
+
+Every field is a "*", a number, a range "a-b", a step "*/n" or "a-b/n", or a comma separated list of these. Like cron, a day matches when either
+the day of the month or the day of the week matches if both are restricted. For example "0 17 * * 1" runs every Monday at 17:00.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+from typing import FrozenSet
+from typing import Tuple
+
+DEFAULT_SCHEDULE = "0 17 * * 1"
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+# No schedule is due less often than once every few years (e.g. on February 29th that is a Monday), so searching further means it is never due
+MAX_SEARCH_DAYS = 366 * 30
+
+
+def parse_field(text: str, low: int, high: int) -> FrozenSet[int]:
+    values = set()
+    for part in text.split(","):
+        value_range, _, step = part.partition("/")
+        if value_range == "*":
+            start, end = low, high
+        elif "-" in value_range:
+            start, end = (int(value) for value in value_range.split("-", 1))
+        else:
+            start = end = int(value_range)
+            if step:
+                end = high
+        step = int(step) if step else 1
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(
+                f"Invalid schedule field {text}, values must be between {low} and {high}"
+            )
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+
+    minutes: FrozenSet[int]
+    hours: FrozenSet[int]
+    days_of_month: FrozenSet[int]
+    months: FrozenSet[int]
+    days_of_week: FrozenSet[int]
+    restricted_days: Tuple[bool, bool] = (False, False)
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSchedule":
+        """
+        Parses a crontab style expression, see the module docstring.
+
+        Raises:
+            ValueError - If the expression does not have five valid fields
+        """
+        fields = expression.split()
+        if len(fields) != len(FIELD_RANGES):
+            raise ValueError(
+                f"Schedule {expression!r} must have 5 fields: minute hour day-of-month month day-of-week"
+            )
+        try:
+            minutes, hours, days_of_month, months, days_of_week = (
+                parse_field(text, low, high)
+                for text, (low, high) in zip(fields, FIELD_RANGES))
+        except ValueError as error:
+            raise ValueError(f"Invalid schedule {expression!r}: {error}")
+        return cls(minutes=minutes,
+                   hours=hours,
+                   days_of_month=days_of_month,
+                   months=months,
+                   days_of_week=frozenset(day % 7 for day in days_of_week),
+                   restricted_days=(fields[2] != "*", fields[4] != "*"))
+
+    def matches_day(self, date: datetime) -> bool:
+        if date.month not in self.months:
+            return False
+        day_of_month = date.day in self.days_of_month
+        # datetime counts the days of the week from Monday (0), cron from Sunday (0)
+        day_of_week = (date.weekday() + 1) % 7 in self.days_of_week
+        if all(self.restricted_days):
+            return day_of_month or day_of_week
+        return day_of_month and day_of_week
+
+    def next_after(self, now: datetime) -> datetime:
+        """ The first time strictly after now at which the schedule is due. """
+        start = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(MAX_SEARCH_DAYS):
+            if self.matches_day(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError("The schedule is never due")
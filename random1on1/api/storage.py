@@ -0,0 +1,496 @@
+"""
+random1on1.api.storage
+
+History stores decouple where pairings are persisted from the matching program. Every store can write a week's pairings and read the merged history
+as a HistoryEdgeTable. There are three implementations:
+
+    1. DiscordHistoryStore: The default. Pairings live as messages in the HistoryChannel, so the bot needs no state besides discord itself.
+
+    2. SQLiteHistoryStore: Pairings live in a local SQLite database, indexed by guild, date and member pair, so the merged history is one
+                           aggregate query instead of paginating through the history channel. Needs a persistent volume.
+
+    3. MirroredHistoryStore: Reads from a local store and writes through to both the local store and the discord channel, so the history channel
+                             stays the shared source of truth. On its first read the local store catches up with the pairings of the channel it
+                             has not seen yet.
+
+A WarmHistoryStore can wrap any of them to keep the history in memory between the runs of a bot that stays connected (see the daemon mode of
+Random1on1Bot).
+"""
+import asyncio
+import logging
+import sqlite3
+from abc import ABC
+from abc import abstractmethod
+from collections import Counter
+from datetime import datetime
+from datetime import timedelta
+from typing import AsyncIterator
+from typing import FrozenSet
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from random1on1.api.history import HistoryEdgeTable
+from random1on1.api.history import StoredHistory
+from random1on1.api.history import WeeklyHistoryIndex
+from random1on1.api.pairings import Pairings
+from random1on1.api.wire import DATE_FORMAT
+from random1on1.api.wire import EncodedPairing
+
+if TYPE_CHECKING:
+    from random1on1.api.channels import HistoryChannel
+
+logger = logging.getLogger("discord")
+
+HISTORY_STORES = ["discord", "sqlite", "mirror"]
+DEFAULT_HISTORY_STORE = "discord"
+DEFAULT_HISTORY_DATABASE = "random1on1-history.sqlite3"
+
+
+def encode_pairings(pairings: Pairings) -> EncodedPairing:
+    return EncodedPairing(date_of_pairing=pairings.date_of_pairing,
+                          dry_run=pairings.dry_run,
+                          pairs=tuple(
+                              tuple(pair)
+                              for pair in pairings.to_json()["pairing_graph"]))
+
+
+def pairing_key(
+        pairing: EncodedPairing) -> Tuple[str, FrozenSet[Tuple[int, int]]]:
+    """ Identifies a pairing by its date and pairs, independent of the order of the pairs. """
+    return (pairing.date_of_pairing.strftime(DATE_FORMAT),
+            frozenset((min(pair), max(pair)) for pair in pairing.pairs))
+
+
+async def index_pairings(
+        pairings: AsyncIterator[EncodedPairing]) -> WeeklyHistoryIndex:
+    index = WeeklyHistoryIndex()
+    async for pairing in pairings:
+        index.add_pairing(pairing.pairs, pairing.date_of_pairing)
+    return index
+
+
+class HistoryStore(ABC):
+    """ Abstract base class of the places pairings can be persisted in. """
+
+    @abstractmethod
+    async def write_pairings(self, pairings: Pairings):
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def read_history_table(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None) -> HistoryEdgeTable:
+        """ Merges every official pairing between date_from (defaulting to the start of the program) and date_to (defaulting to now). """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def iterate_pairings(
+            self,
+            date_from: Optional[datetime] = None
+    ) -> AsyncIterator[EncodedPairing]:
+        """ Yields every official pairing in the store dated date_from (defaulting to the start of the program) or later, oldest first. """
+        raise NotImplementedError()
+
+    async def read_history_index(self) -> WeeklyHistoryIndex:
+        """ The whole official history bucketed by week. """
+        return await index_pairings(self.iterate_pairings())
+
+    async def read_history(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None) -> StoredHistory:
+        """
+        The history between date_from and date_to for a MatchingJob. Stores that merge off the event loop (e.g. in the database) return the merged
+        table, the others a WeeklyHistoryIndex covering at least date_from to date_to, which the matching worker merges.
+        """
+        return await self.read_history_table(date_from=date_from,
+                                             date_to=date_to)
+
+
+class DiscordHistoryStore(HistoryStore):
+    """ Stores the pairings as messages in a HistoryChannel. """
+
+    def __init__(self, history_channel: "HistoryChannel"):
+        self.history_channel = history_channel
+
+    async def write_pairings(self, pairings: Pairings):
+        _ = await self.history_channel.write_pairings(pairings)
+
+    async def read_history_table(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None) -> HistoryEdgeTable:
+        return await self.history_channel.read_history_table(
+            date_from=date_from, date_to=date_to)
+
+    async def read_history_index(self) -> WeeklyHistoryIndex:
+        return await self.history_channel.read_history_index()
+
+    async def read_history(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None) -> StoredHistory:
+        return await self.history_channel.read_history_index(
+            date_from=date_from, date_to=date_to)
+
+    async def iterate_pairings(
+            self,
+            date_from: Optional[datetime] = None
+    ) -> AsyncIterator[EncodedPairing]:
+        from random1on1.api.channels import PROGRAM_START
+
+        # Messages are dated in UTC and pairings in local time, so start a day early and filter the pairings by their own date
+        after = (PROGRAM_START if date_from is None else date_from -
+                 timedelta(days=1))
+        async for _, pairing, _ in self.history_channel.iterate_pairings(
+                after, None, include_dry_runs=False):
+            if pairing is not None and (date_from is None
+                                        or pairing.date_of_pairing >= date_from):
+                yield pairing
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """
+    Stores the pairings of one guild in a SQLite database that may be shared by many guilds. Queries run in the default executor so they never
+    block the event loop. The sync_markers table records the date of the newest pairing copied from a remote store (see MirroredHistoryStore).
+
+    Args:
+        path (str) - location of the database file, which is created if it does not exist
+        guild_id (int) - the guild whose pairings this store reads and writes
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pairings (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            date_of_pairing TEXT NOT NULL,
+            dry_run INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS pairs (
+            pairing_id INTEGER NOT NULL REFERENCES pairings (id),
+            guild_id INTEGER NOT NULL,
+            date_of_pairing TEXT NOT NULL,
+            person_1_id INTEGER NOT NULL,
+            person_2_id INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sync_markers (
+            guild_id INTEGER PRIMARY KEY,
+            date_of_pairing TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS pairings_by_guild_and_date ON pairings (guild_id, date_of_pairing);
+        CREATE INDEX IF NOT EXISTS pairs_by_guild_and_date ON pairs (guild_id, date_of_pairing);
+        CREATE INDEX IF NOT EXISTS pairs_by_guild_and_pair ON pairs (guild_id, person_1_id, person_2_id);
+    """
+
+    def __init__(self, path: str, guild_id: int):
+        self.path = path
+        self.guild_id = guild_id
+        connection = self.connect()
+        try:
+            connection.executescript(self.SCHEMA)
+        finally:
+            connection.close()
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    async def run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, function, *args)
+
+    def insert_pairings(self,
+                        pairings: Iterable[EncodedPairing],
+                        synced_until: Optional[datetime] = None):
+        """
+        Inserts pairings in a single transaction. Only the pairs of official pairings are stored, dry runs are kept for the record only. If
+        synced_until is given, the sync marker is moved forward to it in the same transaction.
+        """
+        connection = self.connect()
+        try:
+            with connection:
+                self.insert_pairings_in_transaction(connection, pairings)
+                if synced_until is not None:
+                    connection.execute(
+                        """
+                        INSERT INTO sync_markers (guild_id, date_of_pairing) VALUES (?, ?)
+                        ON CONFLICT (guild_id) DO UPDATE SET date_of_pairing = MAX(date_of_pairing, excluded.date_of_pairing)
+                        """, (self.guild_id,
+                              synced_until.strftime(DATE_FORMAT)))
+        finally:
+            connection.close()
+
+    def insert_pairings_in_transaction(self, connection: sqlite3.Connection,
+                                       pairings: Iterable[EncodedPairing]):
+        for pairing in pairings:
+            date_of_pairing = pairing.date_of_pairing.strftime(DATE_FORMAT)
+            cursor = connection.execute(
+                "INSERT INTO pairings (guild_id, date_of_pairing, dry_run) VALUES (?, ?, ?)",
+                (self.guild_id, date_of_pairing, int(pairing.dry_run)))
+            if pairing.dry_run:
+                continue
+            connection.executemany(
+                "INSERT INTO pairs (pairing_id, guild_id, date_of_pairing, person_1_id, person_2_id) VALUES (?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, self.guild_id, date_of_pairing, min(pair),
+                  max(pair)) for pair in pairing.pairs])
+
+    def select_history_table(self, date_from: Optional[datetime],
+                             date_to: Optional[datetime]) -> HistoryEdgeTable:
+        date_from = date_from.strftime(
+            DATE_FORMAT) if date_from is not None else ""
+        date_to = date_to.strftime(
+            DATE_FORMAT) if date_to is not None else "9999-12-31"
+        table = HistoryEdgeTable()
+        connection = self.connect()
+        try:
+            for person_1_id, person_2_id, meetings, first_met, last_met in connection.execute(
+                    """
+                    SELECT person_1_id, person_2_id, COUNT(*), MIN(date_of_pairing), MAX(date_of_pairing)
+                    FROM pairs
+                    WHERE guild_id = ? AND date_of_pairing >= ? AND date_of_pairing <= ?
+                    GROUP BY person_1_id, person_2_id
+                    """, (self.guild_id, date_from, date_to)):
+                table.add_meeting(
+                    person_1_id, person_2_id,
+                    datetime.strptime(first_met, DATE_FORMAT).toordinal(),
+                    datetime.strptime(last_met, DATE_FORMAT).toordinal(),
+                    meetings)
+            table.num_pairings = connection.execute(
+                """
+                SELECT COUNT(*) FROM pairings
+                WHERE guild_id = ? AND dry_run = 0 AND date_of_pairing >= ? AND date_of_pairing <= ?
+                """, (self.guild_id, date_from, date_to)).fetchone()[0]
+        finally:
+            connection.close()
+        return table
+
+    def select_pairings(self,
+                        date_from: Optional[datetime] = None
+                        ) -> List[EncodedPairing]:
+        date_from = date_from.strftime(
+            DATE_FORMAT) if date_from is not None else ""
+        connection = self.connect()
+        try:
+            rows = connection.execute(
+                """
+                SELECT pairings.id, pairings.date_of_pairing, pairs.person_1_id, pairs.person_2_id
+                FROM pairings JOIN pairs ON pairs.pairing_id = pairings.id
+                WHERE pairings.guild_id = ? AND pairings.dry_run = 0 AND pairings.date_of_pairing >= ?
+                ORDER BY pairings.date_of_pairing, pairings.id
+                """, (self.guild_id, date_from)).fetchall()
+        finally:
+            connection.close()
+        pairings = []
+        current_id = None
+        for pairing_id, date_of_pairing, person_1_id, person_2_id in rows:
+            if pairing_id != current_id:
+                current_id = pairing_id
+                pairings.append((date_of_pairing, []))
+            pairings[-1][1].append((person_1_id, person_2_id))
+        return [
+            EncodedPairing(date_of_pairing=datetime.strptime(
+                date_of_pairing, DATE_FORMAT),
+                           dry_run=False,
+                           pairs=tuple(pairs))
+            for date_of_pairing, pairs in pairings
+        ]
+
+    def count_pairings(self) -> int:
+        connection = self.connect()
+        try:
+            return connection.execute(
+                "SELECT COUNT(*) FROM pairings WHERE guild_id = ?",
+                (self.guild_id, )).fetchone()[0]
+        finally:
+            connection.close()
+
+    def select_sync_marker(self) -> Optional[datetime]:
+        """
+        Date of the newest pairing known to be copied from the remote store, falling back to the newest official pairing for databases written
+        before sync markers existed. None for an empty store.
+        """
+        connection = self.connect()
+        try:
+            row = connection.execute(
+                "SELECT date_of_pairing FROM sync_markers WHERE guild_id = ?",
+                (self.guild_id, )).fetchone()
+            if row is None:
+                row = connection.execute(
+                    "SELECT MAX(date_of_pairing) FROM pairings WHERE guild_id = ? AND dry_run = 0",
+                    (self.guild_id, )).fetchone()
+        finally:
+            connection.close()
+        return datetime.strptime(row[0],
+                                 DATE_FORMAT) if row[0] is not None else None
+
+    async def write_pairings(self, pairings: Pairings, synced: bool = False):
+        """ Writes pairings, moving the sync marker forward to official pairings that are known to be in the remote store too if synced. """
+        _ = await self.run(
+            self.insert_pairings, [encode_pairings(pairings)],
+            pairings.date_of_pairing if synced and not pairings.dry_run else
+            None)
+
+    async def write_encoded_pairings(self,
+                                     pairings: List[EncodedPairing],
+                                     synced_until: Optional[datetime] = None):
+        _ = await self.run(self.insert_pairings, pairings, synced_until)
+
+    async def read_history_table(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None) -> HistoryEdgeTable:
+        return await self.run(self.select_history_table, date_from, date_to)
+
+    async def iterate_pairings(
+            self,
+            date_from: Optional[datetime] = None
+    ) -> AsyncIterator[EncodedPairing]:
+        for pairing in await self.run(self.select_pairings, date_from):
+            yield pairing
+
+    async def is_empty(self) -> bool:
+        return await self.run(self.count_pairings) == 0
+
+    async def read_sync_marker(self) -> Optional[datetime]:
+        return await self.run(self.select_sync_marker)
+
+
+class MirroredHistoryStore(HistoryStore):
+    """
+    Reads the history from a local SQLiteHistoryStore and writes every pairing through to both the remote store (written first, as it is the
+    shared source of truth) and the local one. The local store keeps a sync marker, the date of the newest pairing it has of the remote store. On
+    its first read the local store copies every pairing of the remote store from that date on that it does not have yet, so a fresh volume catches
+    up with the history channel in one pass and a stale one (e.g. after another bot wrote pairings, or after a local write failed) in a short one.
+
+    Args:
+        local (SQLiteHistoryStore) - the store reads are served from
+        remote (HistoryStore) - the store that is kept in sync, usually a DiscordHistoryStore
+    """
+
+    def __init__(self, local: SQLiteHistoryStore, remote: HistoryStore):
+        self.local = local
+        self.remote = remote
+        self.synced = False
+
+    async def sync(self):
+        if self.synced:
+            return
+        marker = await self.local.read_sync_marker()
+        logger.debug(
+            "Copying the pairings of the remote history store since %s into the local history store",
+            "the start" if marker is None else marker.strftime(DATE_FORMAT))
+        # The local store may already have some of the pairings dated on the marker's day (or later, if a local write failed in between)
+        known = Counter()
+        if marker is not None:
+            async for pairing in self.local.iterate_pairings(date_from=marker):
+                known[pairing_key(pairing)] += 1
+        pairings = []
+        async for pairing in self.remote.iterate_pairings(date_from=marker):
+            key = pairing_key(pairing)
+            if known[key] > 0:
+                known[key] -= 1
+                continue
+            pairings.append(pairing)
+        newest = max((pairing.date_of_pairing for pairing in pairings),
+                     default=marker)
+        _ = await self.local.write_encoded_pairings(pairings,
+                                                    synced_until=newest)
+        logger.debug("Copied %d pairings into the local history store",
+                     len(pairings))
+        self.synced = True
+
+    async def write_pairings(self, pairings: Pairings):
+        _ = await self.remote.write_pairings(pairings)
+        try:
+            _ = await self.local.write_pairings(pairings, synced=True)
+        except sqlite3.Error:
+            logger.exception(
+                "Could not write pairings to the local history store, catching up with the remote history store on the next read"
+            )
+            self.synced = False
+
+    async def read_history_table(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None) -> HistoryEdgeTable:
+        _ = await self.sync()
+        return await self.local.read_history_table(date_from=date_from,
+                                                    date_to=date_to)
+
+    async def iterate_pairings(
+            self,
+            date_from: Optional[datetime] = None
+    ) -> AsyncIterator[EncodedPairing]:
+        _ = await self.sync()
+        async for pairing in self.local.iterate_pairings(date_from=date_from):
+            yield pairing
+
+
+class WarmHistoryStore(HistoryStore):
+    """
+    Keeps the whole history of another store in memory as a WeeklyHistoryIndex. The index is read from the store on the first read only, and
+    afterwards every pairing written through this store is added to it, so later reads send no requests at all. This only holds while nothing else
+    writes to the store, e.g. for the one bot that stays connected and runs a guild's program on a schedule.
+
+    Args:
+        store (HistoryStore) - the store the history is read from and written to
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self.index: Optional[WeeklyHistoryIndex] = None
+
+    async def load(self) -> WeeklyHistoryIndex:
+        if self.index is None:
+            index = await self.store.read_history_index()
+            self.index = index
+            logger.debug("Loaded %d pairings into the warm history",
+                         index.num_pairings)
+        return self.index
+
+    async def write_pairings(self, pairings: Pairings):
+        _ = await self.store.write_pairings(pairings)
+        if self.index is not None and not pairings.dry_run:
+            encoded = encode_pairings(pairings)
+            self.index.add_pairing(encoded.pairs, encoded.date_of_pairing)
+
+    async def read_history_table(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None) -> HistoryEdgeTable:
+        index = await self.load()
+        return index.merged(date_from=date_from, date_to=date_to)
+
+    async def read_history_index(self) -> WeeklyHistoryIndex:
+        return await self.load()
+
+    async def read_history(
+            self,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None) -> StoredHistory:
+        return await self.load()
+
+    async def iterate_pairings(
+            self,
+            date_from: Optional[datetime] = None
+    ) -> AsyncIterator[EncodedPairing]:
+        async for pairing in self.store.iterate_pairings(date_from=date_from):
+            yield pairing
+
+
+def create_history_store(store: str, database: str, guild_id: int,
+                         history_channel: "HistoryChannel") -> HistoryStore:
+    """ Creates the history store named in the config (one of HISTORY_STORES). """
+    if store == "discord":
+        return DiscordHistoryStore(history_channel)
+    if store == "sqlite":
+        return SQLiteHistoryStore(database, guild_id)
+    if store == "mirror":
+        return MirroredHistoryStore(SQLiteHistoryStore(database, guild_id),
+                                    DiscordHistoryStore(history_channel))
+    raise ValueError(
+        f"Unknown history store {store}, choose one of {', '.join(HISTORY_STORES)}"
+    )
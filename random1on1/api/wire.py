@@ -0,0 +1,253 @@
+"""
+random1on1.api.wire
+
+Compact wire format for the pairings stored in the HistoryChannel. Discord messages hold at most 2000 characters, and a JSON list of decimal
+snowflake pairs exceeds that after a few dozen pairs, so pairings are written as
+
+    r1o1:<version>:<dry_run>:<date_of_pairing>:<group>:<part>/<parts>:<payload chunk>
+
+where dry_run is 0 or 1, date_of_pairing is YYYY-MM-DD, group is a random token shared by all messages of one pairing and the payload chunks of all
+parts concatenate to one base64 string. The header is plain text so readers can skip dry runs (or dates they are not interested in) without decoding
+anything. The payload is the zlib-compressed byte string
+
+    varint(number of IDs) varint(first ID) varint(second ID - first ID) ... varint(number of pairs) (varint(index) varint(index))...
+
+i.e. a table of the sorted, distinct member IDs, delta coded, followed by every pair as two indices into that table. All varints are unsigned LEB128.
+
+Messages written before this format existed are JSON objects (see Pairings.to_json) and are still decoded by PairingMessageDecoder. Their dry_run
+flag is the first key written by Pairings.to_json, so dry runs are recognized by a prefix match without parsing the JSON. Every decoded message is
+checked against its schema, and malformed messages raise MalformedPairingMessage.
+"""
+import binascii
+import json
+import logging
+import re
+import secrets
+import zlib
+from base64 import b64decode
+from base64 import b64encode
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+logger = logging.getLogger("discord")
+
+WIRE_PREFIX = "r1o1"
+WIRE_VERSION = 1
+MAX_MESSAGE_LENGTH = 2000
+DATE_FORMAT = "%Y-%m-%d"
+WIRE_HEADER = re.compile(
+    WIRE_PREFIX +
+    r":(\d+):([01]):(\d{4}-\d{2}-\d{2}):([0-9a-f]+):(\d+)/(\d+):")
+LEGACY_DRY_RUN = re.compile(r'\{\s*"dry_run"\s*:\s*true\b')
+
+
+class MalformedPairingMessage(ValueError):
+    """ Raised for history messages that look like pairings but do not match the schema of their format. """
+
+
+@dataclass(frozen=True)
+class EncodedPairing:
+    """ A pairing as stored in the history: its date, whether it was a dry run and the pairs of member IDs that were matched. """
+
+    date_of_pairing: datetime
+    dry_run: bool
+    pairs: Tuple[Tuple[int, int], ...]
+
+
+def write_varint(value: int, output: bytearray):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            output.append(byte | 0x80)
+        else:
+            output.append(byte)
+            return
+
+
+def read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    """ Returns the varint starting at position and the position right after it. """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def encode_pairs(pairs: Iterable[Tuple[int, int]]) -> bytes:
+    pairs = list(pairs)
+    ids = sorted(set(member_id for pair in pairs for member_id in pair))
+    index = {member_id: position for position, member_id in enumerate(ids)}
+
+    output = bytearray()
+    write_varint(len(ids), output)
+    previous = 0
+    for member_id in ids:
+        write_varint(member_id - previous, output)
+        previous = member_id
+    write_varint(len(pairs), output)
+    for person_1_id, person_2_id in pairs:
+        write_varint(index[person_1_id], output)
+        write_varint(index[person_2_id], output)
+    return zlib.compress(bytes(output), 9)
+
+
+def decode_pairs(payload: bytes) -> Tuple[Tuple[int, int], ...]:
+    data = zlib.decompress(payload)
+    num_ids, position = read_varint(data, 0)
+    ids = []
+    previous = 0
+    for _ in range(num_ids):
+        delta, position = read_varint(data, position)
+        previous += delta
+        ids.append(previous)
+    num_pairs, position = read_varint(data, position)
+    pairs = []
+    for _ in range(num_pairs):
+        index_1, position = read_varint(data, position)
+        index_2, position = read_varint(data, position)
+        pairs.append((ids[index_1], ids[index_2]))
+    return tuple(pairs)
+
+
+def encode_pairing(pairing: EncodedPairing,
+                   max_message_length: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """ Encodes a pairing into as many messages of at most max_message_length characters as needed. """
+    payload = b64encode(encode_pairs(pairing.pairs)).decode("ascii")
+    group = secrets.token_hex(4)
+    header = ":".join([
+        WIRE_PREFIX,
+        str(WIRE_VERSION),
+        "1" if pairing.dry_run else "0",
+        pairing.date_of_pairing.strftime(DATE_FORMAT),
+        group,
+    ])
+    # Reserve room for the widest possible part counter, which needs at most as many digits as the payload length
+    counter_length = 2 * len(str(max(len(payload), 1))) + 1
+    chunk_length = max_message_length - len(header) - counter_length - 2
+    if chunk_length < 1:
+        raise ValueError(
+            f"max_message_length {max_message_length} is too short for a pairing message"
+        )
+    chunks = [
+        payload[start:start + chunk_length]
+        for start in range(0, len(payload), chunk_length)
+    ] or [""]
+    return [
+        f"{header}:{part}/{len(chunks)}:{chunk}"
+        for part, chunk in enumerate(chunks, start=1)
+    ]
+
+
+def decode_legacy_message(content: str) -> EncodedPairing:
+    """ Decodes a JSON pairing message (see Pairings.to_json), checking every field. """
+    try:
+        dictionary = json.loads(content)
+        dry_run = dictionary["dry_run"]
+        date_of_pairing = datetime.strptime(dictionary["date_of_pairing"],
+                                            DATE_FORMAT)
+        pairs = tuple((person_1_id, person_2_id)
+                      for person_1_id, person_2_id in dictionary["pairing_graph"])
+    except (ValueError, KeyError, TypeError) as error:
+        raise MalformedPairingMessage(
+            f"Malformed JSON pairing message {content[:64]!r}") from error
+    if not isinstance(dry_run, bool) or not all(
+            isinstance(member_id, int) for pair in pairs for member_id in pair):
+        raise MalformedPairingMessage(
+            f"Malformed JSON pairing message {content[:64]!r}")
+    return EncodedPairing(date_of_pairing=date_of_pairing,
+                          dry_run=dry_run,
+                          pairs=pairs)
+
+
+def is_wire_message(content: str) -> bool:
+    return content.startswith(WIRE_PREFIX + ":")
+
+
+def is_legacy_message(content: str) -> bool:
+    return content.startswith("{")
+
+
+class PairingMessageDecoder:
+    """
+    Decodes the pairing messages of a history channel fed to it oldest first. Parts of multi-part pairings are buffered until the last part has
+    arrived; legacy JSON messages are decoded right away. The parts of a pairing are sent one after the other, so a pairing that is still missing
+    parts when a message of another pairing arrives can never complete (e.g. because writing it failed half way) and is dropped.
+
+    Args:
+        include_dry_runs (bool) - whether to decode dry-run pairings at all (their parts are otherwise dropped based on the header alone)
+    """
+
+    def __init__(self, include_dry_runs: bool = True):
+        self.include_dry_runs = include_dry_runs
+        self.parts: Dict[str, List[str]] = {}
+
+    def feed(self, content: str) -> Optional[EncodedPairing]:
+        """ Returns the pairing completed by this message, or None if the message is not a pairing or more parts are needed. """
+        if is_legacy_message(content):
+            self.abandon_incomplete_pairings()
+            if not self.include_dry_runs and LEGACY_DRY_RUN.match(content):
+                return None
+            pairing = decode_legacy_message(content)
+            if pairing.dry_run and not self.include_dry_runs:
+                return None
+            return pairing
+        if not is_wire_message(content):
+            return None
+
+        match = WIRE_HEADER.match(content)
+        if match is None:
+            raise MalformedPairingMessage(
+                f"Malformed pairing message header {content[:64]!r}")
+        version, dry_run, date_of_pairing, group, part, num_parts = match.groups(
+        )
+        if int(version) != WIRE_VERSION:
+            raise MalformedPairingMessage(
+                f"Unsupported pairing message version {version}")
+        self.abandon_incomplete_pairings(keep=group)
+        if dry_run == "1" and not self.include_dry_runs:
+            return None
+        part, num_parts = int(part), int(num_parts)
+        chunk = content[match.end():]
+        chunks = self.parts.setdefault(group, [])
+        if part != len(chunks) + 1:
+            logger.warning("Dropping out of order part %d of pairing %s",
+                           part, group)
+            del self.parts[group]
+            return None
+        chunks.append(chunk)
+        if part < num_parts:
+            return None
+
+        del self.parts[group]
+        try:
+            pairs = decode_pairs(b64decode("".join(chunks), validate=True))
+        except (binascii.Error, zlib.error, IndexError) as error:
+            raise MalformedPairingMessage(
+                f"Malformed payload of pairing {group}") from error
+        return EncodedPairing(date_of_pairing=datetime.strptime(
+            date_of_pairing, DATE_FORMAT),
+                              dry_run=dry_run == "1",
+                              pairs=pairs)
+
+    def abandon_incomplete_pairings(self, keep: Optional[str] = None):
+        """ Drops every multi-part pairing but keep that is still missing parts, since a newer pairing has started. """
+        for group in [group for group in self.parts if group != keep]:
+            logger.warning(
+                "Dropping pairing %s, which is missing parts %d and later",
+                group,
+                len(self.parts[group]) + 1)
+            del self.parts[group]
+
+    def incomplete_pairings(self) -> List[str]:
+        """ Groups of the multi-part pairings that are still missing parts and can still be completed by the next messages. """
+        return list(self.parts)
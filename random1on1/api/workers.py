@@ -0,0 +1,176 @@
+"""
+random1on1.api.workers
+
+Matching a large guild is CPU heavy, and running it inside a discord.py coroutine blocks the event loop long enough to miss gateway heartbeats. The
+MatchingWorkerPool runs the matching algorithm in a pool of worker processes instead, behind an async API, so several guilds
+can be matched on several cores at once while the event loop keeps serving the gateway.
+
+Only plain data crosses the process boundary: a MatchingJob holds the participants as discord member IDs and the history as a HistoryEdgeTable of
+member IDs, or as a WeeklyHistoryIndex whose buckets are still encoded, in which case the worker merges the weeks of the job's history window
+itself so not even the merge runs on the event loop. The worker answers with a MatchingResult holding the pairing groups as member IDs. Turning the IDs back into Member objects is left to the caller.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from random1on1.api.history import StoredHistory
+from random1on1.api.history import WeeklyHistoryIndex
+from random1on1.matching import load_algorithm
+
+logger = logging.getLogger("discord")
+
+PROFILE_LIMIT = 40
+
+
+@dataclass(frozen=True)
+class MatchingJob:
+    """
+    Everything a worker needs to match one guild.
+
+    Args:
+        algorithm (str) - name of the matching algorithm (see random1on1.matching.ALGORITHMS)
+        participant_ids (Tuple[int, ...]) - member IDs of this week's participants
+        history (StoredHistory) - the merged history of every previous official pairing, or the WeeklyHistoryIndex to merge it from
+        dry_run (bool) - whether the generated pairings are a dry run
+        algorithm_options (dict) - keyword arguments passed on to the algorithm's constructor
+        profile (bool) - whether to run the algorithm under cProfile and return the profile with the result
+        history_from (Optional[datetime]) - start of the history window merged from a WeeklyHistoryIndex (defaulting to the whole history)
+        history_to (Optional[datetime]) - end of the history window merged from a WeeklyHistoryIndex (defaulting to now)
+    """
+
+    algorithm: str
+    participant_ids: Tuple[int, ...]
+    history: StoredHistory
+    dry_run: bool
+    algorithm_options: dict = field(default_factory=dict)
+    profile: bool = False
+    history_from: Optional[datetime] = None
+    history_to: Optional[datetime] = None
+
+
+@dataclass(frozen=True)
+class MatchingResult:
+    """
+    Pairing groups (member IDs of the people who meet each other this week) produced by a MatchingJob, together with the seconds the worker spent
+    in each step (history_merge if the job's history still had to be merged, construct_potential_pairings, i.e. constructing the algorithm, and
+    generate_pairs) and, if the job asked for it, the cProfile statistics of the run as text.
+    """
+
+    groups: Tuple[Tuple[int, ...], ...]
+    date_of_pairing: datetime
+    dry_run: bool
+    timings: Dict[str, float] = field(default_factory=dict)
+    profile: Optional[str] = None
+
+
+def run_matching_job(job: MatchingJob) -> MatchingResult:
+    """
+    Merges the history of a job if it is still a WeeklyHistoryIndex and runs the matching algorithm on it. This is the function that runs inside
+    the workers.
+    """
+    from networkx import connected_components
+
+    timings = {}
+    history = job.history
+    if isinstance(history, WeeklyHistoryIndex):
+        start = time.perf_counter()
+        history = history.merged(date_from=job.history_from,
+                                 date_to=job.history_to)
+        timings["history_merge"] = time.perf_counter() - start
+
+    algorithm_class = load_algorithm(job.algorithm)
+    profiler = None
+    if job.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    matching_algorithm = algorithm_class(
+        participants=list(job.participant_ids),
+        previous_pairings_merged=history,
+        **job.algorithm_options)
+    constructed = time.perf_counter()
+    pairings = matching_algorithm.generate_pairs(dry_run=job.dry_run)
+    generated = time.perf_counter()
+    if profiler is not None:
+        profiler.disable()
+    timings["construct_potential_pairings"] = constructed - start
+    timings["generate_pairs"] = generated - constructed
+    return MatchingResult(groups=tuple(
+        tuple(int(member_id) for member_id in group)
+        for group in connected_components(pairings.pairing_graph)),
+                          date_of_pairing=pairings.date_of_pairing,
+                          dry_run=pairings.dry_run,
+                          timings=timings,
+                          profile=None if profiler is None else
+                          profile_statistics(profiler))
+
+
+def profile_statistics(profiler, limit: int = PROFILE_LIMIT) -> str:
+    """ The functions of a profile with the most cumulative time, as the text pstats prints. """
+    import io
+    import pstats
+
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(
+        limit)
+    return output.getvalue()
+
+
+class MatchingWorkerPool:
+    """
+    Runs MatchingJobs off the event loop. The executor is only started by the first job, so a bot that never matches anything never spawns workers.
+
+    Args:
+        max_workers (Optional[int]) - number of workers, defaults to the number of processors
+        use_processes (bool) - run the jobs in worker processes (the default); threads only help when the algorithm releases the GIL, but
+                               avoid starting processes e.g. in tests
+    """
+
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 use_processes: bool = True):
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.executor: Optional[Executor] = None
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.use_processes:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers)
+            else:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers)
+        return self.executor
+
+    async def run(self, job: MatchingJob) -> MatchingResult:
+        """ Runs the job in a worker and waits for its result without blocking the event loop. """
+        logger.debug("Submitting matching job for %d participants to workers",
+                     len(job.participant_ids))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.get_executor(),
+                                          run_matching_job, job)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
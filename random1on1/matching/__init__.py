@@ -0,0 +1,61 @@
+"""
+random1on1.matching
+
+Registry of the matching algorithms that can be selected with the "algorithm" key of the Random1on1BotConfig. The registry only stores the module
+each algorithm lives in, so validating a config does not import any algorithm (or numpy/networkx); load_algorithm imports just the selected one.
+Only a config with algorithm_options imports its algorithm, to check the options against the signature of its constructor.
+"""
+import inspect
+from importlib import import_module
+from typing import Mapping
+
+ALGORITHMS = {
+    "UniformMatchingAlgorithm": "random1on1.matching.uniform",
+    "IndexedMatchingAlgorithm": "random1on1.matching.indexed",
+    "WeightedMatchingAlgorithm": "random1on1.matching.weighted",
+}
+DEFAULT_ALGORITHM = "UniformMatchingAlgorithm"
+
+
+def validate_algorithm(name: str):
+    if name not in ALGORITHMS:
+        raise ValueError(
+            f"Unknown matching algorithm {name}, must be one of {sorted(ALGORITHMS)}"
+        )
+
+
+def load_algorithm(name: str):
+    """ Imports and returns the MatchingAlgorithm class registered under name. """
+    validate_algorithm(name)
+    return getattr(import_module(ALGORITHMS[name]), name)
+
+
+# Passed to every algorithm by the bot itself, so they cannot be set through the algorithm_options
+RESERVED_ARGUMENTS = ["participants", "previous_pairings_merged"]
+
+
+def validate_algorithm_options(name: str, options: Mapping):
+    """
+    Checks that options only holds keyword arguments the constructor of the algorithm registered under name accepts. Imports the algorithm.
+
+    Raises:
+        ValueError - if an option is not a keyword argument of the constructor
+    """
+    parameters = inspect.signature(load_algorithm(name)).parameters
+    accepts_any = any(parameter.kind == inspect.Parameter.VAR_KEYWORD
+                      for parameter in parameters.values())
+    allowed = [
+        argument for argument, parameter in parameters.items()
+        if argument not in RESERVED_ARGUMENTS and parameter.kind in (
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            inspect.Parameter.KEYWORD_ONLY)
+    ]
+    unknown = [
+        option for option in options
+        if option in RESERVED_ARGUMENTS or not (accepts_any
+                                                or option in allowed)
+    ]
+    if unknown:
+        raise ValueError(
+            f"Unknown algorithm_options {', '.join(sorted(unknown))} for {name}, must be among {sorted(allowed)}"
+        )
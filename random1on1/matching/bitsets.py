@@ -0,0 +1,102 @@
+"""
+random1on1.matching.bitsets
+
+AllowedPairings represents "who may still be paired with whom" implicitly as the complement of the pairing history. The history of every
+participant is a row of packed bits (bit j of row i is set if participants i and j were paired before), so N participants cost N * N / 8 bytes no
+matter how many of the possible pairs are still allowed, and people who are no longer participating are never stored at all. The participants that
+are still available in the current round are kept as one more packed row, which makes "pick a random allowed partner for i" a handful of
+vectorized byte operations.
+
+Bits are packed little-endian within a byte (participant j lives in bit j % 8 of byte j // 8), matching numpy.packbits(..., bitorder="little").
+"""
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+
+import numpy
+
+POPCOUNT = numpy.array([bin(byte).count("1") for byte in range(256)],
+                       dtype=numpy.uint8)
+
+
+class AllowedPairings:
+    """
+    Packed bitset representation of the allowed pairings between num_participants participants.
+
+    Args:
+        num_participants (int) - number of participants, who are referred to by their dense index in range(num_participants)
+        previous_pairs (Iterable[Tuple[int, int]]) - index pairs of participants that have been paired before
+    """
+
+    def __init__(self, num_participants: int,
+                 previous_pairs: Iterable[Tuple[int, int]] = ()):
+        self.num_participants = num_participants
+        self.num_bytes = (num_participants + 7) // 8
+        self.history = numpy.zeros((num_participants, self.num_bytes),
+                                   dtype=numpy.uint8)
+        self.reset_available()
+
+        pairs = numpy.array(list(previous_pairs), dtype=numpy.int64).reshape(
+            -1, 2)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        for rows, columns in [(pairs[:, 0], pairs[:, 1]),
+                              (pairs[:, 1], pairs[:, 0])]:
+            numpy.bitwise_or.at(
+                self.history, (rows, columns >> 3),
+                (1 << (columns & 7)).astype(numpy.uint8))
+
+    def reset_available(self):
+        """ Marks every participant as available again, e.g. before drawing a new round. """
+        self.available = numpy.packbits(numpy.ones(self.num_participants,
+                                                   dtype=bool),
+                                        bitorder="little")
+
+    def previously_paired(self, index_1: int, index_2: int) -> bool:
+        return bool(self.history[index_1, index_2 >> 3] >> (index_2 & 7) & 1)
+
+    def remove(self, index: int):
+        """ Marks a participant as no longer available in the current round. """
+        self.available[index >> 3] &= numpy.uint8(~(1 << (index & 7)) & 0xFF)
+
+    def allowed_row(self, index: int) -> numpy.ndarray:
+        """ Packed row of the available participants that index may be paired with. """
+        allowed = self.available & ~self.history[index]
+        allowed[index >> 3] &= numpy.uint8(~(1 << (index & 7)) & 0xFF)
+        return allowed
+
+    def allowed_partners(self, index: int) -> numpy.ndarray:
+        """ Indices of the available participants that index may be paired with. """
+        return numpy.flatnonzero(
+            numpy.unpackbits(self.allowed_row(index),
+                             count=self.num_participants,
+                             bitorder="little"))
+
+    def count_allowed_partners(self, index: int) -> int:
+        return int(POPCOUNT[self.allowed_row(index)].sum(dtype=numpy.int64))
+
+    def random_allowed_partner(
+            self, index: int,
+            random: numpy.random.Generator) -> Optional[int]:
+        """ Uniformly random available participant that index may be paired with, or None if there is none. """
+        allowed = self.allowed_row(index)
+        counts = POPCOUNT[allowed]
+        cumulative = numpy.cumsum(counts, dtype=numpy.int64)
+        if len(cumulative) == 0 or cumulative[-1] == 0:
+            return None
+        target = int(random.integers(cumulative[-1]))
+        byte = int(numpy.searchsorted(cumulative, target, side="right"))
+        rank = target - (int(cumulative[byte]) - int(counts[byte]))
+        bits = numpy.flatnonzero(
+            numpy.unpackbits(allowed[byte:byte + 1], bitorder="little"))
+        return byte * 8 + int(bits[rank])
+
+    def allowed_among(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """ Boolean matrix telling which pairs of the given participants may be paired with each other (the diagonal is False). """
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        met = numpy.unpackbits(self.history[indices],
+                               axis=1,
+                               count=self.num_participants,
+                               bitorder="little")[:, indices].astype(bool)
+        allowed = ~met
+        numpy.fill_diagonal(allowed, False)
+        return allowed
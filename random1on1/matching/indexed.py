@@ -0,0 +1,242 @@
+"""
+random1on1.matching.indexed
+
+The IndexedMatchingAlgorithm produces the same kind of pairings as the UniformMatchingAlgorithm (every pairing is drawn uniformly at random from the
+pairs of remaining participants that have not been matched before) but it never materialises the graph of potential pairings. Participants are
+mapped to dense integer indices, so the work done per drawn pair does not depend on the number of edges left in the graph.
+
+The history is kept as an AllowedPairings bitset (see random1on1.matching.bitsets), so it costs N * N / 8 bytes for N participants.
+
+Drawing a pair happens in one of two modes:
+
+    1. Rejection mode: two distinct remaining participants are drawn uniformly at random and accepted if they have not been paired before. As
+                       long as the history is sparse this accepts after a handful of draws, so a pair costs O(1) amortized.
+
+    2. Edge list mode: once too many draws in a row are rejected, the allowed pairs among the remaining participants are enumerated once into
+                       flat index arrays. Pairs are then drawn from those arrays and pairs whose endpoints have already been matched are
+                       discarded lazily, so every enumerated pair is looked at a bounded number of times.
+"""
+import logging
+from datetime import datetime
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy
+from networkx import complete_graph
+from networkx import Graph
+from networkx import union
+
+from random1on1.api.algorithm import MatchingAlgorithm
+from random1on1.api.algorithm import MergedHistory
+from random1on1.api.pairings import Pairings
+from random1on1.matching.bitsets import AllowedPairings
+
+logger = logging.getLogger("discord")
+
+MAX_REJECTIONS = 64
+RANDOM_BUFFER_SIZE = 4096
+
+
+class IndexedPairingEngine:
+    """
+    Draws uniformly random pairs of not-previously-paired participants out of a shrinking pool of dense participant indices.
+
+    Args:
+        allowed_pairings (AllowedPairings) - the participants' pairing history, which is updated as participants are removed
+        random (numpy.random.Generator) - the random number generator used for all draws
+    """
+
+    def __init__(self, allowed_pairings: AllowedPairings,
+                 random: numpy.random.Generator):
+        num_participants = allowed_pairings.num_participants
+        self.allowed_pairings = allowed_pairings
+        self.random = random
+        self.remaining = list(range(num_participants))
+        self.position = list(range(num_participants))
+        self.num_remaining = num_participants
+        self.alive = numpy.ones(num_participants, dtype=bool)
+        self.edges_from = None
+        self.edges_to = None
+        self.num_edges = 0
+        self._buffer = self.random.random(RANDOM_BUFFER_SIZE)
+        self._buffer_position = 0
+
+    def _uniform(self) -> float:
+        if self._buffer_position == RANDOM_BUFFER_SIZE:
+            self._buffer = self.random.random(RANDOM_BUFFER_SIZE)
+            self._buffer_position = 0
+        value = self._buffer[self._buffer_position]
+        self._buffer_position += 1
+        return value
+
+    def remove(self, index: int):
+        """ Removes a matched participant from the pool by swapping it with the last remaining participant. """
+        position = self.position[index]
+        last = self.remaining[self.num_remaining - 1]
+        self.remaining[position] = last
+        self.position[last] = position
+        self.remaining[self.num_remaining - 1] = index
+        self.position[index] = self.num_remaining - 1
+        self.num_remaining -= 1
+        self.alive[index] = False
+        self.allowed_pairings.remove(index)
+
+    def remaining_indices(self) -> List[int]:
+        return self.remaining[:self.num_remaining]
+
+    def sample_pair(self) -> Optional[Tuple[int, int]]:
+        """ Returns a uniformly random allowed pair among the remaining participants, or None if no allowed pair is left. """
+        if self.num_remaining < 2:
+            return None
+        if self.edges_from is None:
+            for _ in range(MAX_REJECTIONS):
+                first = int(self._uniform() * self.num_remaining)
+                second = int(self._uniform() * (self.num_remaining - 1))
+                if second >= first:
+                    second += 1
+                person_1 = self.remaining[first]
+                person_2 = self.remaining[second]
+                if not self.allowed_pairings.previously_paired(
+                        person_1, person_2):
+                    return person_1, person_2
+            logger.debug(
+                "Rejected %d random pairs in a row with %d participants remaining, enumerating the allowed pairs",
+                MAX_REJECTIONS, self.num_remaining)
+            self.enumerate_allowed_pairs()
+        return self.sample_enumerated_pair()
+
+    def enumerate_allowed_pairs(self):
+        """ Switches to edge list mode by writing every allowed pair among the remaining participants into flat index arrays. """
+        remaining = numpy.array(self.remaining_indices(), dtype=numpy.int64)
+        allowed = numpy.triu(self.allowed_pairings.allowed_among(remaining),
+                             k=1)
+        rows, columns = numpy.nonzero(allowed)
+        self.edges_from = remaining[rows]
+        self.edges_to = remaining[columns]
+        self.num_edges = len(rows)
+
+    def compact_enumerated_pairs(self):
+        """ Drops every enumerated pair with an already matched endpoint in a single vectorized pass. """
+        edges_from = self.edges_from[:self.num_edges]
+        edges_to = self.edges_to[:self.num_edges]
+        keep = self.alive[edges_from] & self.alive[edges_to]
+        self.edges_from = edges_from[keep]
+        self.edges_to = edges_to[keep]
+        self.num_edges = len(self.edges_from)
+
+    def sample_enumerated_pair(self) -> Optional[Tuple[int, int]]:
+        rejections = 0
+        while self.num_edges > 0:
+            edge = int(self._uniform() * self.num_edges)
+            person_1 = int(self.edges_from[edge])
+            person_2 = int(self.edges_to[edge])
+            if self.alive[person_1] and self.alive[person_2]:
+                return person_1, person_2
+            self.num_edges -= 1
+            self.edges_from[edge] = self.edges_from[self.num_edges]
+            self.edges_to[edge] = self.edges_to[self.num_edges]
+            rejections += 1
+            if rejections == MAX_REJECTIONS:
+                self.compact_enumerated_pairs()
+                rejections = 0
+        return None
+
+
+class IndexedMatchingAlgorithm(MatchingAlgorithm):
+    """
+    Drop-in replacement for the UniformMatchingAlgorithm that runs on dense participant indices (see the module docstring for details). A full
+    run costs O(N * N / 8 + H) for N participants and H historical pairings as long as the history is sparse, instead of O(N * E) for the E potential
+    pairings that the UniformMatchingAlgorithm copies out of its graph on every draw.
+    """
+
+    def __init__(self,
+                 participants: List[int],
+                 previous_pairings_merged: MergedHistory,
+                 seed=None):
+        super().__init__(participants, previous_pairings_merged, seed=seed)
+        self.participants = list(participants)
+        self.previous_pairings_merged = previous_pairings_merged
+        self.participant_index = {
+            participant: index
+            for index, participant in enumerate(self.participants)
+        }
+        self.allowed_pairings = self.construct_allowed_pairings(
+            previous_pairings_merged)
+
+    def construct_allowed_pairings(
+            self, previous_pairings_merged: MergedHistory) -> AllowedPairings:
+        """ Translates the merged history graph into an AllowedPairings bitset over participant indices, dropping anyone who is not participating. """
+        logger.debug("Creating indexed history for %d participants",
+                     len(self.participants))
+        previous_pairs = []
+        for person_1, person_2, _ in previous_pairings_merged.edges():
+            index_1 = self.participant_index.get(person_1)
+            index_2 = self.participant_index.get(person_2)
+            if index_1 is not None and index_2 is not None:
+                previous_pairs.append((index_1, index_2))
+        return AllowedPairings(len(self.participants), previous_pairs)
+
+    def pair_least_met(
+        self, remaining: List[int]
+    ) -> Tuple[List[Tuple[int, int]], List[int]]:
+        """
+        Pairs up participant indices until at most 3 are left, each with the partner they met the fewest times before (ties are broken at random).
+        Returns the pairs and the indices that are left.
+        """
+        remaining_set = set(remaining)
+        meetings = {}
+        for person_1, person_2, attributes in self.previous_pairings_merged.edges(
+        ):
+            index_1 = self.participant_index.get(person_1)
+            index_2 = self.participant_index.get(person_2)
+            if index_1 in remaining_set and index_2 in remaining_set:
+                meetings[frozenset((index_1, index_2))] = attributes.get(
+                    "meetings", 1)
+        order = [remaining[i] for i in self.random.permutation(len(remaining))]
+        pairs = []
+        while len(order) > 3:
+            person_1 = order.pop()
+            person_2 = min(order,
+                           key=lambda person: meetings.get(
+                               frozenset((person_1, person)), 0))
+            order.remove(person_2)
+            pairs.append((person_1, person_2))
+        return pairs, order
+
+    def generate_pairs(self, dry_run: bool) -> Pairings:
+        """
+        Generate pairings completely at random by drawing allowed pairs until at most 3 people remain, who are then grouped together. If more than
+        3 people remain who have all been paired with each other before, they are paired with the partners they met the fewest times instead (see
+        pair_least_met).
+        """
+        self.allowed_pairings.reset_available()
+        engine = IndexedPairingEngine(self.allowed_pairings, self.random)
+        pairing_graph = Graph()
+
+        while engine.num_remaining > 3:
+            pair = engine.sample_pair()
+            if pair is None:
+                break
+            person_1, person_2 = pair
+            pairing_graph.add_edge(self.participants[person_1],
+                                   self.participants[person_2])
+            engine.remove(person_1)
+            engine.remove(person_2)
+
+        remaining = list(engine.remaining_indices())
+        if len(remaining) > 3:
+            logger.debug(
+                "%d remaining participants have all met before, pairing them with their least met partners",
+                len(remaining))
+            least_met_pairs, remaining = self.pair_least_met(remaining)
+            pairing_graph.add_edges_from(
+                (self.participants[person_1], self.participants[person_2])
+                for person_1, person_2 in least_met_pairs)
+        remaining_pairings = complete_graph(
+            [self.participants[i] for i in remaining])
+        pairing_graph = union(pairing_graph, remaining_pairings)
+
+        return Pairings(pairing_graph=pairing_graph,
+                        date_of_pairing=datetime.now(),
+                        dry_run=dry_run)
@@ -5,52 +5,112 @@ import random1on1
 # TODO: Refactor this class to implement methods in random1on1.api.algorithm
 random = np.random.default_rng()
 
+COUNT_DTYPE = np.uint16
+
 
 def softmax(v):
-    v -= v.min()
-    return np.exp(v) / np.exp(v).sum()
+    """ Numerically stable softmax that leaves its input untouched. """
+    v = np.asarray(v, dtype=np.float64)
+    exponentials = np.exp(v - v.max())
+    return exponentials / exponentials.sum()
 
 
-class Participant:
+class MeetingCounts:
+    """
+    A single N x N matrix counting how often every two people met, shared by all participants of a simulation instead of one array per
+    participant.
+    """
 
     def __init__(self, num_people):
-        self.meetings_counter = np.zeros(num_people)
+        self.counts = np.zeros((num_people, num_people), dtype=COUNT_DTYPE)
+
+    def participants(self):
+        """ Returns one Participant per row of the matrix, each viewing its own row. """
+        return [
+            Participant(len(self.counts), index=index, meeting_counts=self)
+            for index in range(len(self.counts))
+        ]
+
+    def record_group(self, group):
+        """ Counts a meeting between every two people of a pairing group. """
+        group = np.asarray(group)
+        rows, columns = np.meshgrid(group, group, indexing="ij")
+        different = rows != columns
+        self.counts[rows[different], columns[different]] += 1
+
+
+class Participant:
+
+    def __init__(self, num_people, index=None, meeting_counts=None):
+        self.index = index
+        self.meeting_counts = meeting_counts
+        if meeting_counts is None:
+            self.meetings_counter = np.zeros(num_people, dtype=COUNT_DTYPE)
+        else:
+            self.meetings_counter = meeting_counts.counts[index]
 
     def increment_meetings_count(self, *other_participants):
         for other in other_participants:
             self.meetings_counter[other] += 1
 
     def sample_match(self, indices, gamma):
-        meeting_counts = gamma * self.meetings_counter[indices]
-        probabilities = softmax(meeting_counts)
-        match = random.choice(indices, p=probabilities)
-        return match
+        """ Samples one of indices with probability proportional to exp(gamma * meetings) using the Gumbel-max trick. """
+        indices = np.asarray(indices)
+        scores = gamma * self.meetings_counter[indices] + random.gumbel(
+            size=len(indices))
+        return indices[np.argmax(scores)]
 
 
-def generate_pairs(participants, gamma):
-    unmatched = list(range(len(participants)))
+def sample_round(counts, gamma):
+    """
+    Draws a whole round of pairings from a matrix of meeting counts. In a random order every person who is not matched yet picks a partner among
+    the unmatched people with probability proportional to exp(gamma * meetings). All Gumbel noise is drawn upfront in log domain, so a pick is a
+    single masked argmax over the picker's row of scores: every row is used by at most one pick, which keeps the picks exact softmax samples.
+
+    Returns:
+        A list of pairs of indices. For an odd number of people the person left over is added to the first pair.
+    """
+    num_people = len(counts)
+    scores = gamma * counts.astype(np.float64)
+    scores += random.gumbel(size=scores.shape)
+    unmatched = np.ones(num_people, dtype=bool)
     pairs = []
-    while len(unmatched) > 1:
-        index = random.choice(unmatched)
-        unmatched.remove(index)
-        participant = participants[index]
-        match = participant.sample_match(unmatched, gamma)
-        unmatched.remove(match)
-        pairs.append([index, match])
-    if len(unmatched) == 1:
-        pairs[0].append(unmatched[0])
+    for index in random.permutation(num_people):
+        if not unmatched[index]:
+            continue
+        unmatched[index] = False
+        if len(pairs) == num_people // 2:
+            pairs[0].append(index)
+            break
+        match = int(np.argmax(np.where(unmatched, scores[index], -np.inf)))
+        unmatched[match] = False
+        pairs.append([int(index), match])
     return pairs
 
 
+def generate_pairs(participants, gamma):
+    meeting_counts = participants[0].meeting_counts if participants else None
+    shares_counts = meeting_counts is not None and all(
+        participant.meeting_counts is meeting_counts
+        and participant.index == position
+        for position, participant in enumerate(participants))
+    if shares_counts and len(meeting_counts.counts) == len(participants):
+        counts = meeting_counts.counts
+    else:
+        counts = np.stack([
+            participant.meetings_counter[:len(participants)]
+            for participant in participants
+        ])
+    return sample_round(counts, gamma)
+
+
 def main(num_people, num_iters, gamma):
     gamma = np.log(gamma)
-    participants = [Participant(num_people) for _ in range(num_people)]
+    meeting_counts = MeetingCounts(num_people)
+    participants = meeting_counts.participants()
     for iteration in range(num_iters):
-        pairs = generate_pairs(participants, gamma)
-        for match in pairs:
-            for index in match:
-                participants[index].increment_meetings_count(
-                    *filter(lambda i: i != index, match))
+        for match in generate_pairs(participants, gamma):
+            meeting_counts.record_group(match)
     for participant_no, participant in enumerate(participants):
         print("participant {}:".format(participant_no),
               participant.meetings_counter)
@@ -0,0 +1,255 @@
+"""
+random1on1.matching.simulation
+
+Vectorized simulator for the softmax pairing process in random1on1.matching.pairing. Instead of simulating one program week by week with Participant
+objects, it runs R independent replicas for every gamma at once on a single (G * R, N, N) array of meeting counts and reports fairness statistics
+per gamma, which makes it possible to tune gamma offline.
+
+Every week follows the same process as pairing.generate_pairs: a uniformly random unmatched person picks a partner among the unmatched people with
+probability proportional to gamma ** (number of previous meetings), and for an odd number of people the last person joins the first pair. Each pick
+is made by rejection sampling (propose a uniformly random unmatched person, accept with probability gamma ** meetings relative to an upper bound), which is
+exact and takes a handful of vectorized draws across all replicas. Replicas that keep rejecting fall back to sampling from the full distribution.
+
+Usage:
+    >>> from random1on1.matching.simulation import simulate
+    >>> results = simulate(num_people=200, num_weeks=100, gammas=[0.01, 0.1, 1.0], num_replicas=8, seed=0)
+    >>> results[0.1].weeks_until_everyone_met
+"""
+from dataclasses import dataclass
+from typing import Dict
+from typing import Sequence
+
+import numpy as np
+
+MAX_REJECTION_ROUNDS = 2
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """
+    Fairness statistics for a single gamma.
+
+    Attributes:
+        gamma (float) - the gamma the replicas were simulated with
+        num_people (int) - number of people in the program
+        num_weeks (int) - number of simulated weeks
+        num_replicas (int) - number of independent replicas
+        repeat_rate (np.ndarray) - shape (num_weeks,), fraction of the week's pairs that had met before, averaged over replicas
+        meetings_histogram (np.ndarray) - meetings_histogram[k] is the number of pairs of people that met exactly k times, summed over replicas
+        weeks_until_everyone_met (np.ndarray) - shape (num_replicas,), first week (1-based) after which everyone had met everyone, -1 if never
+        max_meetings (np.ndarray) - shape (num_replicas,), the most times any pair met in each replica
+    """
+
+    gamma: float
+    num_people: int
+    num_weeks: int
+    num_replicas: int
+    repeat_rate: np.ndarray
+    meetings_histogram: np.ndarray
+    weeks_until_everyone_met: np.ndarray
+    max_meetings: np.ndarray
+
+
+class BatchedPairingSimulator:
+    """
+    Holds the meeting counts of a batch of independent programs and simulates their weeks in lockstep.
+
+    Args:
+        num_people (int) - number of people in every program
+        log_gammas (np.ndarray) - shape (B,), the log of gamma for every program in the batch
+        random (np.random.Generator) - the random number generator used for all draws
+    """
+
+    def __init__(self, num_people: int, log_gammas: np.ndarray,
+                 random: np.random.Generator):
+        if num_people < 2:
+            raise ValueError("Simulating pairings requires at least 2 people")
+        self.num_people = num_people
+        self.log_gammas = np.asarray(log_gammas, dtype=np.float64)
+        self.batch_size = len(self.log_gammas)
+        self.random = random
+        self.rows = np.arange(self.batch_size)
+        # The counts are addressed through flat offsets (row * N * N + person_1 * N + person_2), which keeps the per-pick indexing cheap
+        self.counts = np.zeros((self.batch_size, num_people, num_people),
+                               dtype=np.uint16)
+        self.counts[:, np.arange(num_people),
+                    np.arange(num_people)] = np.iinfo(np.uint16).max
+        self.flat_counts = self.counts.reshape(-1)
+        self.count_offsets = self.rows * num_people * num_people
+        self.max_counts = np.zeros(self.batch_size, dtype=np.int64)
+        self.min_counts = np.zeros(self.batch_size * num_people,
+                                   dtype=np.int64)
+        self.unmet = np.full(self.batch_size,
+                             num_people * (num_people - 1) // 2,
+                             dtype=np.int64)
+        self.pool = np.tile(np.arange(num_people), self.batch_size)
+        self.pool_position = self.pool.copy()
+        self.pool_offsets = self.rows * num_people
+        self.pool_size = np.full(self.batch_size, num_people, dtype=np.int64)
+
+    def draw_unmatched(self, rows: np.ndarray,
+                       uniforms: np.ndarray) -> np.ndarray:
+        """ Turns one uniform draw per given program into a uniformly random unmatched person of that program. """
+        slots = (uniforms * self.pool_size[rows]).astype(np.int64)
+        return self.pool[self.pool_offsets[rows] + slots]
+
+    def remove_from_pool(self, people: np.ndarray):
+        """ Marks one person per program as matched by swapping them with the last unmatched person of their program's pool. """
+        positions = self.pool_offsets + people
+        slots = self.pool_position[positions]
+        self.pool_size -= 1
+        last = self.pool[self.pool_offsets + self.pool_size]
+        self.pool[self.pool_offsets + slots] = last
+        self.pool_position[self.pool_offsets + last] = slots
+        self.pool[self.pool_offsets + self.pool_size] = people
+        self.pool_position[positions] = self.pool_size
+
+    def sample_partners(self, proposers: np.ndarray, uniforms: np.ndarray,
+                        log_uniforms: np.ndarray) -> np.ndarray:
+        """
+        Draws one partner per program for the given proposers among the unmatched people. Candidates are accepted with probability
+        gamma ** meetings divided by an upper bound: gamma ** (the proposer's fewest meetings with anyone) for gamma <= 1 and
+        gamma ** (the most meetings of any pair in the program) for gamma > 1.
+        """
+        upper_bound = np.maximum(
+            self.log_gammas * self.max_counts,
+            self.log_gammas * self.min_counts[self.pool_offsets + proposers])
+        row_offsets = self.count_offsets + proposers * self.num_people
+        candidates = self.draw_unmatched(self.rows, uniforms)
+        accept = log_uniforms < (self.log_gammas *
+                                 self.flat_counts[row_offsets + candidates] -
+                                 upper_bound)
+        if accept.all():
+            return candidates
+
+        partners = np.where(accept, candidates, -1)
+        pending = self.rows[~accept]
+        for _ in range(MAX_REJECTION_ROUNDS):
+            candidates = self.draw_unmatched(
+                pending, self.random.random(len(pending)))
+            accept = np.log(self.random.random(len(pending))) < (
+                self.log_gammas[pending] *
+                self.flat_counts[row_offsets[pending] + candidates] -
+                upper_bound[pending])
+            partners[pending[accept]] = candidates[accept]
+            pending = pending[~accept]
+            if len(pending) == 0:
+                return partners
+
+        # Exact fallback for the programs that kept rejecting: inverse transform sampling over the unmatched people
+        log_weights = self.log_gammas[pending, None] * self.counts[
+            pending, proposers[pending]]
+        unmatched = self.pool_position.reshape(
+            self.batch_size, self.num_people)[pending] < self.pool_size[pending,
+                                                                         None]
+        log_weights[~unmatched] = -np.inf
+        weights = np.exp(log_weights -
+                         log_weights.max(axis=1, keepdims=True))
+        cumulative = np.cumsum(weights, axis=1)
+        thresholds = self.random.random(len(pending)) * cumulative[:, -1]
+        partners[pending] = (cumulative <= thresholds[:, None]).sum(axis=1)
+        return partners
+
+    def record_meeting(self, person_1: np.ndarray, person_2: np.ndarray,
+                       repeats: np.ndarray):
+        forward = self.count_offsets + person_1 * self.num_people + person_2
+        backward = self.count_offsets + person_2 * self.num_people + person_1
+        previous = self.flat_counts[forward]
+        repeats += previous > 0
+        self.unmet -= previous == 0
+        self.flat_counts[forward] = previous + 1
+        self.flat_counts[backward] = previous + 1
+        np.maximum(self.max_counts, previous + 1, out=self.max_counts)
+
+    def simulate_week(self) -> np.ndarray:
+        """ Simulates one week for every program and returns the number of repeated pairs per program. """
+        num_picks = self.num_people // 2
+        self.pool_size[:] = self.num_people
+        repeats = np.zeros(self.batch_size, dtype=np.int64)
+        proposer_uniforms = self.random.random((num_picks, self.batch_size))
+        partner_uniforms = self.random.random((num_picks, self.batch_size))
+        log_uniforms = np.log(self.random.random(
+            (num_picks, self.batch_size)))
+        first_pair = None
+        for pick in range(num_picks):
+            proposers = self.draw_unmatched(self.rows, proposer_uniforms[pick])
+            self.remove_from_pool(proposers)
+            partners = self.sample_partners(proposers, partner_uniforms[pick],
+                                            log_uniforms[pick])
+            self.remove_from_pool(partners)
+            self.record_meeting(proposers, partners, repeats)
+            if first_pair is None:
+                first_pair = (proposers, partners)
+
+        if self.num_people % 2 == 1:
+            leftover = self.pool[self.pool_offsets]
+            self.record_meeting(leftover, first_pair[0], repeats)
+            self.record_meeting(leftover, first_pair[1], repeats)
+        self.min_counts = self.counts.min(axis=2).reshape(-1).astype(np.int64)
+        return repeats
+
+    def meetings_histogram(self, rows: np.ndarray) -> np.ndarray:
+        upper = np.triu_indices(self.num_people, k=1)
+        return np.bincount(self.counts[rows][:, upper[0], upper[1]].ravel())
+
+
+def simulate(num_people: int,
+             num_weeks: int,
+             gammas: Sequence[float],
+             num_replicas: int = 16,
+             seed=None) -> Dict[float, SimulationResult]:
+    """
+    Simulates num_replicas independent programs of num_people people for num_weeks weeks for each gamma.
+
+    Memory use is dominated by the meeting counts, 2 * len(gammas) * num_replicas * num_people ** 2 bytes.
+
+    Args:
+        num_people (int) - number of people in the program
+        num_weeks (int) - number of weeks to simulate
+        gammas (Sequence[float]) - the gammas to evaluate, each must be positive (gamma < 1 discourages repeat meetings)
+        num_replicas (int) - number of independent replicas per gamma
+        seed - optional seed for the random number generator
+
+    Returns:
+        A dictionary mapping every gamma to its SimulationResult
+    """
+    if any(gamma <= 0 for gamma in gammas):
+        raise ValueError("Every gamma must be positive")
+    random = np.random.default_rng(seed=seed)
+    log_gammas = np.repeat(np.log(np.asarray(gammas, dtype=np.float64)),
+                           num_replicas)
+    simulator = BatchedPairingSimulator(num_people, log_gammas, random)
+    pairs_per_week = num_people // 2 + num_people % 2 * 2
+
+    repeat_rates = np.zeros((len(log_gammas), num_weeks))
+    weeks_until_everyone_met = np.full(len(log_gammas), -1, dtype=np.int64)
+    for week in range(num_weeks):
+        repeat_rates[:, week] = simulator.simulate_week() / pairs_per_week
+        newly_complete = (simulator.unmet == 0) & (weeks_until_everyone_met
+                                                   == -1)
+        weeks_until_everyone_met[newly_complete] = week + 1
+
+    results = {}
+    for position, gamma in enumerate(gammas):
+        rows = np.arange(position * num_replicas, (position + 1) * num_replicas)
+        results[gamma] = SimulationResult(
+            gamma=gamma,
+            num_people=num_people,
+            num_weeks=num_weeks,
+            num_replicas=num_replicas,
+            repeat_rate=repeat_rates[rows].mean(axis=0),
+            meetings_histogram=simulator.meetings_histogram(rows),
+            weeks_until_everyone_met=weeks_until_everyone_met[rows],
+            max_meetings=simulator.max_counts[rows],
+        )
+    return results
+
+
+def main(num_people, num_weeks, gammas, num_replicas=16):
+    for gamma, result in simulate(num_people, num_weeks, gammas,
+                                  num_replicas).items():
+        print("gamma {}:".format(gamma))
+        print("  mean repeat rate:", result.repeat_rate.mean())
+        print("  meetings histogram:", result.meetings_histogram)
+        print("  weeks until everyone met:", result.weeks_until_everyone_met)
+        print("  max meetings:", result.max_meetings)
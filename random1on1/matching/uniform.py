@@ -1,70 +1,90 @@
 import logging
-import sys
 from datetime import datetime
 from typing import List
 
 import numpy
-from discord import Member
 from networkx import complete_graph
-from networkx import difference
 from networkx import Graph
 from networkx import union
 
 from random1on1.api.algorithm import MatchingAlgorithm
+from random1on1.api.algorithm import MergedHistory
 from random1on1.api.pairings import Pairings
+from random1on1.matching.bitsets import AllowedPairings
 
 logger = logging.getLogger("discord")
-stream = logging.StreamHandler(sys.stdout)
-stream.setLevel(logging.DEBUG)
-logger.addHandler(stream)
 
 
 class UniformMatchingAlgorithm(MatchingAlgorithm):
 
-    def __init__(self, participants: List[Member],
-                 previous_pairings_merged: Pairings):
+    def __init__(self,
+                 participants: List[int],
+                 previous_pairings_merged: MergedHistory,
+                 seed=None):
         self.participants = participants
         self.previous_pairings_merged = previous_pairings_merged
         self.potential_pairings = self.construct_potential_pairings(
             participants, previous_pairings_merged)
-        self.random = numpy.random.default_rng()
+        self.random = numpy.random.default_rng(seed=seed)
 
-    def construct_potential_pairings(self, participants: List[Member],
-                                     previous_pairings_merged: Pairings):
-        logger.debug("Creating potential pairings graph")
-        previous_pairings_merged_graph = previous_pairings_merged.pairing_graph
-        all_members = set(self.participants).union(
-            set(previous_pairings_merged_graph.nodes))
-        not_participating = all_members - set(participants)
-        previous_pairings_merged_graph.add_nodes_from(participants)
-        complete_pairings_graph = complete_graph(all_members)
-        potential_pairing_graph = difference(
-            complete_pairings_graph,
-            self.previous_pairings_merged.pairing_graph)
-
-        for member in not_participating:
-            potential_pairing_graph.remove_node(member)
-
-        return potential_pairing_graph
+    def construct_potential_pairings(
+            self, participants: List[int],
+            previous_pairings_merged: MergedHistory) -> AllowedPairings:
+        """
+        Packs the pairs of participants that have not been paired before into an AllowedPairings bitset. The history is first restricted to the
+        participants, so former participants and already paired couples are never materialised.
+        """
+        logger.debug("Creating potential pairings bitset")
+        participant_index = {
+            participant: index
+            for index, participant in enumerate(participants)
+        }
+        previous_pairs = [
+            (participant_index[person_1], participant_index[person_2])
+            for person_1, person_2, _ in previous_pairings_merged.edges()
+            if person_1 in participant_index and person_2 in participant_index
+        ]
+        return AllowedPairings(len(participants), previous_pairs)
 
     def generate_pairs(self, dry_run: bool) -> Pairings:
         """
-        Generate pairings completely at random by picking remaining edges. As soon as remaining nodes is 3 or less, then deal with edge cases.
+        Generate pairings completely at random by picking remaining allowed pairs. As soon as remaining nodes is 3 or less, then deal with edge
+        cases.
+
+        Drawing a participant with probability proportional to their number of allowed partners, and then one of those partners uniformly, draws
+        every remaining allowed pair with the same probability.
         """
+        allowed = self.potential_pairings
+        allowed.reset_available()
+        num_participants = len(self.participants)
+        num_partners = numpy.array([
+            allowed.count_allowed_partners(index)
+            for index in range(num_participants)
+        ], dtype=numpy.int64)
+        num_remaining = num_participants
 
         pairing_graph = Graph()
 
-        while (len(self.potential_pairings.nodes) > 3
-               and len(self.potential_pairings.edges) > 1):
-            person_1, person_2 = self.random.choice(
-                list(self.potential_pairings.edges))
-            pairing_graph.add_edge(person_1, person_2)
-            self.potential_pairings.remove_edge(person_1, person_2)
-            self.potential_pairings.remove_node(person_1)
-            self.potential_pairings.remove_node(person_2)
+        while num_remaining > 3 and num_partners.sum() // 2 > 1:
+            person_1 = int(
+                self.random.choice(num_participants,
+                                   p=num_partners / num_partners.sum()))
+            person_2 = allowed.random_allowed_partner(person_1, self.random)
+            pairing_graph.add_edge(self.participants[person_1],
+                                   self.participants[person_2])
+            for person in (person_1, person_2):
+                allowed.remove(person)
+                num_partners[allowed.allowed_partners(person)] -= 1
+                num_partners[person] = 0
+            num_remaining -= 2
 
-        if len(self.potential_pairings.nodes) <= 3:
-            remaining_pairings = complete_graph(self.potential_pairings)
+        remaining = numpy.flatnonzero(
+            numpy.unpackbits(allowed.available,
+                             count=num_participants,
+                             bitorder="little"))
+        if len(remaining) <= 3:
+            remaining_pairings = complete_graph(
+                [self.participants[index] for index in remaining])
             pairing_graph = union(pairing_graph, remaining_pairings)
         else:
             # TODO: Address algorithm completeness error for unpaired people
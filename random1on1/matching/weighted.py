@@ -0,0 +1,244 @@
+"""
+random1on1.matching.weighted
+
+The WeightedMatchingAlgorithm treats the weekly matching as a minimum-penalty perfect matching problem instead of drawing random pairs until it
+gets stuck. Every pair of participants is allowed, but pairs who met before carry a penalty that grows with the number of times they met and
+decays with the time since they last met:
+
+    penalty = meeting_penalty * meetings + recency_penalty * 0.5 ** (weeks_since_last_meeting / half_life_weeks)
+
+The merged history graph may annotate its edges with a `meetings` count and a `last_met` datetime. Edges without these annotations are treated as a
+single meeting that happened just now, i.e. as strongly as possible.
+
+Small programs (at most exact_max_participants people) are solved exactly with networkx's blossom algorithm. Larger programs start from a fast
+randomized greedy matching which is then improved by local search (swapping partners between two pairs whenever that lowers the total penalty)
+until either no penalized pairs remain, the search stalls, or the wall-clock time_budget runs out. Either way every participant gets matched.
+
+The blossom algorithm cannot be interrupted, so the time_budget does not bound the exact solver. Its running time is bounded by
+exact_max_participants instead (well below a second at the default of 64). A time_budget of 0 skips both the exact solver and the local search and
+returns the greedy matching.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from networkx import Graph
+from networkx import max_weight_matching
+
+from random1on1.api.algorithm import MatchingAlgorithm
+from random1on1.api.algorithm import MergedHistory
+from random1on1.api.pairings import Pairings
+
+logger = logging.getLogger("discord")
+
+DEFAULT_TIME_BUDGET = 5.0
+DEFAULT_HALF_LIFE_WEEKS = 26.0
+DEFAULT_MEETING_PENALTY = 1.0
+DEFAULT_RECENCY_PENALTY = 4.0
+DEFAULT_EXACT_MAX_PARTICIPANTS = 64
+GREEDY_PROBES = 16
+STALL_ITERATIONS_PER_PARTICIPANT = 50
+
+
+class WeightedMatchingAlgorithm(MatchingAlgorithm):
+    """
+    Matches everyone while minimizing the total history penalty of the chosen pairs (see the module docstring for the penalty and the solver).
+
+    Args:
+        participants (List[int]) - the member IDs to match this week
+        previous_pairings_merged (MergedHistory) - the merged history, optionally with `meetings` and `last_met` edge attributes
+        seed - optional seed for the random number generator
+        time_budget (float) - wall-clock seconds the solver may spend improving on the greedy matching, 0 returns the greedy matching
+        half_life_weeks (float) - number of weeks after which the recency penalty of a meeting has halved
+        meeting_penalty (float) - penalty per previous meeting of a pair
+        recency_penalty (float) - penalty for a pair that met this week, decaying with half_life_weeks
+        exact_max_participants (int) - programs up to this size are solved exactly
+    """
+
+    def __init__(
+        self,
+        participants: List[int],
+        previous_pairings_merged: MergedHistory,
+        seed=None,
+        time_budget: float = DEFAULT_TIME_BUDGET,
+        half_life_weeks: float = DEFAULT_HALF_LIFE_WEEKS,
+        meeting_penalty: float = DEFAULT_MEETING_PENALTY,
+        recency_penalty: float = DEFAULT_RECENCY_PENALTY,
+        exact_max_participants: int = DEFAULT_EXACT_MAX_PARTICIPANTS,
+    ):
+        super().__init__(participants, previous_pairings_merged, seed=seed)
+        if time_budget < 0:
+            raise ValueError("time_budget must be non-negative")
+        if half_life_weeks <= 0:
+            raise ValueError("half_life_weeks must be positive")
+        self.participants = list(participants)
+        self.previous_pairings_merged = previous_pairings_merged
+        self.time_budget = time_budget
+        self.half_life_weeks = half_life_weeks
+        self.meeting_penalty = meeting_penalty
+        self.recency_penalty = recency_penalty
+        self.exact_max_participants = exact_max_participants
+        self.penalties = self.construct_penalties(previous_pairings_merged,
+                                                  datetime.now())
+
+    def construct_penalties(self, previous_pairings_merged: MergedHistory,
+                            now: datetime) -> Dict[Tuple[int, int], float]:
+        """ Computes the penalty of every previously paired couple of participants, keyed by their (smaller, larger) participant indices. """
+        participant_index = {
+            participant: index
+            for index, participant in enumerate(self.participants)
+        }
+        penalties = {}
+        for person_1, person_2, data in previous_pairings_merged.edges():
+            index_1 = participant_index.get(person_1)
+            index_2 = participant_index.get(person_2)
+            if index_1 is None or index_2 is None or index_1 == index_2:
+                continue
+            last_met = data.get("last_met")
+            weeks_since = 0.0 if last_met is None else max(
+                (now - last_met).days / 7, 0.0)
+            penalty = (self.meeting_penalty * data.get("meetings", 1) +
+                       self.recency_penalty *
+                       0.5**(weeks_since / self.half_life_weeks))
+            penalties[(min(index_1, index_2), max(index_1, index_2))] = penalty
+        return penalties
+
+    def penalty(self, index_1: int, index_2: int) -> float:
+        if index_1 > index_2:
+            index_1, index_2 = index_2, index_1
+        return self.penalties.get((index_1, index_2), 0.0)
+
+    def exact_pairs(self) -> List[Tuple[int, int]]:
+        """ Solves the matching exactly with the blossom algorithm. A small random jitter breaks ties so equal-penalty matchings stay random. """
+        num_participants = len(self.participants)
+        ceiling = max(self.penalties.values(), default=0.0) + 1.0
+        jitter = self.random.random(num_participants * num_participants)
+        graph = Graph()
+        graph.add_nodes_from(range(num_participants))
+        for index_1 in range(num_participants):
+            for index_2 in range(index_1 + 1, num_participants):
+                graph.add_edge(
+                    index_1,
+                    index_2,
+                    weight=ceiling - self.penalty(index_1, index_2) +
+                    0.01 * jitter[index_1 * num_participants + index_2])
+        return list(max_weight_matching(graph, maxcardinality=True))
+
+    def greedy_pairs(self) -> List[Tuple[int, int]]:
+        """ Walks through the participants in random order and pairs each with the cheapest of a few randomly probed unmatched participants. """
+        remaining = list(self.random.permutation(len(self.participants)))
+        position = [0] * len(remaining)
+        for index, participant in enumerate(remaining):
+            position[participant] = index
+
+        def remove(participant):
+            last = remaining.pop()
+            if last != participant:
+                remaining[position[participant]] = last
+                position[last] = position[participant]
+
+        pairs = []
+        while len(remaining) > 1:
+            person_1 = remaining[-1]
+            remove(person_1)
+            probes = self.random.integers(len(remaining), size=GREEDY_PROBES)
+            best = None
+            for probe in probes:
+                candidate = remaining[probe]
+                candidate_penalty = self.penalty(person_1, candidate)
+                if best is None or candidate_penalty < best[1]:
+                    best = (candidate, candidate_penalty)
+                    if candidate_penalty == 0.0:
+                        break
+            remove(best[0])
+            pairs.append((person_1, best[0]))
+        return pairs
+
+    def improve_pairs(self, pairs: List[Tuple[int, int]],
+                      deadline: float) -> List[Tuple[int, int]]:
+        """ Swaps partners between a penalized pair and a random other pair whenever that lowers their combined penalty. """
+        if len(pairs) < 2 or time.monotonic() >= deadline:
+            return pairs
+        penalized = [p for p in range(len(pairs)) if self.penalty(*pairs[p]) > 0]
+        stall_limit = STALL_ITERATIONS_PER_PARTICIPANT * len(self.participants)
+        stalled = 0
+        iterations = 0
+        while penalized and stalled < stall_limit:
+            iterations += 1
+            if iterations % 256 == 0 and time.monotonic() > deadline:
+                logger.debug(
+                    "Ran out of time budget while improving matching with %d penalized pairs left",
+                    len(penalized))
+                break
+            slot = int(self.random.integers(len(penalized)))
+            first = penalized[slot]
+            current_penalty = self.penalty(*pairs[first])
+            if current_penalty == 0.0:
+                penalized[slot] = penalized[-1]
+                penalized.pop()
+                continue
+            second = int(self.random.integers(len(pairs)))
+            if second == first:
+                continue
+            (a, b), (c, d) = pairs[first], pairs[second]
+            current = current_penalty + self.penalty(c, d)
+            option_1 = self.penalty(a, c) + self.penalty(b, d)
+            option_2 = self.penalty(a, d) + self.penalty(b, c)
+            if min(option_1, option_2) < current:
+                if option_1 <= option_2:
+                    pairs[first], pairs[second] = (a, c), (b, d)
+                else:
+                    pairs[first], pairs[second] = (a, d), (b, c)
+                if self.penalty(*pairs[second]) > 0:
+                    penalized.append(second)
+                stalled = 0
+            else:
+                stalled += 1
+        return pairs
+
+    def solve(self) -> List[List[int]]:
+        """ Returns the pairing groups as lists of participant indices (one group of 3 if the number of participants is odd). """
+        start = time.monotonic()
+        if self.time_budget > 0 and len(
+                self.participants) <= self.exact_max_participants:
+            pairs = self.exact_pairs()
+        else:
+            pairs = self.improve_pairs(self.greedy_pairs(),
+                                       start + self.time_budget)
+        logger.debug("Computed weighted matching in %f seconds",
+                     time.monotonic() - start)
+
+        groups = [list(pair) for pair in pairs]
+        matched = set(index for pair in pairs for index in pair)
+        unmatched = [
+            index for index in range(len(self.participants))
+            if index not in matched
+        ]
+        for leftover in unmatched:
+            if len(groups) == 0:
+                groups.append([leftover])
+                continue
+            best_group = min(
+                groups,
+                key=lambda group: sum(
+                    self.penalty(leftover, other) for other in group))
+            best_group.append(leftover)
+        return groups
+
+    def generate_pairs(self, dry_run: bool) -> Pairings:
+        """ Generates pairings that minimize repeat meetings, weighted by how often and how recently people met. """
+        pairing_graph = Graph()
+        pairing_graph.add_nodes_from(self.participants)
+        for group in self.solve():
+            for position, index_1 in enumerate(group):
+                for index_2 in group[position + 1:]:
+                    pairing_graph.add_edge(self.participants[index_1],
+                                           self.participants[index_2])
+
+        return Pairings(pairing_graph=pairing_graph,
+                        date_of_pairing=datetime.now(),
+                        dry_run=dry_run)
@@ -3,57 +3,152 @@ The Random1on1Bot class is the code that does all the heavy lifting in connectin
 reading in previous match history, running a 1-on-1 matching algorithm, and then sending out all the matches to the rest of the discord server. The 
 Random1on1Bot class itself is a wrapper on the discord.Client object and all the work is done through the on_ready() method and the subsequent helper
 methods that it calls. 
+
+A single Random1on1Bot can serve many guilds over one gateway session: every Random1on1BotConfig it is given becomes a Random1on1GuildProgram, which
+holds the per-guild state (category, role and channels) and runs the setup/matching/announce pipeline for that guild. The programs run concurrently
+with at most max_concurrent_guilds in flight, and a failing guild does not stop the others. The matching itself runs in a MatchingWorkerPool shared by
+all programs, so the event loop keeps answering gateway heartbeats while large guilds are matched on several cores. Pairing groups are introduced
+through a MessageDispatcher, also shared by all programs, which sends the messages concurrently within the bot's rate limits.
+
+By default the bot runs every program once as soon as it is connected and then closes. In daemon mode it stays connected instead and runs the
+program of every guild whenever the guild's schedule (see random1on1.api.schedule) is due. The programs then keep their state between runs: the
+resolved category, role and channels are reused, and the history is read once and then kept up to date in memory from the bot's own writes (see
+random1on1.api.storage.WarmHistoryStore), and unless the bot starts lean, the participants are kept in a ParticipantIndex that the bot updates from
+the member events of the gateway (see random1on1.api.members). A scheduled run then only costs the matching and the posts. A run that fails drops the
+state of its guild, which is resolved from scratch in the next run.
 """
+import asyncio
 import logging
-import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
 from typing import List
+from typing import Optional
 
-from discord import AllowedMentions
 from discord import CategoryChannel
 from discord import Client
+from discord import Intents
 from discord import Member
-from networkx import connected_components
+from discord import MemberCacheFlags
 
 from random1on1.api.channels import AnnouncementChannel
 from random1on1.api.channels import HistoryChannel
 from random1on1.api.channels import LoggingChannel
-from random1on1.api.config import config_from_json
 from random1on1.api.config import Random1on1BotConfig
-from random1on1.matching.uniform import UniformMatchingAlgorithm
+from random1on1.api.config import read_config
+from random1on1.api.dispatch import log_delivery_results
+from random1on1.api.dispatch import MessageDispatcher
+from random1on1.api.logs import configure_logging
+from random1on1.api.logs import current_guild
+from random1on1.api.members import fetch_role_members
+from random1on1.api.members import MemberDirectory
+from random1on1.api.members import ParticipantIndex
+from random1on1.api.members import peak_memory_mib
+from random1on1.api.metrics import current_run
+from random1on1.api.metrics import instrument_http
+from random1on1.api.metrics import instrument_rate_limits
+from random1on1.api.metrics import measure
+from random1on1.api.metrics import record_time
+from random1on1.api.metrics import RunMetrics
+from random1on1.api.metrics import RunReport
+from random1on1.api.pairings import Pairings
+from random1on1.api.pairings import resolve_members
+from random1on1.api.schedule import CronSchedule
+from random1on1.api.storage import create_history_store
+from random1on1.api.storage import WarmHistoryStore
+from random1on1.api.workers import MatchingJob
+from random1on1.api.workers import MatchingWorkerPool
 
 logger = logging.getLogger("discord")
-stream = logging.StreamHandler(sys.stdout)
-stream.setLevel(logging.DEBUG)
-logger.addHandler(stream)
 
+DEFAULT_MAX_CONCURRENT_GUILDS = 8
+
+
+def client_options(lean_startup: bool = False) -> dict:
+    """
+    The discord.Client options of a startup mode. The default mode chunks every guild at startup so participants can be read off Role.members.
+    Lean startup connects with the minimal intents (guilds and members) and neither chunks guilds nor caches members; every program fetches the
+    holders of its role itself (see random1on1.api.members).
+    """
+    if not lean_startup:
+        intents = Intents.default()
+        intents.members = True
+        return {"intents": intents}
+    intents = Intents.none()
+    intents.guilds = True
+    intents.members = True
+    return {
+        "intents": intents,
+        "chunk_guilds_at_startup": False,
+        "member_cache_flags": MemberCacheFlags.none(),
+    }
+
+
+@dataclass(frozen=True)
+class GuildRunResult:
+    """ Outcome of running the matching program for a single guild. """
 
-def read_config(location):
-    # TODO: Move this method to Random1on1BotConfig
-    with open(location, "r") as config_file:
-        config = config_from_json(config_file.read())
-    return config
+    guild_id: int
+    succeeded: bool
+    seconds: float
+    error: Optional[str] = None
 
 
 class Random1on1Bot(Client):
 
     def __init__(self,
-                 config: Random1on1BotConfig,
+                 config: Optional[Random1on1BotConfig] = None,
                  dry_run: bool = False,
+                 configs: Optional[List[Random1on1BotConfig]] = None,
+                 max_concurrent_guilds: int = DEFAULT_MAX_CONCURRENT_GUILDS,
+                 worker_pool: Optional[MatchingWorkerPool] = None,
+                 dispatcher: Optional[MessageDispatcher] = None,
+                 lean_startup: bool = False,
+                 profile_matching: bool = False,
+                 daemon: bool = False,
+                 on_run_complete: Optional[Callable[["Random1on1Bot"],
+                                                    None]] = None,
                  **kwargs):
         super().__init__(**kwargs)
+        self.started_at = time.monotonic()
+        instrument_http(self.http)
+        instrument_rate_limits()
+        if (config is None) == (configs is None):
+            raise ValueError("Specify exactly one of config and configs")
+        if max_concurrent_guilds < 1:
+            raise ValueError("max_concurrent_guilds must be at least 1")
+        self.configs = [config] if config is not None else list(configs)
+        guild_ids = [c.guild_id for c in self.configs]
+        if len(set(guild_ids)) != len(guild_ids):
+            raise ValueError("Every guild can only be configured once")
         self.config = config
         self.dry_run = dry_run
-        logger.setLevel(level=logging.DEBUG)
-
-        # TODO: Add logging handler here for writing logs to #random1on1-bot-logs channel
-        # TODO: Add logging to all the elements we want
+        self.max_concurrent_guilds = max_concurrent_guilds
+        self.worker_pool = worker_pool if worker_pool is not None else MatchingWorkerPool(
+        )
+        self.dispatcher = dispatcher if dispatcher is not None else MessageDispatcher(
+        )
+        self.lean_startup = lean_startup
+        self.profile_matching = profile_matching
+        self.daemon = daemon
+        self.on_run_complete = on_run_complete
+        self.time_to_ready: Optional[float] = None
+        self.results: List[GuildRunResult] = []
+        self.report = RunReport()
+        self.programs: Dict[int, Random1on1GuildProgram] = {}
+        self.scheduler: Optional[asyncio.Task] = None
+        _ = configure_logging(level=logging.DEBUG)
 
     async def on_ready(self):
         """
-        on_ready() does the heavy lifting of calling other methods within the Random1on1Bot via a number of different helper methods. It works by 
-        first checking the guild for the proper setup (channels, category, and role all matching those specified by name in the Random1on1BotConfig 
-        file on disk) and then calling the run_matching_program() method which uses these setup access points for the server to actually pull the
-        proper information and send the messages to their appropriate channels. 
+        on_ready() does the heavy lifting by running a Random1on1GuildProgram for every configured guild. Each program first checks its guild for
+        the proper setup (channels, category, and role all matching those specified by name in the Random1on1BotConfig file on disk) and then
+        calls the run_matching_program() method which uses these setup access points for the server to actually pull the proper information and
+        send the messages to their appropriate channels. Once every guild is done, a summary is logged and the client is closed. In daemon mode, the
+        programs are run on their schedules instead and the client stays connected (see run_on_schedule).
 
         Usage (note to use this method, you do not have to call it directly): 
             >>> from random1on1.random1on1bot import Random1on1Bot
@@ -63,29 +158,251 @@ class Random1on1Bot(Client):
             >>> bot = Random1on1Bot(config=config) 
             >>> bot.run(token) # This implicitly calls the on_ready() method when it connects to discord
         """
+        if self.time_to_ready is None:
+            self.time_to_ready = time.monotonic() - self.started_at
+            self.report.seconds_to_ready = self.time_to_ready
+            memory = peak_memory_mib()
+            logger.info(
+                "Ready after %.2f seconds with a peak memory of %s MiB (lean_startup=%r)",
+                self.time_to_ready,
+                "unknown" if memory is None else f"{memory:.1f}",
+                self.lean_startup)
+        if self.daemon:
+            # on_ready is dispatched again whenever the gateway session has to be re-established, but only one scheduler may run. Member events
+            # may have been missed while the bot was disconnected, so the participants are looked up again by the next runs.
+            for program in self.programs.values():
+                program.participant_index = None
+            if self.scheduler is None:
+                self.scheduler = asyncio.ensure_future(self.run_on_schedule())
+            return
+        try:
+            self.results = await self.run_programs()
+        finally:
+            self.worker_pool.close()
+        self.complete_run()
+        _ = await self.close()
 
+    async def run_on_schedule(
+            self,
+            now: Callable[[], datetime] = datetime.now,
+            sleep: Callable[[float], Awaitable] = asyncio.sleep):
+        """
+        Runs the programs of the configured guilds whenever their schedules are due, until the task is cancelled. Guilds that are due at the same
+        time run together, and every such run gets a fresh RunReport that is passed on to on_run_complete.
+        """
+        schedules = {
+            config.guild_id: CronSchedule.parse(config.schedule)
+            for config in self.configs
+        }
+        previous_run = None
+        while True:
+            # Sleeping may end a moment early, so the next run is searched after the previous one too, lest it runs twice
+            after = now() if previous_run is None else max(now(), previous_run)
+            next_runs = {
+                guild_id: schedule.next_after(after)
+                for guild_id, schedule in schedules.items()
+            }
+            next_run = min(next_runs.values())
+            previous_run = next_run
+            logger.info("Next scheduled run at %s",
+                        next_run.strftime("%Y-%m-%d %H:%M"))
+            _ = await sleep(max((next_run - now()).total_seconds(), 0))
+            self.report = RunReport(seconds_to_ready=self.time_to_ready)
+            self.results = await self.run_programs([
+                config for config in self.configs
+                if next_runs[config.guild_id] <= next_run
+            ])
+            self.complete_run()
+
+    async def on_member_join(self, member: Member):
+        program = self.programs.get(member.guild.id)
+        if program is not None:
+            program.update_participant(member)
+
+    async def on_member_update(self, before: Member, after: Member):
+        program = self.programs.get(after.guild.id)
+        if program is not None:
+            program.update_participant(after)
+
+    async def on_member_remove(self, member: Member):
+        program = self.programs.get(member.guild.id)
+        if program is not None:
+            program.remove_participant(member)
+
+    def complete_run(self):
+        self.log_summary()
+        if self.on_run_complete is not None:
+            try:
+                self.on_run_complete(self)
+            except Exception:
+                logger.exception("Could not complete the run")
+
+    async def close(self):
+        if self.scheduler is not None:
+            self.scheduler.cancel()
+            self.scheduler = None
+            self.worker_pool.close()
+        _ = await super().close()
+
+    def get_program(self,
+                    config: Random1on1BotConfig) -> "Random1on1GuildProgram":
+        """ The program of a guild, which is kept for the next runs so it can reuse its state in daemon mode. """
+        if config.guild_id not in self.programs:
+            self.programs[config.guild_id] = Random1on1GuildProgram(
+                client=self,
+                config=config,
+                worker_pool=self.worker_pool,
+                dispatcher=self.dispatcher,
+                dry_run=self.dry_run,
+                lean_startup=self.lean_startup,
+                profile_matching=self.profile_matching,
+                warm=self.daemon)
+        return self.programs[config.guild_id]
+
+    async def run_programs(
+        self,
+        configs: Optional[List[Random1on1BotConfig]] = None
+    ) -> List[GuildRunResult]:
+        """ Runs the program of every configured guild (or of configs) concurrently, with at most max_concurrent_guilds in flight. """
+        semaphore = asyncio.Semaphore(self.max_concurrent_guilds)
+
+        async def run_program(config: Random1on1BotConfig) -> GuildRunResult:
+            async with semaphore:
+                start = time.monotonic()
+                program = self.get_program(config)
+                try:
+                    _ = await program.run()
+                except Exception as error:
+                    # The program has logged the error itself, so it also shows up in the guild's logging channel
+                    return GuildRunResult(guild_id=config.guild_id,
+                                          succeeded=False,
+                                          seconds=time.monotonic() - start,
+                                          error=repr(error))
+                finally:
+                    self.report.runs.append(program.metrics)
+                return GuildRunResult(guild_id=config.guild_id,
+                                      succeeded=True,
+                                      seconds=time.monotonic() - start)
+
+        return list(await asyncio.gather(*[
+            run_program(config)
+            for config in (configs if configs is not None else self.configs)
+        ]))
+
+    def log_summary(self):
+        failed = [result for result in self.results if not result.succeeded]
+        logger.info("Ran random 1-on-1s for %d guilds: %d succeeded, %d failed",
+                    len(self.results),
+                    len(self.results) - len(failed), len(failed))
+        for result in self.results:
+            logger.info("Guild %d: %s in %.2f seconds%s", result.guild_id,
+                        "succeeded" if result.succeeded else "failed",
+                        result.seconds,
+                        f" ({result.error})" if result.error else "")
+        memory = peak_memory_mib()
+        logger.info("Peak memory of the run: %s MiB",
+                    "unknown" if memory is None else f"{memory:.1f}")
+
+
+class Random1on1GuildProgram:
+    """
+    Runs the random 1-on-1s program for a single guild: resolves (or creates) the category, role and channels named in the config and then runs the
+    matching program in that guild. All the per-guild state lives here, so one client can run many programs at once.
+
+    A warm program keeps its state between runs (see the daemon mode of Random1on1Bot): the category, role and channels are only resolved by the
+    first run, and the history is kept in a WarmHistoryStore.
+    """
+
+    def __init__(self,
+                 client: Client,
+                 config: Random1on1BotConfig,
+                 worker_pool: MatchingWorkerPool,
+                 dry_run: bool = False,
+                 dispatcher: Optional[MessageDispatcher] = None,
+                 lean_startup: bool = False,
+                 profile_matching: bool = False,
+                 warm: bool = False):
+        self.client = client
+        self.config = config
+        self.worker_pool = worker_pool
+        self.dry_run = dry_run
+        self.dispatcher = dispatcher if dispatcher is not None else MessageDispatcher(
+        )
+        self.lean_startup = lean_startup
+        self.profile_matching = profile_matching
+        self.warm = warm
+        self.guild = None
+        self.is_set_up = False
+        self.guild_members: Optional[MemberDirectory] = None
+        self.participant_index: Optional[ParticipantIndex] = None
+        self.metrics = RunMetrics(guild_id=config.guild_id)
+
+    async def run(self):
+        """
+        Runs the program. Every record the program logs is attributed to its guild (see random1on1.api.logs.current_guild), and once the logging
+        channel is set up, they are also sent there. Likewise, every phase of the program is measured into its RunMetrics (see
+        random1on1.api.metrics). Every run gets its own RunMetrics.
+        """
+        self.metrics = RunMetrics(guild_id=self.config.guild_id)
+        _ = current_guild.set(self.config.guild_id)
+        _ = current_run.set(self.metrics)
+        self.log_handler = None
+        try:
+            _ = await self.run_program()
+        except Exception:
+            logger.exception("Random 1-on-1s program failed for guild %d",
+                             self.config.guild_id)
+            # Whatever broke the run may have invalidated the state (e.g. a deleted channel), so the next run starts from scratch
+            self.is_set_up = False
+            raise
+        finally:
+            if self.log_handler is not None:
+                _ = await self.log_handler.stop()
+
+    async def run_program(self):
         logger.debug("Setting up random1on1bot with config values %r",
                      self.config)
-        guild = self.get_guild(self.config.guild_id)
+        guild = self.client.get_guild(self.config.guild_id)
         if not guild:
             raise RuntimeError(
                 f"Specified guild id: {self.config.guild_id} could not be found."
             )
-        self.guild = guild
-
-        self.category = await self.get_random1on1_category()
-        self.random1on1_role = await self.get_random1on1_role()
-        self.default_role = await self.get_default_role()
-        self.announcement_channel = await self.get_announcement_channel()
-        self.history_channel = await self.get_history_channel()
-        self.logging_channel = await self.get_logging_channel()
-        logger.debug("Successfully setup random1on1bot")
+        # After the gateway session is re-established the guild is a new object, whose channels and role have to be resolved again
+        if self.is_set_up and self.warm and guild is self.guild:
+            logger.debug("Reusing the setup of the previous run")
+        else:
+            self.guild = guild
+            self.participant_index = None
+            with measure("setup"):
+                _ = await self.setup()
+            self.history_store = create_history_store(
+                store=self.config.history_store,
+                database=self.config.history_database,
+                guild_id=self.config.guild_id,
+                history_channel=self.history_channel)
+            if self.warm:
+                self.history_store = WarmHistoryStore(self.history_store)
+            self.is_set_up = True
+            logger.debug("Successfully setup random1on1bot")
+        self.log_handler = self.logging_channel.start_logging(
+            self.config.guild_id)
 
         logger.debug("Running random1on1bot's pairing method")
         _ = await self.run_matching_program()
         logger.debug("Completed the matching program")
 
-        _ = await self.close()
+    async def setup(self):
+        """
+        Resolves (or creates) the category, role and channels of the guild. Everything is looked up in the guild cache first and only what is
+        missing or out of date is sent to discord: the category and role are resolved concurrently, and then the three channels, each of which
+        needs at most one request to be created or to have its permissions reconciled. On a guild that is already set up, this sends nothing.
+        """
+        self.category, self.random1on1_role, self.default_role = await asyncio.gather(
+            self.get_random1on1_category(), self.get_random1on1_role(),
+            self.get_default_role())
+        self.announcement_channel, self.history_channel, self.logging_channel = await asyncio.gather(
+            self.get_announcement_channel(), self.get_history_channel(),
+            self.get_logging_channel())
 
     async def get_random1on1_category(self) -> CategoryChannel:
         """
@@ -168,7 +485,10 @@ class Random1on1Bot(Client):
     async def get_announcement_channel(self) -> AnnouncementChannel:
         """ Creates and sets permissions on the announcement channel based on the default_role and random1on1_role found by the client """
         announcement_channel = await AnnouncementChannel.create(
-            name=self.config.announcement_channel, category=self.category)
+            name=self.config.announcement_channel,
+            category=self.category,
+            default_role=self.default_role,
+            random1on1_role=self.random1on1_role)
         _ = await announcement_channel.set_permissions(
             default_role=self.default_role,
             random1on1_role=self.random1on1_role)
@@ -177,7 +497,10 @@ class Random1on1Bot(Client):
     async def get_history_channel(self) -> HistoryChannel:
         """ Creates and sets permissions on the history channel based on the default_role and random1on1_role found by the client """
         history_channel = await HistoryChannel.create(
-            name=self.config.history_channel, category=self.category)
+            name=self.config.history_channel,
+            category=self.category,
+            default_role=self.default_role,
+            random1on1_role=self.random1on1_role)
         _ = await history_channel.set_permissions(
             default_role=self.default_role,
             random1on1_role=self.random1on1_role)
@@ -186,16 +509,43 @@ class Random1on1Bot(Client):
     async def get_logging_channel(self) -> LoggingChannel:
         """ Creates and sets permissions on the logging channel based on the default_role and random1on1_role found by the client """
         logging_channel = await LoggingChannel.create(
-            name=self.config.logging_channel, category=self.category)
+            name=self.config.logging_channel,
+            category=self.category,
+            default_role=self.default_role,
+            random1on1_role=self.random1on1_role)
         _ = await logging_channel.set_permissions(
             default_role=self.default_role,
             random1on1_role=self.random1on1_role)
         return logging_channel
 
     async def get_participants(self) -> List[Member]:
-        """ Gets a list of all members of the random1on1_role """
+        """
+        Gets a list of all members of the random1on1_role. Without lean startup they are read from the member cache; with lean startup they are
+        fetched from discord and remembered in guild_members, which then stands in for the (empty) member cache. A warm program without lean startup
+        keeps them in its participant_index, which is updated from member events between runs.
+        """
         role = await self.get_random1on1_role()
-        return role.members
+        if self.participant_index is not None and self.participant_index.role is role:
+            logger.debug("Using the %d indexed participants",
+                         len(self.participant_index))
+            return self.participant_index.participants()
+        if not self.lean_startup:
+            participants = role.members
+            if self.warm:
+                self.participant_index = ParticipantIndex(role, participants)
+            return participants
+        participants = await fetch_role_members(self.guild, role)
+        self.guild_members = MemberDirectory(participants)
+        return participants
+
+    def update_participant(self, member: Member):
+        """ Applies a member event to the participant_index, if there is one. """
+        if self.participant_index is not None:
+            self.participant_index.update(member)
+
+    def remove_participant(self, member: Member):
+        if self.participant_index is not None:
+            _ = self.participant_index.remove(member.id)
 
     async def run_matching_program(self):
         """ 
@@ -207,11 +557,14 @@ class Random1on1Bot(Client):
             dry_run (bool) - A boolean parameter used to flag certain instances of hte matching program as a test run (i.e. not to be factored in to 
                              future matching criteria or announced to the broader public).
         """
+        from networkx import connected_components
+        from networkx import Graph
 
         logger.debug(
             "Fetching information to run the matching algorithm for random1on1 pairings"
         )
-        participants = await self.get_participants()
+        with measure("participants"):
+            participants = await self.get_participants()
 
         if len(participants) == 0:
             logger.debug(
@@ -219,64 +572,95 @@ class Random1on1Bot(Client):
             )
             return
 
-        previous_pairings_merged = await self.history_channel.read_historical_pairings(
-        )
+        # The history is merged by the matching worker, so the event loop only reads and decodes what is new since the checkpoint
+        history_from = self.config.history_window_start()
+        with measure("history"):
+            history = await self.history_store.read_history(
+                date_from=history_from)
         logger.debug(
             "Finished fetching information to run the matching algorithm for random1on1 pairings"
         )
 
-        # TODO: Make algorithms modular
-        #       Currently we don't have a way to encode algorithms in a modular fashion. We should set up a way to encode algorithms in a modular
-        #       fashion so that someone can specify an algorithm in the config, e.g. if they want the uniform sampling algorithm, their config
-        #       should look like
-        #       ```json
-        #           {
-        #               "algorithm": "UniformMatchingAlgorithm",
-        #               // other config stuff goes here.
-        #           }
-        #       ```
-
-        matching_algorithm = UniformMatchingAlgorithm(
-            participants=participants,
-            previous_pairings_merged=previous_pairings_merged)
+        members = {member.id: member for member in participants}
+        participant_ids = (self.participant_index.participant_ids()
+                           if self.participant_index is not None else
+                           tuple(members))
+        job = MatchingJob(algorithm=self.config.algorithm,
+                          participant_ids=participant_ids,
+                          history=history,
+                          dry_run=self.dry_run,
+                          algorithm_options=self.config.algorithm_kwargs(),
+                          profile=self.profile_matching,
+                          history_from=history_from)
         logger.debug(
-            "Constructed instance of random1on1 algorithm. Starting to run matching program."
-        )
-        pairings = matching_algorithm.generate_pairs(dry_run=self.dry_run)
+            "Running %s for %d participants in the matching workers",
+            self.config.algorithm, len(participants))
+        with measure("matching"):
+            result = await self.worker_pool.run(job)
+        for phase, seconds in result.timings.items():
+            record_time(phase, seconds)
+        self.metrics.profile = result.profile
+
+        pairing_graph = Graph()
+        for group in result.groups:
+            pairing_graph.add_nodes_from(group)
+            pairing_graph.add_edges_from(
+                (member_id_1, member_id_2)
+                for position, member_id_1 in enumerate(group)
+                for member_id_2 in group[position + 1:])
+        pairings = Pairings(pairing_graph=pairing_graph,
+                            date_of_pairing=result.date_of_pairing,
+                            dry_run=result.dry_run)
         logger.debug(
             "Succesfully matched participants for random1on1s on date_of_pairing: %s with dry_run: %r",
             pairings.date_of_pairing.strftime('%Y-%m-%d'), pairings.dry_run)
-        _ = await self.history_channel.write_pairings(pairings)
+        with measure("write_history"):
+            _ = await self.history_store.write_pairings(pairings)
 
         if not self.dry_run:
             if self.config.announce_matches:
                 logger.debug("Announcing pairings in the announcement channel")
-                _ = await self.announcement_channel.announce_pairings(pairings)
+                with measure("announce"):
+                    _ = await self.announcement_channel.announce_pairings(
+                        pairings,
+                        layout=self.config.announcement_layout,
+                        dispatcher=self.dispatcher,
+                        guild_members=self.guild_members)
             if self.config.dm_matches:
                 logger.debug(
                     "Iterating through pairings to create direct message groups for matched participants"
                 )
-                bot_user = self.user
+                bot_user = self.client.user
                 if not bot_user:
                     raise RuntimeError(
                         "Unable to communicate with bot user required for creating pairing groups"
                     )
 
-                async def send_intro_dm(pairing_group):
-                    logger.debug(
-                        "Creating pairing group chat for %f many people based on pairing group %r",
-                        len(pairing_group),
-                        [member.name for member in pairing_group])
-                    all_members = list(pairing_group)
-                    all_member_names = "/".join(
-                        [m.mention for m in all_members])
-                    for member in all_members:
-                        member_dm = f"Hey {member.name}!, this week for random 1-on-1s you have mattched with the following group: "\
-                                + f"[{all_member_names}]. \n\n Feel free to reach out to your group directly to setup some time to get "\
-                                + "to know eachother!"
-                        _ = await member.send(
-                            member_dm, allowed_mentions=AllowedMentions.all())
-
+                # Participants were fetched before matching, so refresh them in case anyone left the guild in the meantime
+                members, _ = resolve_members(
+                    self.guild_members
+                    if self.guild_members is not None else self.guild, members)
+                groups = []
                 for pairing_group in connected_components(
                         pairings.pairing_graph):
-                    _ = await send_intro_dm(pairing_group)
+                    group = [
+                        members[member_id] for member_id in pairing_group
+                        if member_id in members
+                    ]
+                    if len(group) < len(pairing_group):
+                        logger.debug(
+                            "Skipping %d departed members of pairing group %r",
+                            len(pairing_group) - len(group),
+                            sorted(pairing_group))
+                    groups.append(group)
+
+                with measure("introductions"):
+                    if self.config.intro_messages == "thread":
+                        results = await self.dispatcher.introduce_in_threads(
+                            self.announcement_channel.channel,
+                            f"Random 1-on-1s {pairings.date_of_pairing.strftime('%Y-%m-%d')}",
+                            groups)
+                    else:
+                        results = await self.dispatcher.introduce_in_dms(
+                            groups)
+                log_delivery_results(results)
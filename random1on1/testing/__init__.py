@@ -0,0 +1,10 @@
+"""
+random1on1.testing
+
+Tools to run the bot without discord: in-memory fakes of the discord objects the bot uses and generators of guilds of any size (see
+random1on1.testing.fakes).
+"""
+from random1on1.testing.fakes import FakeDiscordAPI
+from random1on1.testing.fakes import FakeGuild
+from random1on1.testing.fakes import FakeRandom1on1Bot
+from random1on1.testing.fakes import generate_guild
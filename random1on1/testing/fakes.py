@@ -0,0 +1,438 @@
+"""
+random1on1.testing.fakes
+
+In-memory stand-ins for the parts of discord.py the bot uses: Guild, Role, CategoryChannel, TextChannel, Member and Message. They behave like the
+real objects as far as the bot can tell, so the whole pipeline (setup, participants, history, matching, announcements and introductions) can run
+without a discord connection, e.g. in end-to-end tests and in benchmarks/pipeline.py.
+
+Every call that would be a request to discord goes through a FakeDiscordAPI, which counts it (also towards the current phase of the run, see
+random1on1.api.metrics) and waits for latency seconds. Paginated endpoints are paginated like discord paginates them: the message history of a
+channel is fetched 100 messages per request, and the member list of a guild 1000 members per request. Message IDs are snowflakes derived from the
+time the message was sent, so history reads by date behave like they do against discord.
+
+generate_guild builds a guild that has already been set up for random 1-on-1s, with any number of members (a share of whom hold the random1on1
+role) and years of weekly pairings in its history channel, written in the wire format the bot writes them in. FakeRandom1on1Bot runs a
+Random1on1Bot against such guilds.
+"""
+import asyncio
+import itertools
+import random
+from bisect import bisect_left
+from bisect import bisect_right
+from datetime import datetime
+from datetime import timedelta
+from typing import AsyncIterator
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Union
+
+from discord import Intents
+from discord import MessageType
+from discord import Object
+from discord.utils import snowflake_time
+from discord.utils import time_snowflake
+
+from random1on1.api.channels import AnnouncementChannel
+from random1on1.api.channels import HistoryChannel
+from random1on1.api.channels import LoggingChannel
+from random1on1.api.config import Random1on1BotConfig
+from random1on1.api.metrics import record_api_call
+from random1on1.api.wire import encode_pairing
+from random1on1.api.wire import EncodedPairing
+from random1on1.random1on1bot import Random1on1Bot
+
+MESSAGES_PER_PAGE = 100
+MEMBERS_PER_PAGE = 1000
+
+
+class FakeDiscordAPI:
+    """
+    Counts the requests of the fake objects sharing it and delays each of them.
+
+    Args:
+        latency (float) - seconds every request takes
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.num_requests = 0
+        self.ids = itertools.count(time_snowflake(datetime(2020, 1, 1)))
+
+    async def request(self):
+        self.num_requests += 1
+        record_api_call()
+        _ = await asyncio.sleep(self.latency)
+
+    def next_id(self) -> int:
+        return next(self.ids)
+
+
+def to_snowflake(value: Union[datetime, Object], high: bool = False) -> int:
+    if isinstance(value, datetime):
+        return time_snowflake(value, high=high)
+    return value.id
+
+
+class FakeAttachment:
+
+    def __init__(self, api: FakeDiscordAPI, data: bytes):
+        self.api = api
+        self.data = data
+        self.size = len(data)
+
+    async def read(self) -> bytes:
+        _ = await self.api.request()
+        return self.data
+
+
+class FakeMessage:
+
+    def __init__(self,
+                 channel: "FakeTextChannel",
+                 id: int,
+                 content: Optional[str],
+                 attachments: Iterable[FakeAttachment] = (),
+                 embeds: Iterable = (),
+                 type: MessageType = MessageType.default):
+        self.channel = channel
+        self.id = id
+        self.content = content or ""
+        self.attachments = list(attachments)
+        self.embeds = list(embeds)
+        self.type = type
+
+    @property
+    def created_at(self) -> datetime:
+        return snowflake_time(self.id)
+
+    async def pin(self):
+        _ = await self.channel.api.request()
+        self.channel.pinned.append(self)
+        _ = self.channel.add_message("", type=MessageType.pins_add)
+
+    async def unpin(self):
+        _ = await self.channel.api.request()
+        self.channel.pinned.remove(self)
+
+
+class FakeTextChannel:
+    """ A text channel (or thread) whose messages are kept in order of their IDs. """
+
+    def __init__(self,
+                 guild: "FakeGuild",
+                 name: str,
+                 category: Optional["FakeCategoryChannel"] = None,
+                 overwrites: Optional[dict] = None):
+        self.guild = guild
+        self.api = guild.api
+        self.id = guild.api.next_id()
+        self.name = name
+        self.category = category
+        self.overwrites = dict(overwrites or {})
+        self.messages: List[FakeMessage] = []
+        self.message_ids: List[int] = []
+        self.pinned: List[FakeMessage] = []
+        self.threads: List[FakeTextChannel] = []
+
+    @property
+    def last_message_id(self) -> Optional[int]:
+        return self.message_ids[-1] if self.message_ids else None
+
+    def add_message(self,
+                    content: Optional[str],
+                    attachments: Iterable[FakeAttachment] = (),
+                    embeds: Iterable = (),
+                    type: MessageType = MessageType.default,
+                    created_at: Optional[datetime] = None) -> FakeMessage:
+        """ Adds a message without a request, e.g. to fill the channel with history. Messages have to be added in chronological order. """
+        message_id = time_snowflake(created_at or datetime.now())
+        if self.message_ids and message_id <= self.message_ids[-1]:
+            message_id = self.message_ids[-1] + 1
+        message = FakeMessage(self, message_id, content, attachments, embeds,
+                              type)
+        self.messages.append(message)
+        self.message_ids.append(message_id)
+        return message
+
+    async def send(self,
+                   content: Optional[str] = None,
+                   *,
+                   embed=None,
+                   file=None,
+                   allowed_mentions=None) -> FakeMessage:
+        _ = await self.api.request()
+        attachments = [FakeAttachment(self.api, file.fp.read())
+                       ] if file is not None else []
+        return self.add_message(content, attachments,
+                                [embed] if embed is not None else [])
+
+    async def edit(self, overwrites: Optional[dict] = None, **kwargs):
+        _ = await self.api.request()
+        if overwrites is not None:
+            self.overwrites = dict(overwrites)
+
+    async def pins(self) -> List[FakeMessage]:
+        _ = await self.api.request()
+        return list(self.pinned)
+
+    async def history(self,
+                      limit: Optional[int] = 100,
+                      before: Optional[Union[datetime, Object]] = None,
+                      after: Optional[Union[datetime, Object]] = None,
+                      oldest_first: Optional[bool] = None
+                      ) -> AsyncIterator[FakeMessage]:
+        """ Yields the messages between after and before like TextChannel.history, fetching them MESSAGES_PER_PAGE messages per request. """
+        start = 0 if after is None else bisect_right(
+            self.message_ids, to_snowflake(after, high=True))
+        end = len(self.message_ids) if before is None else bisect_left(
+            self.message_ids, to_snowflake(before))
+        if oldest_first is None:
+            oldest_first = after is not None
+        positions = range(start, end) if oldest_first else range(
+            end - 1, start - 1, -1)
+        if limit is not None:
+            positions = positions[:limit]
+        # Like discord, an empty page still takes a request
+        for page_start in range(0, len(positions) or 1, MESSAGES_PER_PAGE):
+            _ = await self.api.request()
+            page = [
+                self.messages[position]
+                for position in positions[page_start:page_start +
+                                          MESSAGES_PER_PAGE]
+            ]
+            for message in page:
+                yield message
+
+    async def create_thread(self,
+                            *,
+                            name: str,
+                            message=None,
+                            auto_archive_duration: int = 1440,
+                            type=None,
+                            reason: Optional[str] = None,
+                            invitable: bool = True,
+                            slowmode_delay: Optional[int] = None
+                            ) -> "FakeTextChannel":
+        """ Same signature as TextChannel.create_thread of discord.py 2. """
+        _ = await self.api.request()
+        thread = FakeTextChannel(self.guild, name, self.category)
+        self.threads.append(thread)
+        return thread
+
+
+class FakeCategoryChannel:
+
+    def __init__(self, guild: "FakeGuild", name: str):
+        self.guild = guild
+        self.id = guild.api.next_id()
+        self.name = name
+        self.text_channels: List[FakeTextChannel] = []
+
+    def add_text_channel(self,
+                         name: str,
+                         overwrites: Optional[dict] = None) -> FakeTextChannel:
+        channel = FakeTextChannel(self.guild, name, self, overwrites)
+        self.text_channels.append(channel)
+        return channel
+
+    async def create_text_channel(
+            self,
+            name: str,
+            overwrites: Optional[dict] = None) -> FakeTextChannel:
+        _ = await self.guild.api.request()
+        return self.add_text_channel(name, overwrites)
+
+
+class FakeRole:
+
+    def __init__(self, guild: "FakeGuild", name: str):
+        self.guild = guild
+        self.id = guild.api.next_id()
+        self.name = name
+
+    @property
+    def mention(self) -> str:
+        return f"<@&{self.id}>"
+
+    @property
+    def members(self) -> List["FakeMember"]:
+        return [member for member in self.guild.members if self in member.roles]
+
+
+class FakeMember:
+
+    def __init__(self, guild: Optional["FakeGuild"], id: int, name: str,
+                 roles: Iterable[FakeRole] = ()):
+        self.guild = guild
+        self.id = id
+        self.name = name
+        self.roles = list(roles)
+        self.direct_messages: List[str] = []
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    async def send(self, content: str, **kwargs):
+        _ = await self.guild.api.request()
+        self.direct_messages.append(content)
+
+
+class FakeGuild:
+
+    def __init__(self, id: int, api: Optional[FakeDiscordAPI] = None):
+        self.id = id
+        self.api = api if api is not None else FakeDiscordAPI()
+        self.default_role = FakeRole(self, "@everyone")
+        self.roles: List[FakeRole] = [self.default_role]
+        self.categories: List[FakeCategoryChannel] = []
+        self.member_cache: Dict[int, FakeMember] = {}
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self.member_cache.values())
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self.member_cache.get(member_id)
+
+    def add_member(self, name: str,
+                   roles: Iterable[FakeRole] = ()) -> FakeMember:
+        member = FakeMember(self, self.api.next_id(), name,
+                            [self.default_role, *roles])
+        self.member_cache[member.id] = member
+        return member
+
+    def add_role(self, name: str) -> FakeRole:
+        role = FakeRole(self, name)
+        self.roles.append(role)
+        return role
+
+    def add_category(self, name: str) -> FakeCategoryChannel:
+        category = FakeCategoryChannel(self, name)
+        self.categories.append(category)
+        return category
+
+    async def create_role(self, name: str, **kwargs) -> FakeRole:
+        _ = await self.api.request()
+        return self.add_role(name)
+
+    async def create_category_channel(self, name: str,
+                                      **kwargs) -> FakeCategoryChannel:
+        _ = await self.api.request()
+        return self.add_category(name)
+
+    async def fetch_members(
+            self,
+            limit: Optional[int] = 1000) -> AsyncIterator[FakeMember]:
+        """ Yields the members of the guild like Guild.fetch_members, fetching them MEMBERS_PER_PAGE members per request. """
+        members = self.members if limit is None else self.members[:limit]
+        for page_start in range(0, len(members) or 1, MEMBERS_PER_PAGE):
+            _ = await self.api.request()
+            for member in members[page_start:page_start + MEMBERS_PER_PAGE]:
+                yield member
+
+
+def add_weekly_history(channel: FakeTextChannel,
+                       member_ids: List[int],
+                       num_weeks: int,
+                       seed: int = 0,
+                       end: Optional[datetime] = None):
+    """ Fills a history channel with num_weeks weekly pairings, random perfect matchings of member_ids, the last of which was a week before end. """
+    rng = random.Random(seed)
+    end = end if end is not None else datetime.now()
+    for week in range(num_weeks, 0, -1):
+        date_of_pairing = end - timedelta(weeks=week)
+        order = list(member_ids)
+        rng.shuffle(order)
+        pairs = tuple(zip(order[0::2], order[1::2]))
+        for content in encode_pairing(
+                EncodedPairing(date_of_pairing=date_of_pairing,
+                               dry_run=False,
+                               pairs=pairs)):
+            _ = channel.add_message(content, created_at=date_of_pairing)
+
+
+def generate_guild(num_members: int,
+                   num_participants: int,
+                   history_weeks: int = 0,
+                   config: Optional[Random1on1BotConfig] = None,
+                   latency: float = 0.0,
+                   former_participant_share: float = 0.2,
+                   seed: int = 0) -> FakeGuild:
+    """
+    Builds a guild that is already set up for random 1-on-1s as the config describes: it has the category, role and channels (with their
+    permissions), the opening announcement and history_weeks of weekly pairings in its history channel.
+
+    Args:
+        num_members (int) - number of members of the guild
+        num_participants (int) - number of those members who hold the random1on1 role
+        history_weeks (int) - number of weekly pairings in the history channel
+        config (Optional[Random1on1BotConfig]) - the config of the guild, its guild_id is the ID of the guild
+        latency (float) - seconds every request to the guild takes
+        former_participant_share (float) - share of participants who took part in the history but have since left the program
+        seed (int) - seed of the random choice of participants and pairings
+    """
+    if num_participants > num_members:
+        raise ValueError("num_participants cannot exceed num_members")
+    config = config if config is not None else Random1on1BotConfig(guild_id=1)
+    rng = random.Random(seed)
+    guild = FakeGuild(config.guild_id, FakeDiscordAPI(latency))
+    role = guild.add_role(config.random1on1_role)
+    category = guild.add_category(config.channel_category)
+    announcement_channel, history_channel, _ = [
+        category.add_text_channel(
+            name, channel_class.permission_overwrites(guild.default_role,
+                                                      role))
+        for channel_class, name in [
+            (AnnouncementChannel, config.announcement_channel),
+            (HistoryChannel, config.history_channel),
+            (LoggingChannel, config.logging_channel),
+        ]
+    ]
+    _ = announcement_channel.add_message(
+        "@everyone Hello Fellow Humans!",
+        created_at=datetime.now() - timedelta(weeks=history_weeks + 1))
+
+    participants = set(rng.sample(range(num_members), num_participants))
+    member_ids = []
+    for position in range(num_members):
+        member = guild.add_member(
+            f"member-{position}",
+            [role] if position in participants else [])
+        if position in participants:
+            member_ids.append(member.id)
+    former_ids = [
+        guild.api.next_id()
+        for _ in range(int(num_participants * former_participant_share))
+    ]
+    add_weekly_history(history_channel, member_ids + former_ids,
+                       history_weeks, seed)
+    return guild
+
+
+class FakeRandom1on1Bot(Random1on1Bot):
+    """
+    A Random1on1Bot that runs against FakeGuilds instead of connecting to discord. Calling on_ready() runs the program of every configured guild
+    right away, exactly like the real bot does once it is connected.
+
+    Args:
+        guilds (Iterable[FakeGuild]) - the guilds the bot can see
+    """
+
+    def __init__(self, guilds: Iterable[FakeGuild], **kwargs):
+        kwargs.setdefault("intents", Intents.none())
+        super().__init__(**kwargs)
+        self.fake_guilds = {guild.id: guild for guild in guilds}
+        self.fake_user = FakeMember(None, 0, "random1on1bot")
+
+    @property
+    def user(self) -> FakeMember:
+        return self.fake_user
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self.fake_guilds.get(guild_id)
+
+    async def close(self):
+        pass
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime
+
+from networkx import Graph
+
+from random1on1.api.announcements import pack_lines
+from random1on1.api.announcements import render_pairing_lines
+from random1on1.api.announcements import text_announcement
+from random1on1.api.channels import AnnouncementChannel
+from random1on1.api.pairings import Pairings
+
+
+class FakeMember:
+
+    def __init__(self, id):
+        self.id = id
+        self.mention = f"<@{id}>"
+
+
+class FakeGuild:
+
+    def __init__(self, members):
+        self.members = {member.id: member for member in members}
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+
+class FakeChannel:
+
+    def __init__(self, guild):
+        self.guild = guild
+        self.sent = []
+
+    async def send(self, **kwargs):
+        # discord.py 1 sends explicit None arguments as the text "None"
+        assert all(value is not None for value in kwargs.values())
+        self.sent.append((kwargs.get("content"), kwargs.get("embed")))
+
+
+def test_pack_lines_respects_max_length_and_line_boundaries():
+    lines = [f"line {i}\n" for i in range(100)]
+    chunks = list(pack_lines(lines, 50, prefix="header\n"))
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert chunks[0].startswith("header\n")
+    assert "".join(chunks) == "header\n" + "".join(lines)
+    assert all(chunk.endswith("\n") for chunk in chunks)
+
+
+def test_pack_lines_splits_overlong_lines():
+    chunks = list(pack_lines(["short\n", "x" * 25 + "\n", "end\n"], 10))
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert "".join(chunks) == "short\n" + "x" * 25 + "\nend\n"
+
+
+def test_text_announcement_of_a_large_guild():
+    groups = [(2 * i + 10**17, 2 * i + 1 + 10**17) for i in range(1000)]
+    mentions = {
+        member_id: f"<@{member_id}>"
+        for group in groups for member_id in group
+    }
+    messages = list(
+        text_announcement(datetime(2022, 3, 7),
+                          render_pairing_lines(groups, mentions)))
+    assert len(messages) > 1
+    assert all(len(message) <= 2000 for message in messages)
+    assert messages[0].startswith("@everyone Announcing the pairings")
+    assert sum(message.count("\n") for message in messages) == 1002
+
+
+def announce(layout, num_members=600):
+    members = [FakeMember(10**17 + i) for i in range(num_members)]
+    graph = Graph()
+    graph.add_edges_from(
+        (members[i].id, members[i + 1].id) for i in range(0, num_members, 2))
+    graph.add_edge(members[0].id, 42)
+    channel = FakeChannel(FakeGuild(members))
+    announcement_channel = AnnouncementChannel("announcements", None, channel)
+    asyncio.run(
+        announcement_channel.announce_pairings(
+            Pairings(pairing_graph=graph,
+                     date_of_pairing=datetime(2022, 3, 7),
+                     dry_run=False),
+            layout=layout))
+    return channel.sent
+
+
+def test_announce_pairings_sends_chunks_in_order():
+    sent = announce("text")
+    assert len(sent) > 1
+    assert all(len(content) <= 2000 for content, _ in sent)
+    assert "week of 2022-03-07" in sent[0][0]
+    assert "<@42>" not in "".join(content for content, _ in sent)
+
+
+def test_announce_pairings_with_embeds():
+    sent = announce("embed")
+    assert sent[0][0] == "@everyone"
+    assert "2022-03-07" in sent[0][1].title
+    assert all(content is None and embed.title is None
+               for content, embed in sent[1:])
+    assert all(len(embed.description) <= 4096 for _, embed in sent)
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+from discord import Intents
+
+from random1on1 import random1on1bot
+from random1on1.api.config import Random1on1BotConfig
+from random1on1.api.dispatch import MessageDispatcher
+from random1on1.api.workers import MatchingWorkerPool
+from random1on1.random1on1bot import Random1on1Bot
+from random1on1.testing import FakeRandom1on1Bot
+from random1on1.testing import generate_guild
+
+
+def test_bot_requires_configs():
+    with pytest.raises(ValueError):
+        _ = Random1on1Bot(intents=Intents.none())
+    with pytest.raises(ValueError):
+        _ = Random1on1Bot(configs=[
+            Random1on1BotConfig(guild_id=1),
+            Random1on1BotConfig(guild_id=1)
+        ],
+                          intents=Intents.none())
+
+
+def test_guild_failures_are_isolated(monkeypatch):
+    in_flight = []
+    max_in_flight = []
+
+    async def run(program):
+        in_flight.append(program.config.guild_id)
+        max_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(program.config.guild_id)
+        if program.config.guild_id == 2:
+            raise RuntimeError("guild 2 is broken")
+
+    monkeypatch.setattr(random1on1bot.Random1on1GuildProgram, "run", run)
+    bot = Random1on1Bot(
+        configs=[Random1on1BotConfig(guild_id=i) for i in range(1, 6)],
+        max_concurrent_guilds=2,
+        intents=Intents.none())
+    results = asyncio.run(bot.run_programs())
+
+    assert [result.guild_id for result in results] == [1, 2, 3, 4, 5]
+    assert [result.succeeded for result in results] == [
+        True, False, True, True, True
+    ]
+    assert "guild 2 is broken" in results[1].error
+    assert max(max_in_flight) == 2
+
+
+def test_daemon_keeps_its_state_between_scheduled_runs():
+    config = Random1on1BotConfig(guild_id=7,
+                                 algorithm="IndexedMatchingAlgorithm",
+                                 schedule="0 17 * * 1")
+    guild = generate_guild(num_members=100,
+                           num_participants=20,
+                           history_weeks=10,
+                           config=config)
+    reports = []
+    bot = FakeRandom1on1Bot(
+        [guild],
+        config=config,
+        worker_pool=MatchingWorkerPool(use_processes=False),
+        dispatcher=MessageDispatcher(sends_per_second=10000),
+        daemon=True,
+        on_run_complete=lambda bot: reports.append(bot.report))
+    clock = [datetime(2026, 10, 17, 12)]
+    sleeps = []
+
+    async def sleep(seconds):
+        if len(sleeps) == 2:
+            raise asyncio.CancelledError()
+        sleeps.append(seconds)
+        clock[0] += timedelta(seconds=seconds)
+
+    async def run():
+        with pytest.raises(asyncio.CancelledError):
+            await bot.run_on_schedule(now=lambda: clock[0], sleep=sleep)
+
+    asyncio.run(run())
+
+    assert sleeps == [53 * 3600, 7 * 24 * 3600]
+    assert [len(report.runs) for report in reports] == [1, 1]
+    assert all(result.succeeded for result in bot.results)
+    first, second = (report.runs[0].phases for report in reports)
+    assert "setup" in first and "history_fetch" in first
+    assert "setup" not in second and "history_fetch" not in second
+    assert second["history"].api_calls == 0
+    program = bot.programs[config.guild_id]
+    assert program.history_store.index.num_pairings == 12
+
+    bot.fake_guilds = {}
+    results = asyncio.run(bot.run_programs())
+    assert not results[0].succeeded
+    assert not program.is_set_up
+
+
+def test_daemon_maintains_participants_from_member_events():
+    config = Random1on1BotConfig(guild_id=7,
+                                 algorithm="IndexedMatchingAlgorithm")
+    guild = generate_guild(num_members=50,
+                           num_participants=10,
+                           history_weeks=2,
+                           config=config)
+    role = next(role for role in guild.roles
+                if role.name == config.random1on1_role)
+    bot = FakeRandom1on1Bot(
+        [guild],
+        config=config,
+        worker_pool=MatchingWorkerPool(use_processes=False),
+        dispatcher=MessageDispatcher(sends_per_second=10000),
+        daemon=True)
+    assert all(result.succeeded for result in asyncio.run(bot.run_programs()))
+    index = bot.programs[config.guild_id].participant_index
+    assert sorted(index.participant_ids()) == sorted(
+        member.id for member in role.members)
+
+    leaving, departed = role.members[:2]
+    joining = next(member for member in guild.members
+                   if role not in member.roles)
+    joining.roles.append(role)
+    asyncio.run(bot.on_member_update(joining, joining))
+    leaving.roles.remove(role)
+    asyncio.run(bot.on_member_update(leaving, leaving))
+    asyncio.run(bot.on_member_remove(departed))
+    assert joining.id in index and leaving.id not in index and departed.id not in index
+
+    # The next run reads the participants off the index only
+    for member in guild.members:
+        member.direct_messages.clear()
+    assert all(result.succeeded for result in asyncio.run(bot.run_programs()))
+    assert len(joining.direct_messages) == 1
+    assert not leaving.direct_messages and not departed.direct_messages
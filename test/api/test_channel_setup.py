@@ -0,0 +1,118 @@
+import asyncio
+
+from discord import PermissionOverwrite
+
+from random1on1.api.channels import AnnouncementChannel
+from random1on1.api.channels import HistoryChannel
+
+
+class FakeRole:
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, FakeRole) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeHistory:
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def __aiter__(self):
+        for message in self.messages:
+            yield message
+
+
+class FakeTextChannel:
+
+    def __init__(self, name, overwrites=None, last_message_id=None):
+        self.name = name
+        self.overwrites = dict(overwrites or {})
+        self.last_message_id = last_message_id
+        self.edits = []
+        self.sent = []
+        self.history_calls = 0
+
+    async def edit(self, overwrites):
+        self.edits.append(overwrites)
+        self.overwrites = dict(overwrites)
+
+    def history(self, limit=100):
+        self.history_calls += 1
+        return FakeHistory([])
+
+    async def send(self, content, **kwargs):
+        self.sent.append(content)
+
+
+class FakeCategory:
+
+    def __init__(self, text_channels=()):
+        self.name = "Random 1-on-1s"
+        self.text_channels = list(text_channels)
+        self.created = []
+
+    async def create_text_channel(self, name, overwrites=None):
+        channel = FakeTextChannel(name, overwrites)
+        self.created.append(channel)
+        self.text_channels.append(channel)
+        return channel
+
+
+EVERYONE = FakeRole(1, "@everyone")
+RANDOM1ON1 = FakeRole(2, "Random 1-on-1s")
+ADMINS = FakeRole(3, "Admins")
+
+
+def test_new_channels_are_created_with_their_overwrites():
+    category = FakeCategory()
+    history_channel = asyncio.run(
+        HistoryChannel.create("history", category, EVERYONE, RANDOM1ON1))
+    assert history_channel.channel.overwrites == {
+        EVERYONE: PermissionOverwrite(read_messages=False),
+        RANDOM1ON1: PermissionOverwrite(read_messages=False),
+    }
+    assert not asyncio.run(
+        history_channel.set_permissions(EVERYONE, RANDOM1ON1))
+    assert history_channel.channel.edits == []
+
+
+def test_set_permissions_only_edits_what_changed_in_one_request():
+    channel = FakeTextChannel(
+        "history", {
+            EVERYONE: PermissionOverwrite(read_messages=False),
+            RANDOM1ON1: PermissionOverwrite(read_messages=True),
+            ADMINS: PermissionOverwrite(read_messages=True),
+        })
+    history_channel = HistoryChannel("history", FakeCategory([channel]),
+                                     channel)
+    assert asyncio.run(history_channel.set_permissions(EVERYONE, RANDOM1ON1))
+    assert len(channel.edits) == 1
+    assert channel.overwrites[RANDOM1ON1] == PermissionOverwrite(
+        read_messages=False)
+    assert channel.overwrites[ADMINS] == PermissionOverwrite(
+        read_messages=True)
+    assert not asyncio.run(
+        history_channel.set_permissions(EVERYONE, RANDOM1ON1))
+    assert len(channel.edits) == 1
+
+
+def test_opening_announcement_is_only_sent_to_empty_channels():
+    channel = FakeTextChannel("announcements", last_message_id=42)
+    category = FakeCategory([channel])
+    _ = asyncio.run(AnnouncementChannel.create("announcements", category))
+    assert channel.history_calls == 0
+    assert channel.sent == []
+
+    empty_category = FakeCategory()
+    announcement_channel = asyncio.run(
+        AnnouncementChannel.create("announcements", empty_category, EVERYONE,
+                                   RANDOM1ON1))
+    assert announcement_channel.channel.history_calls == 1
+    assert len(announcement_channel.channel.sent) == 1
@@ -1,6 +1,10 @@
+import subprocess
+import sys
+
 import pytest
 
 from random1on1.api.config import config_from_json
+from random1on1.api.config import configs_from_json
 from random1on1.api.config import Random1on1BotConfig
 
 EMPTY_CONFIG_STR = '{}'
@@ -25,3 +29,103 @@ def test_config_deserialization_proper_config():
     assert test_config.dm_matches == False
     assert test_config.announce_matches == True
     assert test_config.history_channel == "hist"
+
+
+def test_config_algorithm_defaults_to_uniform():
+    test_config = config_from_json(TEST_CONFIG_STR)
+    assert test_config.algorithm == "UniformMatchingAlgorithm"
+    assert test_config.algorithm_kwargs() == {}
+
+
+def test_config_deserialization_algorithm():
+    test_config = config_from_json({
+        "guild_id": 1,
+        "algorithm": "WeightedMatchingAlgorithm",
+        "algorithm_options": {
+            "time_budget": 1.5
+        },
+    })
+    assert test_config.algorithm == "WeightedMatchingAlgorithm"
+    assert test_config.algorithm_kwargs() == {"time_budget": 1.5}
+    assert hash(test_config) == hash(config_from_json(test_config.to_json()))
+
+
+def test_config_algorithm_options_must_match_the_constructor():
+    with pytest.raises(ValueError, match="time_budgte"):
+        _ = config_from_json({
+            "guild_id": 1,
+            "algorithm": "WeightedMatchingAlgorithm",
+            "algorithm_options": {
+                "time_budgte": 1.5
+            },
+        })
+    with pytest.raises(ValueError):
+        _ = config_from_json({
+            "guild_id": 1,
+            "algorithm_options": {
+                "participants": []
+            },
+        })
+    with pytest.raises(ValueError):
+        _ = config_from_json({"guild_id": 1, "algorithm_options": [1, 2]})
+
+
+def test_config_unknown_algorithm():
+    with pytest.raises(ValueError):
+        _ = config_from_json({"guild_id": 1, "algorithm": "MagicAlgorithm"})
+
+
+def test_config_import_is_lightweight():
+    """ Validating a config must not import discord, networkx or numpy. """
+    code = "import sys; import random1on1.api.config; " \
+        "print(sorted(m for m in ('discord', 'networkx', 'numpy') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code],
+                            capture_output=True,
+                            text=True,
+                            check=True).stdout.strip()
+    assert output == "[]"
+
+
+def test_configs_deserialization_single_config():
+    test_configs = configs_from_json(TEST_CONFIG_STR)
+    assert len(test_configs) == 1
+    assert test_configs[0].guild_id == 1
+
+
+def test_configs_deserialization_list():
+    test_configs = configs_from_json(
+        '[{"guild_id": 1}, {"guild_id": 2, "algorithm": "IndexedMatchingAlgorithm"}]'
+    )
+    assert [config.guild_id for config in test_configs] == [1, 2]
+    assert test_configs[1].algorithm == "IndexedMatchingAlgorithm"
+
+
+def test_configs_deserialization_duplicate_guild():
+    with pytest.raises(ValueError):
+        _ = configs_from_json('[{"guild_id": 1}, {"guild_id": 1}]')
+
+
+def test_config_lookback_weeks():
+    from datetime import datetime
+
+    config = config_from_json({"guild_id": 1, "lookback_weeks": 4})
+    assert config.lookback_weeks == 4
+    assert config.history_window_start(
+        datetime(2022, 2, 7)) == datetime(2022, 1, 10)
+    assert config_from_json({"guild_id": 1}).history_window_start() is None
+    for lookback_weeks in (0, -1, 1.5, "4", True):
+        with pytest.raises(ValueError):
+            _ = config_from_json({
+                "guild_id": 1,
+                "lookback_weeks": lookback_weeks
+            })
+
+
+def test_config_intro_messages():
+    assert config_from_json({"guild_id": 1}).intro_messages == "dm"
+    assert config_from_json({
+        "guild_id": 1,
+        "intro_messages": "thread"
+    }).intro_messages == "thread"
+    with pytest.raises(ValueError):
+        _ = config_from_json({"guild_id": 1, "intro_messages": "carrier pigeon"})
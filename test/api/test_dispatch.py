@@ -0,0 +1,131 @@
+import asyncio
+
+from discord import Forbidden
+from discord import HTTPException
+
+from random1on1.api.dispatch import MessageDispatcher
+from random1on1.api.dispatch import RateLimiter
+
+
+class FakeResponse:
+
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.reason = "error"
+        self.headers = headers or {}
+
+
+class FakeMember:
+
+    def __init__(self, id, failures=()):
+        self.id = id
+        self.name = f"member-{id}"
+        self.mention = f"<@{id}>"
+        self.failures = list(failures)
+        self.received = []
+
+    async def send(self, content, **kwargs):
+        await asyncio.sleep(0)
+        if self.failures:
+            raise self.failures.pop(0)
+        self.received.append(content)
+
+
+class FakeThread:
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content, **kwargs):
+        self.sent.append(content)
+
+
+class FakeChannel:
+
+    def __init__(self):
+        self.threads = []
+
+    async def create_thread(self, name, type, invitable):
+        thread = FakeThread()
+        self.threads.append((name, thread))
+        return thread
+
+
+def dispatcher(**kwargs):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    return MessageDispatcher(sleep=sleep, **kwargs), delays
+
+
+def test_failures_are_isolated_and_transient_errors_retried():
+    closed_dms = FakeMember(2, [Forbidden(FakeResponse(403), "closed DMs")])
+    flaky = FakeMember(3, [
+        HTTPException(FakeResponse(429, {"Retry-After": "0.5"}), "slow down"),
+        HTTPException(FakeResponse(502), "bad gateway"),
+    ])
+    members = [FakeMember(1), closed_dms, flaky, FakeMember(4)]
+    dispatch, delays = dispatcher(sends_per_second=1000)
+    results = asyncio.run(
+        dispatch.introduce_in_dms([members[:2], members[2:]]))
+
+    assert [result.member_id for result in results] == [1, 2, 3, 4]
+    assert [result.succeeded for result in results] == [True, False, True, True]
+    assert results[1].attempts == 1 and "closed DMs" in results[1].error
+    assert results[2].attempts == 3
+    assert 0.5 in delays and 2.0 in delays
+    assert "<@1>/<@2>" in members[0].received[0]
+
+
+def test_sends_are_bounded():
+    in_flight = []
+    max_in_flight = []
+
+    class SlowMember(FakeMember):
+
+        async def send(self, content, **kwargs):
+            in_flight.append(self.id)
+            max_in_flight.append(len(in_flight))
+            await asyncio.sleep(0.001)
+            in_flight.remove(self.id)
+
+    dispatch = MessageDispatcher(max_concurrent_sends=3,
+                                 sends_per_second=10000)
+    results = asyncio.run(
+        dispatch.send_all((SlowMember(i), "hi") for i in range(20)))
+    assert all(result.succeeded for result in results)
+    assert max(max_in_flight) == 3
+
+
+def test_rate_limiter_spaces_out_acquisitions():
+    now = [0.0]
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    limiter = RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+
+    async def acquire(times):
+        for _ in range(times):
+            await limiter.acquire()
+
+    asyncio.run(acquire(3))
+    assert delays == [0.25, 0.5]
+
+
+def test_groups_are_introduced_in_threads():
+    channel = FakeChannel()
+    dispatch, _ = dispatcher()
+    results = asyncio.run(
+        dispatch.introduce_in_threads(
+            channel, "Random 1-on-1s 2022-03-07",
+            [[FakeMember(1), FakeMember(2)], [FakeMember(3), FakeMember(4)]]))
+    assert len(results) == 4 and all(result.succeeded for result in results)
+    assert [name for name, _ in channel.threads] == [
+        "Random 1-on-1s 2022-03-07: member-1, member-2",
+        "Random 1-on-1s 2022-03-07: member-3, member-4"
+    ]
+    assert all(len(thread.sent) == 1 for _, thread in channel.threads)
@@ -0,0 +1,148 @@
+import asyncio
+import inspect
+import threading
+from datetime import datetime
+from datetime import timedelta
+
+from discord import TextChannel
+
+from random1on1.api.channels import CHECKPOINT_HEADER
+from random1on1.api.config import Random1on1BotConfig
+from random1on1.api.dispatch import MessageDispatcher
+from random1on1.api.history import WeeklyHistoryIndex
+from random1on1.api.workers import MatchingWorkerPool
+from random1on1.testing import FakeRandom1on1Bot
+from random1on1.testing import generate_guild
+from random1on1.testing.fakes import MEMBERS_PER_PAGE
+from random1on1.testing.fakes import FakeTextChannel
+from random1on1.testing.fakes import MESSAGES_PER_PAGE
+
+
+def channel_named(guild, name):
+    return next(channel for channel in guild.categories[0].text_channels
+                if channel.name == name)
+
+
+def run_bot(guild, config, lean_startup=False):
+    bot = FakeRandom1on1Bot(
+        [guild],
+        config=config,
+        worker_pool=MatchingWorkerPool(use_processes=False),
+        dispatcher=MessageDispatcher(sends_per_second=10000),
+        lean_startup=lean_startup)
+    asyncio.run(bot.on_ready())
+    return bot
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_history_is_paginated_by_date():
+    config = Random1on1BotConfig(guild_id=7)
+    guild = generate_guild(num_members=10, num_participants=4, config=config)
+    channel = channel_named(guild, config.logging_channel)
+    start = datetime(2022, 1, 3)
+    for day in range(250):
+        channel.add_message(str(day), created_at=start + timedelta(days=day))
+
+    num_requests = guild.api.num_requests
+    messages = asyncio.run(
+        collect(channel.history(limit=None, after=start + timedelta(days=9))))
+    assert [message.content for message in messages[:2]] == ["10", "11"]
+    assert len(messages) == 240
+    assert guild.api.num_requests - num_requests == -(-240 //
+                                                      MESSAGES_PER_PAGE)
+
+    newest = asyncio.run(collect(channel.history(limit=1)))
+    assert [message.content for message in newest] == ["249"]
+
+
+def test_fake_threads_are_created_like_discord_threads():
+    """ Thread introductions need discord.py 2, the fake must not accept arguments the installed discord.py does not. """
+    assert list(inspect.signature(FakeTextChannel.create_thread).parameters
+                ) == list(inspect.signature(TextChannel.create_thread).parameters)
+
+
+def test_fetch_members_is_paginated():
+    guild = generate_guild(num_members=2500, num_participants=10)
+    num_requests = guild.api.num_requests
+    members = asyncio.run(collect(guild.fetch_members(limit=None)))
+    assert len(members) == 2500
+    assert guild.api.num_requests - num_requests == -(-2500 //
+                                                      MEMBERS_PER_PAGE)
+
+
+def test_full_pipeline_runs_against_a_generated_guild():
+    config = Random1on1BotConfig(guild_id=7,
+                                 algorithm="IndexedMatchingAlgorithm")
+    guild = generate_guild(num_members=300,
+                           num_participants=40,
+                           history_weeks=20,
+                           config=config)
+    history_channel = channel_named(guild, config.history_channel)
+    num_history_messages = len(history_channel.messages)
+
+    bot = run_bot(guild, config)
+
+    assert [result.succeeded for result in bot.results] == [True]
+    participants = [
+        member for member in guild.members if len(member.roles) == 2
+    ]
+    assert len(participants) == 40
+    assert all(len(member.direct_messages) == 1 for member in participants)
+    announcements = channel_named(guild, config.announcement_channel).messages
+    assert any("Announcing the pairings" in message.content
+               for message in announcements)
+    assert len(history_channel.messages) > num_history_messages
+    assert [message.content for message in history_channel.pinned
+            ] == [CHECKPOINT_HEADER]
+    phases = bot.report.runs[0].phases
+    assert phases["setup"].api_calls == 0
+    assert phases["introductions"].api_calls == 40
+
+
+def test_history_is_merged_off_the_event_loop(monkeypatch):
+    config = Random1on1BotConfig(guild_id=7,
+                                 algorithm="IndexedMatchingAlgorithm",
+                                 lookback_weeks=8)
+    guild = generate_guild(num_members=300,
+                           num_participants=40,
+                           history_weeks=20,
+                           config=config)
+    merge_threads = []
+    merged = WeeklyHistoryIndex.merged
+
+    def record_thread(index, *args, **kwargs):
+        merge_threads.append(threading.current_thread())
+        return merged(index, *args, **kwargs)
+
+    monkeypatch.setattr(WeeklyHistoryIndex, "merged", record_thread)
+    bot = run_bot(guild, config)
+
+    assert [result.succeeded for result in bot.results] == [True]
+    # The test pool runs jobs in threads, the event loop runs in the main thread
+    assert len(merge_threads) == 1
+    assert merge_threads[0] is not threading.main_thread()
+    assert bot.report.runs[0].phases["history_merge"].seconds > 0
+
+
+def test_lean_startup_fetches_members_and_reuses_the_checkpoint():
+    config = Random1on1BotConfig(guild_id=7,
+                                 algorithm="IndexedMatchingAlgorithm")
+    guild = generate_guild(num_members=1500,
+                           num_participants=30,
+                           history_weeks=10,
+                           config=config)
+    first = run_bot(guild, config, lean_startup=True)
+    second = run_bot(guild, config, lean_startup=True)
+
+    assert [result.succeeded for result in first.results + second.results
+            ] == [True, True]
+    first_phases = first.report.runs[0].phases
+    second_phases = second.report.runs[0].phases
+    assert first_phases["participants"].api_calls == 2
+    # The second run only fetches the messages after the checkpoint the first run wrote
+    assert second_phases["history_checkpoint"].bytes_fetched > 0
+    assert second_phases["history_fetch"].bytes_fetched < first_phases[
+        "history_fetch"].bytes_fetched
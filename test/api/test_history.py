@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from random1on1.api.history import HistoryEdgeTable
+from random1on1.api.history import week_of
+from random1on1.api.history import WeeklyHistoryIndex
+from random1on1.matching.weighted import WeightedMatchingAlgorithm
+
+WEEK_1 = datetime(2022, 1, 3)
+WEEK_2 = datetime(2022, 1, 10)
+WEEK_3 = datetime(2022, 1, 17)
+
+
+def history_table():
+    table = HistoryEdgeTable()
+    table.add_pairing([(1, 2), (3, 4)], WEEK_1)
+    table.add_pairing([(2, 1), (3, 5)], WEEK_3)
+    table.add_pairing([(1, 2)], WEEK_2)
+    return table
+
+
+def test_edge_table_tracks_meetings():
+    table = history_table()
+    assert len(table) == 3
+    assert table.num_pairings == 3
+    assert table.has_pair(2, 1)
+    assert not table.has_pair(1, 3)
+    edges = {(person_1, person_2): data
+             for person_1, person_2, data in table.edges()}
+    assert edges[(1, 2)] == {
+        "meetings": 3,
+        "first_met": WEEK_1,
+        "last_met": WEEK_3
+    }
+    assert edges[(3, 5)]["meetings"] == 1
+
+
+def test_edge_table_update_and_serialization():
+    table = history_table()
+    other = HistoryEdgeTable()
+    other.add_pairing([(1, 2), (6, 7)], datetime(2021, 12, 27))
+    table.update(other)
+    assert table.num_pairings == 4
+
+    restored = HistoryEdgeTable.from_bytes(table.to_bytes())
+    assert list(restored.edges()) == list(table.edges())
+    assert restored.num_pairings == 4
+    assert dict(((p1, p2), data) for p1, p2, data in restored.edges())[(
+        1, 2)]["first_met"] == datetime(2021, 12, 27)
+
+
+def test_edge_table_to_graph():
+    graph = history_table().to_graph(
+        resolve=lambda member_id: None if member_id == 5 else str(member_id))
+    assert sorted(map(sorted, graph.edges)) == [["1", "2"], ["3", "4"]]
+    assert graph.edges["1", "2"]["meetings"] == 3
+
+
+def test_weekly_index_buckets_and_window():
+    index = WeeklyHistoryIndex()
+    index.add_pairing([(1, 2), (3, 4)], WEEK_1)
+    index.add_pairing([(2, 1)], datetime(2022, 1, 12))
+    index.add_pairing([(3, 5)], WEEK_3)
+    assert index.weeks() == [week_of(WEEK_1), week_of(WEEK_2), week_of(WEEK_3)]
+    assert index.num_pairings == 3
+    assert sorted(index.merged().pairs()) == [(1, 2), (3, 4), (3, 5)]
+    assert sorted(index.merged(date_from=datetime(2022, 1, 13)).pairs()) == [
+        (1, 2), (3, 5)
+    ]
+    assert sorted(index.merged(date_to=WEEK_2).pairs()) == [(1, 2), (3, 4)]
+
+
+def test_weekly_index_decodes_buckets_lazily():
+    index = WeeklyHistoryIndex()
+    index.add_pairing([(1, 2)], WEEK_1)
+    index.add_pairing([(1, 3)], WEEK_3)
+    restored = WeeklyHistoryIndex.from_bytes(index.to_bytes())
+    assert restored.buckets == {}
+    assert restored.num_pairings == 2
+    assert sorted(restored.merged(date_from=WEEK_3).pairs()) == [(1, 3)]
+    assert list(restored.buckets) == [week_of(WEEK_3)]
+    assert restored.to_bytes() == index.to_bytes()
+
+
+def test_algorithms_consume_edge_table():
+    table = history_table()
+    algorithm = WeightedMatchingAlgorithm([1, 2, 3, 4, 5], table, seed=0)
+    assert algorithm.penalty(0, 1) > algorithm.penalty(2, 3) > 0
+    assert algorithm.penalty(0, 2) == 0
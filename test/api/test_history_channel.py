@@ -0,0 +1,310 @@
+import asyncio
+import json
+from datetime import datetime
+from random import Random
+
+import pytest
+from discord import MessageType
+
+from random1on1.api.channels import CHECKPOINT_HEADER
+from random1on1.api.channels import CHECKPOINT_INTERVAL
+from random1on1.api.channels import HistoryChannel
+from random1on1.api.checkpoints import HistoryCheckpoint
+from random1on1.api.history import HistoryEdgeTable
+from random1on1.api.history import WeeklyHistoryIndex
+from random1on1.api.wire import encode_pairing
+from random1on1.api.wire import EncodedPairing
+
+
+class FakeAttachment:
+
+    def __init__(self, data):
+        self.data = data
+
+    async def read(self):
+        return self.data
+
+
+class FakeMessage:
+
+    def __init__(self, channel, id, content, attachments=(),
+                 type=MessageType.default):
+        self.channel = channel
+        self.id = id
+        self.content = content
+        self.attachments = list(attachments)
+        self.type = type
+
+    async def pin(self):
+        self.channel.pinned.append(self)
+        self.channel.add_message("", type=MessageType.pins_add)
+
+    async def unpin(self):
+        self.channel.pinned.remove(self)
+
+
+class FakeHistory:
+
+    def __init__(self, messages, page_size=100):
+        self.messages = messages
+        self.page_size = page_size
+
+    async def flatten(self):
+        return self.messages
+
+    async def __aiter__(self):
+        for position, message in enumerate(self.messages):
+            if position % self.page_size == 0:
+                await asyncio.sleep(0)
+            yield message
+
+
+class FakeChannel:
+    """ Just enough of a discord TextChannel to read and write the history. """
+
+    def __init__(self):
+        self.messages = []
+        self.pinned = []
+        self.history_calls = []
+
+    def add_message(self, content, attachments=(), type=MessageType.default):
+        message = FakeMessage(self, len(self.messages) + 1, content,
+                              attachments, type)
+        self.messages.append(message)
+        return message
+
+    async def send(self, content, file=None):
+        attachments = [FakeAttachment(file.fp.read())] if file else []
+        return self.add_message(content, attachments)
+
+    async def pins(self):
+        return list(self.pinned)
+
+    def history(self, limit=100, after=None, before=None, oldest_first=None):
+        self.history_calls.append(after)
+        after_id = getattr(after, "id", 0)
+        return FakeHistory(
+            [message for message in self.messages
+             if message.id > after_id][:limit])
+
+
+def write_pairing(channel, pairs, dry_run=False, date="2022-02-01"):
+    channel.add_message(
+        json.dumps({
+            "dry_run": dry_run,
+            "date_of_pairing": date,
+            "pairing_graph": pairs
+        }))
+
+
+def merged_pairs(table):
+    return sorted(table.pairs())
+
+
+def pair_table(pairs):
+    table = HistoryEdgeTable()
+    table.add_pairing(pairs, None)
+    return table
+
+
+def test_checkpoint_serialization():
+    index = WeeklyHistoryIndex()
+    index.add_pairing(((2, 1), (3, 4)), datetime(2022, 1, 3))
+    index.add_pairing(((1, 2),), datetime(2022, 1, 10))
+    checkpoint = HistoryCheckpoint(last_message_id=7, index=index)
+    restored = HistoryCheckpoint.from_bytes(checkpoint.to_bytes())
+    assert restored.last_message_id == 7
+    assert restored.num_pairings == 2
+    assert restored.index.weeks() == index.weeks()
+    assert list(restored.index.merged().edges()) == list(
+        index.merged().edges())
+
+
+def test_outdated_checkpoints_are_replaced():
+    channel = FakeChannel()
+    for week in range(CHECKPOINT_INTERVAL):
+        write_pairing(channel, [[week, week + 100]])
+    old = channel.add_message(
+        CHECKPOINT_HEADER,
+        [FakeAttachment(b"R1O1CKPT\x02\x05\x00")])
+    channel.pinned.append(old)
+
+    table = asyncio.run(
+        HistoryChannel("history", None, channel).read_history_table())
+    assert merged_pairs(table) == [(week, week + 100)
+                                   for week in range(CHECKPOINT_INTERVAL)]
+    assert len(channel.pinned) == 1 and channel.pinned[0] is not old
+
+
+def test_read_historical_pairs_writes_and_uses_checkpoints():
+    channel = FakeChannel()
+    history_channel = HistoryChannel("history", None, channel)
+    for week in range(CHECKPOINT_INTERVAL):
+        write_pairing(channel, [[week, week + 100]])
+    write_pairing(channel, [[1000, 1001]], dry_run=True)
+
+    first_read = asyncio.run(history_channel.read_history_table())
+    assert merged_pairs(first_read) == [(week, week + 100)
+                                       for week in range(CHECKPOINT_INTERVAL)]
+    assert len(channel.pinned) == 1
+
+    write_pairing(channel, [[7, 8]])
+    channel.history_calls.clear()
+    second_history_channel = HistoryChannel("history", None, channel)
+    second_read = asyncio.run(second_history_channel.read_history_table())
+    assert merged_pairs(second_read) == sorted(
+        merged_pairs(first_read) + [(7, 8)])
+    assert second_read.num_pairings == CHECKPOINT_INTERVAL + 1
+    assert channel.history_calls[0].id == CHECKPOINT_INTERVAL + 1
+
+
+def test_unfinished_multi_part_pairing_does_not_block_checkpoints():
+    channel = FakeChannel()
+    history_channel = HistoryChannel("history", None, channel)
+    unfinished = encode_pairing(EncodedPairing(
+        date_of_pairing=datetime(2022, 1, 3),
+        dry_run=False,
+        pairs=tuple((i, i + 1000) for i in range(100))),
+                                max_message_length=200)
+    assert len(unfinished) > 1
+    channel.add_message(unfinished[0])
+    for week in range(CHECKPOINT_INTERVAL):
+        write_pairing(channel, [[week, week + 100]])
+
+    table = asyncio.run(history_channel.read_history_table())
+    assert merged_pairs(table) == [(week, week + 100)
+                                   for week in range(CHECKPOINT_INTERVAL)]
+    assert len(channel.pinned) == 1
+
+
+def test_read_history_table_with_lookback_uses_weekly_buckets():
+    channel = FakeChannel()
+    history_channel = HistoryChannel("history", None, channel)
+    for week in range(CHECKPOINT_INTERVAL):
+        write_pairing(channel, [[week, week + 100]],
+                      date=f"2022-01-{3 + 7 * (week % 4):02d}")
+    _ = asyncio.run(history_channel.read_history_table())
+    assert len(channel.pinned) == 1
+
+    write_pairing(channel, [[7, 8]], date="2022-02-07")
+    channel.history_calls.clear()
+    recent = asyncio.run(
+        HistoryChannel("history", None, channel).read_history_table(
+            date_from=datetime(2022, 1, 24)))
+    assert merged_pairs(recent) == [(3, 103), (7, 8), (7, 107)]
+    assert channel.history_calls[0].id == CHECKPOINT_INTERVAL
+
+
+def test_read_history_table_with_lookback_seeds_a_checkpoint():
+    channel = FakeChannel()
+    for week in range(CHECKPOINT_INTERVAL):
+        write_pairing(channel, [[week, week + 100]],
+                      date=f"2022-01-{3 + 7 * (week % 4):02d}")
+    recent = asyncio.run(
+        HistoryChannel("history", None, channel).read_history_table(
+            date_from=datetime(2022, 1, 24)))
+    assert merged_pairs(recent) == [(3, 103), (7, 107)]
+    assert len(channel.pinned) == 1
+
+    write_pairing(channel, [[7, 8]], date="2022-02-07")
+    channel.history_calls.clear()
+    recent = asyncio.run(
+        HistoryChannel("history", None, channel).read_history_table(
+            date_from=datetime(2022, 1, 24)))
+    assert merged_pairs(recent) == [(3, 103), (7, 8), (7, 107)]
+    assert channel.history_calls[0].id == CHECKPOINT_INTERVAL
+
+
+def test_read_historical_pairs_with_dates_skips_checkpoint():
+    channel = FakeChannel()
+    history_channel = HistoryChannel("history", None, channel)
+    write_pairing(channel, [[1, 2]])
+    history = asyncio.run(
+        history_channel.read_history_table(date_from=datetime(2022, 1, 1),
+                                              date_to=datetime(2030, 1, 1)))
+    assert merged_pairs(history) == [(1, 2)]
+    assert channel.pinned == []
+
+
+def test_write_pairings_round_trip():
+    from networkx import Graph
+
+    from random1on1.api.pairings import Pairings
+
+    random = Random(0)
+    members = [random.randrange(10**17, 10**18) for _ in range(1000)]
+    graph = Graph()
+    graph.add_edges_from(zip(members[0::2], members[1::2]))
+    channel = FakeChannel()
+    history_channel = HistoryChannel("history", None, channel)
+    asyncio.run(
+        history_channel.write_pairings(
+            Pairings(pairing_graph=graph,
+                     date_of_pairing=datetime(2022, 3, 7),
+                     dry_run=False)))
+    assert len(channel.messages) > 1
+    assert all(len(message.content) <= 2000 for message in channel.messages)
+
+    history = asyncio.run(
+        history_channel.read_history_table(date_from=datetime(2022, 1, 1),
+                                              date_to=datetime(2030, 1, 1)))
+    assert merged_pairs(history) == merged_pairs(
+        pair_table(graph.edges))
+
+
+def test_read_historical_pairings_streams_and_skips_malformed_messages():
+
+    channel = FakeChannel()
+    history_channel = HistoryChannel("history", None, channel)
+    write_pairing(channel, [[1, 2], [3, 4]])
+    write_pairing(channel, [[1, 3]], dry_run=True)
+    channel.add_message('{"dry_run": false, "pairing_graph": "oops"}')
+    write_pairing(channel, [[1, 4]])
+
+    pairings = asyncio.run(
+        history_channel.read_historical_pairings(
+            date_from=datetime(2022, 1, 1), date_to=datetime(2030, 1, 1)))
+    assert sorted(map(sorted, pairings.pairing_graph.edges)) == [[1, 2], [1, 4],
+                                                                  [3, 4]]
+
+
+def test_history_errors_are_raised_to_the_reader():
+
+    class BrokenHistory:
+
+        async def __aiter__(self):
+            yield FakeMessage(None, 1, '{"dry_run": false}')
+            raise RuntimeError("discord is down")
+
+    channel = FakeChannel()
+    channel.history = lambda **kwargs: BrokenHistory()
+    history_channel = HistoryChannel("history", None, channel)
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            history_channel.read_history_table(
+                date_from=datetime(2022, 1, 1), date_to=datetime(2030, 1, 1)))
+
+
+def test_read_history_table_records_phase_metrics():
+    from random1on1.api.metrics import current_run
+    from random1on1.api.metrics import measure
+    from random1on1.api.metrics import RunMetrics
+
+    channel = FakeChannel()
+    for week in range(CHECKPOINT_INTERVAL):
+        write_pairing(channel, [[week, week + 100]])
+    run = RunMetrics(guild_id=1)
+
+    async def read():
+        _ = current_run.set(run)
+        with measure("history"):
+            return await HistoryChannel("history", None,
+                                        channel).read_history_table()
+
+    _ = asyncio.run(read())
+    assert {
+        "history", "history_checkpoint", "history_fetch", "history_decode",
+        "history_merge", "history_checkpoint_write"
+    } <= set(run.phases)
+    assert run.phases["history_fetch"].bytes_fetched == sum(
+        len(message.content) for message in channel.messages[:CHECKPOINT_INTERVAL])
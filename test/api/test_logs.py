@@ -0,0 +1,89 @@
+import asyncio
+import logging
+
+from random1on1.api.logs import configure_logging
+from random1on1.api.logs import current_guild
+from random1on1.api.logs import LoggingChannelHandler
+from random1on1.api.logs import STDOUT_HANDLER_NAME
+
+logger = configure_logging()
+
+
+class FakeChannel:
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+def run_handler(log, **kwargs):
+    channel = FakeChannel()
+
+    async def main():
+        handler = LoggingChannelHandler(channel,
+                                        guild_id=1,
+                                        flush_interval=60,
+                                        **kwargs)
+        handler.start()
+        _ = current_guild.set(1)
+        log()
+        await handler.stop()
+        assert handler not in logger.handlers
+
+    asyncio.run(main())
+    return channel.sent
+
+
+def test_configure_logging_attaches_one_stdout_handler():
+    configure_logging()
+    configure_logging()
+    assert [handler.get_name() for handler in logger.handlers
+            ].count(STDOUT_HANDLER_NAME) == 1
+
+
+def test_records_are_batched_into_messages():
+
+    def log():
+        for i in range(200):
+            logger.info("record number %d of this run", i)
+        logger.debug("debug records are not sent")
+
+    sent = run_handler(log, max_messages_per_flush=10)
+    assert 1 < len(sent) < 10
+    assert all(len(message) <= 2000 for message in sent)
+    assert all(
+        message.startswith("```\n") and message.endswith("```")
+        for message in sent)
+    text = "".join(sent)
+    assert all(f"record number {i} of" in text for i in range(200))
+    assert "debug records" not in text
+
+
+def test_only_the_guilds_own_records_are_sent():
+
+    def log():
+        logger.info("mine")
+        logging.getLogger("discord.http").info("a request of discord.py")
+        _ = current_guild.set(2)
+        logger.info("another guild's")
+
+    sent = run_handler(log)
+    assert len(sent) == 1
+    assert "mine" in sent[0]
+    assert "discord.py" not in sent[0] and "another" not in sent[0]
+
+
+def test_backpressure_drops_and_summarizes():
+
+    def log():
+        for i in range(20):
+            logger.info("record %d", i)
+
+    sent = run_handler(log, max_queue_size=5)
+    assert "15 log records were dropped" in sent[0]
+
+    sent = run_handler(log, max_messages_per_flush=2, max_message_length=100)
+    assert len(sent) == 2
+    assert "more lines of logs were left out" in sent[1]
@@ -0,0 +1,115 @@
+import asyncio
+
+from random1on1.api.config import Random1on1BotConfig
+from random1on1.api.members import fetch_role_members
+from random1on1.api.members import MemberDirectory
+from random1on1.api.members import ParticipantIndex
+from random1on1.api.members import peak_memory_mib
+from random1on1.random1on1bot import client_options
+from random1on1.random1on1bot import Random1on1Bot
+from random1on1.random1on1bot import Random1on1GuildProgram
+
+
+class FakeRole:
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.members = []
+
+
+RANDOM1ON1 = FakeRole(2, "Random 1-on-1s")
+OTHER = FakeRole(3, "Other")
+
+
+class FakeMember:
+
+    def __init__(self, id, roles):
+        self.id = id
+        self.roles = roles
+
+
+class FakeGuild:
+
+    def __init__(self, num_members):
+        self.id = 1
+        self.roles = [RANDOM1ON1, OTHER]
+        self.fetched = 0
+        self.num_members = num_members
+
+    async def fetch_members(self, limit=1000):
+        for member_id in range(self.num_members):
+            self.fetched += 1
+            yield FakeMember(member_id,
+                             [RANDOM1ON1] if member_id % 10 == 0 else [OTHER])
+
+    def get_member(self, member_id):
+        return None
+
+
+def test_fetch_role_members_keeps_only_role_holders():
+    guild = FakeGuild(1000)
+    members = asyncio.run(fetch_role_members(guild, RANDOM1ON1))
+    assert guild.fetched == 1000
+    assert [member.id for member in members] == list(range(0, 1000, 10))
+
+
+def test_member_directory_stands_in_for_the_member_cache():
+    directory = MemberDirectory([FakeMember(1, []), FakeMember(2, [])])
+    assert len(directory) == 2
+    assert directory.get_member(2).id == 2
+    assert directory.get_member(3) is None
+
+
+def test_lean_program_fetches_participants():
+    bot = Random1on1Bot(config=Random1on1BotConfig(guild_id=1),
+                        lean_startup=True,
+                        **client_options(lean_startup=True))
+    program = Random1on1GuildProgram(client=bot,
+                                     config=bot.config,
+                                     worker_pool=bot.worker_pool,
+                                     lean_startup=True)
+    program.guild = FakeGuild(100)
+    participants = asyncio.run(program.get_participants())
+    assert len(participants) == 10
+    assert program.guild_members.get_member(30) is participants[3]
+
+
+def test_participant_index_stays_dense():
+    index = ParticipantIndex(RANDOM1ON1,
+                             [FakeMember(i, [RANDOM1ON1]) for i in range(5)])
+    assert index.participant_ids() == (0, 1, 2, 3, 4)
+    assert index.remove(1)
+    assert not index.remove(1)
+    # The last participant takes the place of the removed one
+    assert index.participant_ids() == (0, 4, 2, 3)
+    assert index.remove(3)
+    assert index.participant_ids() == (0, 4, 2)
+    assert [member.id for member in index.participants()] == [0, 4, 2]
+    assert 4 in index and 3 not in index and len(index) == 3
+
+
+def test_participant_index_follows_role_changes():
+    index = ParticipantIndex(RANDOM1ON1, [FakeMember(1, [RANDOM1ON1])])
+    index.update(FakeMember(2, [OTHER]))
+    index.update(FakeMember(3, [OTHER, RANDOM1ON1]))
+    renamed = FakeMember(1, [RANDOM1ON1])
+    index.update(renamed)
+    assert index.participant_ids() == (1, 3)
+    assert index.get_member(1) is renamed
+    index.update(FakeMember(1, [OTHER]))
+    assert index.participant_ids() == (3, )
+    assert index.get_member(1) is None
+
+
+def test_lean_client_options():
+    options = client_options(lean_startup=True)
+    assert options["intents"].members and options["intents"].guilds
+    assert not options["intents"].presences
+    assert not options["chunk_guilds_at_startup"]
+    assert client_options()["intents"].members
+
+
+def test_peak_memory():
+    memory = peak_memory_mib()
+    assert memory is None or memory > 0
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import logging
+
+from random1on1.api.metrics import current_run
+from random1on1.api.metrics import instrument_http
+from random1on1.api.metrics import instrument_rate_limits
+from random1on1.api.metrics import measure
+from random1on1.api.metrics import record_time
+from random1on1.api.metrics import RunMetrics
+from random1on1.api.metrics import RunReport
+
+
+class FakeHTTP:
+
+    async def request(self, route, **kwargs):
+        await asyncio.sleep(0)
+        return route
+
+
+def test_measure_does_nothing_outside_of_a_run():
+    with measure("setup") as metrics:
+        record_time("decode", 1.0)
+    assert metrics is None
+
+
+def test_phases_count_api_calls_and_rate_limit_waits():
+    http = FakeHTTP()
+    instrument_http(http)
+    instrument_rate_limits()
+    run = RunMetrics(guild_id=1)
+
+    async def main():
+        _ = current_run.set(run)
+        with measure("setup"):
+            await asyncio.gather(http.request("a"), http.request("b"))
+            with measure("history"):
+                await http.request("c")
+                logging.getLogger("discord.http").warning(
+                    'We are being rate limited. Retrying in %.2f seconds. Handled under the bucket "%s"',
+                    1.5, "bucket")
+        record_time("decode", 0.25)
+        record_time("decode", 0.25)
+        await http.request("d")
+
+    asyncio.run(main())
+    assert list(run.phases) == ["setup", "history", "decode"]
+    assert run.phases["setup"].api_calls == 2
+    assert run.phases["history"].api_calls == 1
+    assert run.phases["history"].rate_limit_waits == 1
+    assert run.phases["history"].rate_limit_seconds == 1.5
+    assert run.phases["decode"].seconds == 0.5
+    assert run.phases["setup"].seconds >= run.phases["history"].seconds
+
+
+def test_report_outputs(tmp_path):
+    run = RunMetrics(guild_id=7)
+    run.get("setup").seconds = 0.5
+    run.get("setup").api_calls = 3
+    report = RunReport(seconds_to_ready=2.0, runs=[run])
+
+    report.write_json(str(tmp_path / "report.json"))
+    with open(tmp_path / "report.json") as report_file:
+        data = json.load(report_file)
+    assert data["seconds_to_ready"] == 2.0
+    assert data["guilds"][0]["phases"]["setup"]["api_calls"] == 3
+
+    report.write_prometheus(str(tmp_path / "random1on1.prom"))
+    with open(tmp_path / "random1on1.prom") as prometheus_file:
+        lines = prometheus_file.read().splitlines()
+    assert "random1on1_seconds_to_ready 2.0" in lines
+    assert 'random1on1_phase_api_calls{guild="7",phase="setup"} 3' in lines
+    assert "# TYPE random1on1_phase_seconds gauge" in lines
+    assert not any("peak_memory" in line and "guild=" in line
+                   for line in lines)
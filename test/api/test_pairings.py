@@ -1,3 +1,39 @@
+from datetime import datetime
+
 import pytest
+from networkx import Graph
 
 from random1on1.api.channels import AnnouncementChannel
+from random1on1.api.pairings import Pairings
+from random1on1.api.pairings import pairings_from_json
+from random1on1.api.pairings import resolve_members
+
+
+class FakeGuild:
+
+    def __init__(self, member_ids):
+        self.members = {
+            member_id: f"member-{member_id}"
+            for member_id in member_ids
+        }
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+
+def test_pairings_json_round_trip_uses_member_ids():
+    graph = Graph()
+    graph.add_edges_from([(1, 2), (3, 4), (3, 5)])
+    pairings = Pairings(pairing_graph=graph,
+                        date_of_pairing=datetime(2022, 1, 3),
+                        dry_run=False)
+    restored = pairings_from_json(pairings.to_json())
+    assert sorted(restored.pairing_graph.nodes) == [1, 2, 3, 4, 5]
+    assert restored.pairing_graph.has_edge(3, 5)
+    assert restored.date_of_pairing == datetime(2022, 1, 3)
+
+
+def test_resolve_members_reports_departed_members():
+    members, departed = resolve_members(FakeGuild([1, 3]), [1, 2, 3, 4])
+    assert members == {1: "member-1", 3: "member-3"}
+    assert departed == [2, 4]
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from random1on1.api.config import config_from_json
+from random1on1.api.schedule import CronSchedule
+
+
+def test_weekly_schedule():
+    schedule = CronSchedule.parse("0 17 * * 1")
+    # 2026-10-17 is a Saturday
+    assert schedule.next_after(datetime(2026, 10, 17, 12)) == datetime(
+        2026, 10, 19, 17)
+    assert schedule.next_after(datetime(2026, 10, 19, 17)) == datetime(
+        2026, 10, 26, 17)
+    assert schedule.next_after(datetime(2026, 10, 19, 16, 59, 30)) == datetime(
+        2026, 10, 19, 17)
+
+
+def test_ranges_steps_and_lists():
+    schedule = CronSchedule.parse("*/15 9-10 1,15 * *")
+    assert schedule.next_after(datetime(2026, 10, 15, 10, 50)) == datetime(
+        2026, 11, 1, 9)
+    assert schedule.next_after(datetime(2026, 10, 15, 9, 20)) == datetime(
+        2026, 10, 15, 9, 30)
+
+
+def test_restricted_days_match_either_field():
+    # The 13th of the month or any Friday
+    schedule = CronSchedule.parse("0 12 13 * 5")
+    assert schedule.next_after(datetime(2026, 10, 10)) == datetime(
+        2026, 10, 13, 12)
+    assert schedule.next_after(datetime(2026, 10, 14)) == datetime(
+        2026, 10, 16, 12)
+    assert CronSchedule.parse("0 0 * * 7").days_of_week == frozenset({0})
+
+
+def test_invalid_schedules():
+    for expression in ("* * *", "60 * * * *", "*/0 * * * *", "a * * * *",
+                       "0 0 0 * *"):
+        with pytest.raises(ValueError):
+            _ = CronSchedule.parse(expression)
+    with pytest.raises(ValueError):
+        _ = CronSchedule.parse("0 0 31 2 *").next_after(datetime(2026, 1, 1))
+
+
+def test_config_schedule():
+    assert config_from_json({"guild_id": 1}).schedule == "0 17 * * 1"
+    config = config_from_json({"guild_id": 1, "schedule": "30 8 * * 2"})
+    assert config.schedule == "30 8 * * 2"
+    for schedule in ("every monday", "0 0 31 2 *", 5):
+        with pytest.raises(ValueError):
+            _ = config_from_json({"guild_id": 1, "schedule": schedule})
@@ -0,0 +1,178 @@
+import asyncio
+import sqlite3
+from datetime import datetime
+
+from networkx import Graph
+
+from random1on1.api.pairings import Pairings
+from random1on1.api.storage import HistoryStore
+from random1on1.api.storage import MirroredHistoryStore
+from random1on1.api.storage import SQLiteHistoryStore
+from random1on1.api.storage import WarmHistoryStore
+from random1on1.api.wire import EncodedPairing
+
+
+def pairings(pairs, date_of_pairing, dry_run=False):
+    graph = Graph()
+    graph.add_edges_from(pairs)
+    return Pairings(pairing_graph=graph,
+                    date_of_pairing=date_of_pairing,
+                    dry_run=dry_run)
+
+
+def edges(table):
+    return {(person_1, person_2): data
+            for person_1, person_2, data in table.edges()}
+
+
+class ListHistoryStore(HistoryStore):
+
+    def __init__(self, encoded_pairings):
+        self.encoded_pairings = list(encoded_pairings)
+        self.written = []
+
+    async def write_pairings(self, pairings):
+        self.written.append(pairings)
+
+    async def read_history_table(self, date_from=None, date_to=None):
+        raise AssertionError("The mirror should read locally")
+
+    async def iterate_pairings(self, date_from=None):
+        for pairing in self.encoded_pairings:
+            if date_from is None or pairing.date_of_pairing >= date_from:
+                yield pairing
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), guild_id=1)
+    other_guild = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"),
+                                     guild_id=2)
+
+    async def write_and_read():
+        await store.write_pairings(
+            pairings([(1, 2), (3, 4)], datetime(2022, 1, 3)))
+        await store.write_pairings(
+            pairings([(1, 3)], datetime(2022, 1, 5), dry_run=True))
+        await store.write_pairings(pairings([(2, 1)], datetime(2022, 1, 10)))
+        await other_guild.write_pairings(
+            pairings([(5, 6)], datetime(2022, 1, 10)))
+        return (await store.read_history_table(),
+                await store.read_history_table(
+                    date_from=datetime(2022, 1, 4)))
+
+    table, recent_table = asyncio.run(write_and_read())
+    assert table.num_pairings == 2
+    assert edges(table) == {
+        (1, 2): {
+            "meetings": 2,
+            "first_met": datetime(2022, 1, 3),
+            "last_met": datetime(2022, 1, 10)
+        },
+        (3, 4): {
+            "meetings": 1,
+            "first_met": datetime(2022, 1, 3),
+            "last_met": datetime(2022, 1, 3)
+        },
+    }
+    assert list(edges(recent_table)) == [(1, 2)]
+    assert recent_table.num_pairings == 1
+
+
+def test_mirrored_store_fills_local_store_and_writes_through(tmp_path):
+    remote = ListHistoryStore([
+        EncodedPairing(datetime(2022, 1, 3), False, ((1, 2), (3, 4))),
+        EncodedPairing(datetime(2022, 1, 10), False, ((1, 3), )),
+    ])
+    local = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), guild_id=1)
+    store = MirroredHistoryStore(local, remote)
+
+    async def read_write_read():
+        first_table = await store.read_history_table()
+        await store.write_pairings(pairings([(2, 4)], datetime(2022, 1, 17)))
+        return first_table, await store.read_history_table()
+
+    first_table, second_table = asyncio.run(read_write_read())
+    assert sorted(first_table.pairs()) == [(1, 2), (1, 3), (3, 4)]
+    assert sorted(second_table.pairs()) == [(1, 2), (1, 3), (2, 4), (3, 4)]
+    assert len(remote.written) == 1
+
+    restarted = MirroredHistoryStore(local, ListHistoryStore([]))
+    assert len(asyncio.run(restarted.read_history_table())) == 4
+
+
+def test_mirrored_store_catches_up_after_the_sync_marker(tmp_path):
+    remote = ListHistoryStore([
+        EncodedPairing(datetime(2022, 1, 3), False, ((1, 2), )),
+        EncodedPairing(datetime(2022, 1, 10), False, ((1, 3), )),
+    ])
+    local = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), guild_id=1)
+    _ = asyncio.run(MirroredHistoryStore(local, remote).read_history_table())
+
+    # Another bot wrote a pairing on the day of the marker and one later on
+    remote.encoded_pairings += [
+        EncodedPairing(datetime(2022, 1, 10), False, ((2, 4), )),
+        EncodedPairing(datetime(2022, 1, 17), False, ((3, 4), )),
+    ]
+    restarted = MirroredHistoryStore(local, remote)
+    table = asyncio.run(restarted.read_history_table())
+    assert sorted(table.pairs()) == [(1, 2), (1, 3), (2, 4), (3, 4)]
+    assert table.num_pairings == 4
+    assert local.select_sync_marker() == datetime(2022, 1, 17)
+
+
+def test_mirrored_store_resyncs_after_a_failed_local_write(tmp_path):
+    remote = ListHistoryStore([
+        EncodedPairing(datetime(2022, 1, 3), False, ((1, 2), )),
+    ])
+    local = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), guild_id=1)
+    store = MirroredHistoryStore(local, remote)
+
+    async def write_fails():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    async def run():
+        _ = await store.read_history_table()
+        remote.encoded_pairings.append(
+            EncodedPairing(datetime(2022, 1, 10), False, ((1, 3), )))
+        local.write_pairings = lambda *args, **kwargs: write_fails()
+        await store.write_pairings(pairings([(1, 3)], datetime(2022, 1, 10)))
+        assert not store.synced
+        del local.write_pairings
+        await store.write_pairings(pairings([(2, 3)], datetime(2022, 1, 10)))
+        remote.encoded_pairings.append(
+            EncodedPairing(datetime(2022, 1, 10), False, ((2, 3), )))
+        return await store.read_history_table()
+
+    table = asyncio.run(run())
+    assert sorted(table.pairs()) == [(1, 2), (1, 3), (2, 3)]
+    assert table.num_pairings == 3
+
+
+def test_warm_store_reads_once_and_tracks_its_own_writes():
+    remote = ListHistoryStore([
+        EncodedPairing(date_of_pairing=datetime(2022, 1, 3),
+                       dry_run=False,
+                       pairs=((1, 2), (3, 4))),
+    ])
+    store = WarmHistoryStore(remote)
+
+    async def run():
+        first = await store.read_history_table()
+        # Pairings that did not go through the warm store are not seen anymore
+        remote.encoded_pairings.append(
+            EncodedPairing(date_of_pairing=datetime(2022, 1, 10),
+                           dry_run=False,
+                           pairs=((5, 6), )))
+        _ = await store.write_pairings(
+            pairings([(1, 3)], datetime(2022, 1, 17)))
+        _ = await store.write_pairings(
+            pairings([(1, 4)], datetime(2022, 1, 17), dry_run=True))
+        return first, await store.read_history_table(), await store.read_history_table(
+            date_from=datetime(2022, 1, 10))
+
+    first, second, recent = asyncio.run(run())
+    assert set(edges(first)) == {(1, 2), (3, 4)}
+    assert set(edges(second)) == {(1, 2), (3, 4), (1, 3)}
+    assert edges(second)[(1, 3)]["last_met"] == datetime(2022, 1, 17)
+    assert set(edges(recent)) == {(1, 3)}
+    assert len(remote.written) == 2
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from random1on1.api.wire import decode_pairs
+from random1on1.api.wire import encode_pairing
+from random1on1.api.wire import encode_pairs
+from random1on1.api.wire import EncodedPairing
+from random1on1.api.wire import MAX_MESSAGE_LENGTH
+from random1on1.api.wire import PairingMessageDecoder
+
+SNOWFLAKE = 912345678901234567
+
+
+def large_pairing(num_pairs=500, dry_run=False):
+    return EncodedPairing(date_of_pairing=datetime(2022, 3, 7),
+                          dry_run=dry_run,
+                          pairs=tuple((SNOWFLAKE + 7919 * i,
+                                       SNOWFLAKE + 7919 * (i + num_pairs))
+                                      for i in range(num_pairs)))
+
+
+def test_pairs_round_trip():
+    pairs = ((SNOWFLAKE, 2), (SNOWFLAKE + 5, SNOWFLAKE), (1, 0))
+    assert decode_pairs(encode_pairs(pairs)) == pairs
+    assert decode_pairs(encode_pairs(())) == ()
+
+
+def test_large_pairing_splits_and_reassembles():
+    pairing = large_pairing()
+    messages = encode_pairing(pairing, max_message_length=500)
+    assert len(messages) > 1
+    assert all(len(message) <= 500 for message in messages)
+
+    decoder = PairingMessageDecoder()
+    decoded = [decoder.feed(message) for message in messages]
+    assert decoded[:-1] == [None] * (len(messages) - 1)
+    assert decoded[-1] == pairing
+    assert decoder.incomplete_pairings() == []
+
+
+def test_wire_format_is_smaller_than_json():
+    pairing = large_pairing()
+    legacy = json.dumps({
+        "dry_run": False,
+        "date_of_pairing": "2022-03-07",
+        "pairing_graph": pairing.pairs
+    })
+    encoded = "".join(encode_pairing(pairing))
+    assert len(encoded) < len(legacy) / 2
+    assert len(encode_pairing(pairing)[0]) <= MAX_MESSAGE_LENGTH
+
+
+def test_decoder_reads_legacy_json_and_skips_dry_runs():
+    decoder = PairingMessageDecoder(include_dry_runs=False)
+    legacy = '{"dry_run": false, "date_of_pairing": "2022-01-03", "pairing_graph": [[1, 2]]}'
+    assert decoder.feed(legacy).pairs == ((1, 2),)
+    for message in encode_pairing(large_pairing(dry_run=True), 300):
+        assert decoder.feed(message) is None
+    assert decoder.incomplete_pairings() == []
+    assert decoder.feed("hello") is None
+
+
+def test_decoder_drops_unfinished_pairings_once_another_one_starts():
+    decoder = PairingMessageDecoder()
+    unfinished = encode_pairing(large_pairing(), max_message_length=500)
+    assert decoder.feed(unfinished[0]) is None
+    assert len(decoder.incomplete_pairings()) == 1
+
+    pairing = large_pairing(num_pairs=1)
+    assert decoder.feed(encode_pairing(pairing)[0]) == pairing
+    assert decoder.incomplete_pairings() == []
+    assert decoder.feed(unfinished[1]) is None
+
+
+def test_decoder_rejects_unknown_versions():
+    message = encode_pairing(large_pairing(num_pairs=1))[0]
+    with pytest.raises(ValueError):
+        PairingMessageDecoder().feed(message.replace("r1o1:1:", "r1o1:9:"))
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from random1on1.api.history import HistoryEdgeTable
+from random1on1.api.history import WeeklyHistoryIndex
+from random1on1.api.workers import MatchingJob
+from random1on1.api.workers import MatchingWorkerPool
+from random1on1.api.workers import run_matching_job
+
+HISTORY = HistoryEdgeTable()
+for pairs in [((1, 2), (3, 4)), ((1, 3), (2, 4)), ((1, 2), (5, 6))]:
+    HISTORY.add_pairing(pairs, None)
+
+
+def matching_job(algorithm="IndexedMatchingAlgorithm", num_participants=8):
+    return MatchingJob(algorithm=algorithm,
+                       participant_ids=tuple(range(1, num_participants + 1)),
+                       history=HISTORY,
+                       dry_run=True,
+                       algorithm_options={"seed": 0})
+
+
+def assert_valid_result(result, num_participants=8):
+    members = [member_id for group in result.groups for member_id in group]
+    assert sorted(members) == list(range(1, num_participants + 1))
+    assert all(2 <= len(group) <= 3 for group in result.groups)
+    assert all(isinstance(member_id, int) for member_id in members)
+    assert result.dry_run
+
+
+def test_run_matching_job_avoids_history():
+    for algorithm in ["UniformMatchingAlgorithm", "IndexedMatchingAlgorithm"]:
+        result = run_matching_job(matching_job(algorithm))
+        assert_valid_result(result)
+        for group in result.groups:
+            if len(group) == 2:
+                assert not HISTORY.has_pair(*group)
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_worker_pool_runs_jobs_concurrently(use_processes):
+
+    async def run_jobs(pool):
+        return await asyncio.gather(
+            *[pool.run(matching_job(num_participants=n)) for n in [8, 9, 10]])
+
+    with MatchingWorkerPool(max_workers=2,
+                            use_processes=use_processes) as pool:
+        results = asyncio.run(run_jobs(pool))
+    for num_participants, result in zip([8, 9, 10], results):
+        assert_valid_result(result, num_participants)
+    assert pool.executor is None
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_worker_merges_the_history_window_of_a_weekly_index(use_processes):
+    index = WeeklyHistoryIndex()
+    index.add_pairing(((1, 2), (3, 4)), datetime(2022, 1, 3))
+    index.add_pairing(((1, 4), (2, 3)), datetime(2022, 2, 7))
+    index.add_pairing(((1, 3), (2, 4)), datetime(2022, 3, 7))
+    # Buckets arrive encoded, like they do from a checkpoint
+    index = WeeklyHistoryIndex.from_bytes(index.to_bytes())
+    job = MatchingJob(algorithm="IndexedMatchingAlgorithm",
+                      participant_ids=(1, 2, 3, 4),
+                      history=index,
+                      dry_run=True,
+                      algorithm_options={"seed": 0},
+                      history_from=datetime(2022, 2, 1))
+
+    with MatchingWorkerPool(max_workers=1,
+                            use_processes=use_processes) as pool:
+        results = [asyncio.run(pool.run(job)) for _ in range(5)]
+    for result in results:
+        assert_valid_result(result, num_participants=4)
+        # Only the pairings inside the window are avoided, so everyone meets their partner of January again
+        assert sorted(map(sorted, result.groups)) == [[1, 2], [3, 4]]
+        assert "history_merge" in result.timings
+
+
+def test_run_matching_job_reports_timings_and_profile():
+    result = run_matching_job(matching_job())
+    assert set(result.timings) == {
+        "construct_potential_pairings", "generate_pairs"
+    }
+    assert result.profile is None
+
+    job = MatchingJob(algorithm="IndexedMatchingAlgorithm",
+                      participant_ids=tuple(range(1, 9)),
+                      history=HISTORY,
+                      dry_run=True,
+                      algorithm_options={"seed": 0},
+                      profile=True)
+    profiled = run_matching_job(job)
+    assert_valid_result(profiled)
+    assert "generate_pairs" in profiled.profile
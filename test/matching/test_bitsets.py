@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from random1on1.matching.bitsets import AllowedPairings
+
+
+class TestAllowedPairings(unittest.TestCase):
+
+    def test_previously_paired_is_symmetric(self):
+        allowed_pairings = AllowedPairings(10, [(0, 9), (3, 4), (4, 4)])
+        self.assertTrue(allowed_pairings.previously_paired(0, 9))
+        self.assertTrue(allowed_pairings.previously_paired(9, 0))
+        self.assertTrue(allowed_pairings.previously_paired(4, 3))
+        self.assertFalse(allowed_pairings.previously_paired(4, 4))
+        self.assertFalse(allowed_pairings.previously_paired(0, 1))
+        self.assertEqual((10, 2), allowed_pairings.history.shape)
+
+    def test_allowed_partners_respects_history_and_availability(self):
+        allowed_pairings = AllowedPairings(10, [(0, 9), (0, 3)])
+        allowed_pairings.remove(5)
+        self.assertEqual([1, 2, 4, 6, 7, 8],
+                         list(allowed_pairings.allowed_partners(0)))
+        self.assertEqual(6, allowed_pairings.count_allowed_partners(0))
+        allowed_pairings.reset_available()
+        self.assertEqual(7, allowed_pairings.count_allowed_partners(0))
+
+    def test_random_allowed_partner(self):
+        random = np.random.default_rng(0)
+        allowed_pairings = AllowedPairings(20, [(0, j) for j in range(1, 19)])
+        self.assertEqual(19, allowed_pairings.random_allowed_partner(0, random))
+        allowed_pairings.remove(19)
+        self.assertIsNone(allowed_pairings.random_allowed_partner(0, random))
+        draws = {
+            allowed_pairings.random_allowed_partner(1, random)
+            for _ in range(500)
+        }
+        self.assertEqual(set(range(2, 19)), draws)
+
+    def test_allowed_among(self):
+        allowed_pairings = AllowedPairings(12, [(2, 11), (5, 7)])
+        allowed = allowed_pairings.allowed_among([2, 7, 11])
+        self.assertEqual([[False, True, False], [True, False, True],
+                          [False, True, False]], allowed.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
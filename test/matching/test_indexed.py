@@ -0,0 +1,87 @@
+import unittest
+from datetime import datetime
+
+from networkx import connected_components
+from networkx import Graph
+
+from random1on1.api.pairings import Pairings
+from random1on1.matching.indexed import IndexedMatchingAlgorithm
+
+
+def history_from_edges(edges):
+    return Pairings(pairing_graph=Graph(edges),
+                    date_of_pairing=datetime.now(),
+                    dry_run=False)
+
+
+class TestIndexedMatchingAlgorithm(unittest.TestCase):
+
+    def test_generate_pairs_covers_everyone(self):
+        """Every participant lands in exactly one group of size 2 (or 3 for odd numbers of participants)."""
+        for num_participants in [4, 7, 10, 101]:
+            participants = list(range(num_participants))
+            algorithm = IndexedMatchingAlgorithm(participants,
+                                                 history_from_edges([]),
+                                                 seed=0)
+            pairings = algorithm.generate_pairs(dry_run=True)
+            groups = list(connected_components(pairings.pairing_graph))
+            self.assertEqual(set(participants),
+                             set().union(*groups))
+            self.assertEqual(len(groups), num_participants // 2)
+
+    def test_generate_pairs_avoids_history(self):
+        """Pairs that met before are never drawn again, including when the enumerated pair mode kicks in."""
+        participants = list(range(20))
+        # Everyone has met everyone except for the pairs (2k, 2k + 1)
+        history = [(i, j) for i in participants for j in participants
+                   if i < j and not (i % 2 == 0 and j == i + 1)]
+        algorithm = IndexedMatchingAlgorithm(participants,
+                                             history_from_edges(history),
+                                             seed=1)
+        pairings = algorithm.generate_pairs(dry_run=True)
+        self.assertEqual(len(pairings.pairing_graph.edges), 10)
+        for person_1, person_2 in pairings.pairing_graph.edges:
+            self.assertEqual(min(person_1, person_2) % 2, 0)
+            self.assertEqual(abs(person_1 - person_2), 1)
+
+    def test_generate_pairs_ignores_former_participants(self):
+        """History edges involving people who are no longer participating are dropped."""
+        algorithm = IndexedMatchingAlgorithm([1, 2, 3, 4],
+                                             history_from_edges([(1, 5),
+                                                                 (5, 6)]))
+        self.assertEqual(0, algorithm.allowed_pairings.history.sum())
+
+    def test_generate_pairs_pairs_least_met_when_stuck(self):
+        """When everyone left has met before, everyone is still matched, each with a partner they met the fewest times."""
+        participants = list(range(4))
+        graph = Graph()
+        graph.add_edges_from(
+            (i, j) for i in participants for j in participants if i < j)
+        graph.edges[0, 1]["meetings"] = 5
+        graph.edges[2, 3]["meetings"] = 5
+        for seed in range(10):
+            algorithm = IndexedMatchingAlgorithm(
+                participants,
+                Pairings(pairing_graph=graph,
+                         date_of_pairing=datetime.now(),
+                         dry_run=False),
+                seed=seed)
+            groups = list(
+                connected_components(
+                    algorithm.generate_pairs(dry_run=True).pairing_graph))
+            self.assertEqual(len(groups), 2)
+            self.assertNotIn({0, 1}, groups)
+            self.assertNotIn({2, 3}, groups)
+
+        participants = list(range(7))
+        history = [(i, j) for i in participants for j in participants if i < j]
+        algorithm = IndexedMatchingAlgorithm(participants,
+                                             history_from_edges(history))
+        groups = list(
+            connected_components(
+                algorithm.generate_pairs(dry_run=True).pairing_graph))
+        self.assertEqual(set(participants), set().union(*groups))
+        self.assertEqual(sorted(len(group) for group in groups), [2, 2, 3])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,11 @@
 import unittest
 
+import numpy as np
+
 from random1on1.matching.pairing import generate_pairs
+from random1on1.matching.pairing import MeetingCounts
 from random1on1.matching.pairing import Participant
+from random1on1.matching.pairing import softmax
 
 
 class TestPairing(unittest.TestCase):
@@ -35,6 +39,39 @@ class TestPairing(unittest.TestCase):
             pairs = generate_pairs(participants, gamma)
             self.assertEqual(len(pairs), num_participants // 2)
 
+    def test_shared_meeting_counts(self):
+        """Participants created from a MeetingCounts share its matrix and every group is counted symmetrically."""
+        meeting_counts = MeetingCounts(5)
+        participants = meeting_counts.participants()
+        meeting_counts.record_group([0, 3, 4])
+        participants[1].increment_meetings_count(2)
+        self.assertEqual(1, participants[0].meetings_counter[3])
+        self.assertEqual(1, participants[4].meetings_counter[3])
+        self.assertEqual(0, participants[0].meetings_counter[0])
+        self.assertEqual(1, meeting_counts.counts[1, 2])
+
+    def test_generate_pairs_avoids_repeats(self):
+        """With a very negative (log) gamma, people who met before are never matched again if there is an alternative."""
+        meeting_counts = MeetingCounts(7)
+        participants = meeting_counts.participants()
+        for pair in [[0, 1], [2, 3], [4, 5]]:
+            meeting_counts.record_group(pair)
+        for _ in range(20):
+            pairs = generate_pairs(participants, -50.0)
+            self.assertEqual(3, len(pairs))
+            self.assertEqual(list(range(7)), sorted(sum(pairs, [])))
+            for pair in pairs:
+                self.assertTrue(all(
+                    meeting_counts.counts[i, j] == 0 for i in pair for j in pair
+                    if i != j) or len(pair) == 3)
+
+    def test_softmax_is_stable_and_pure(self):
+        values = np.array([1000.0, 1000.0, -1000.0])
+        probabilities = softmax(values)
+        self.assertAlmostEqual(0.5, probabilities[0])
+        self.assertEqual(0.0, probabilities[2])
+        self.assertEqual(1000.0, values[0])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,19 @@
+import unittest
+
+from random1on1.matching import ALGORITHMS
+from random1on1.matching import load_algorithm
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_every_registered_algorithm_loads(self):
+        for name in ALGORITHMS:
+            self.assertEqual(name, load_algorithm(name).__name__)
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            load_algorithm("MagicAlgorithm")
+
+
+if __name__ == "__main__":
+    unittest.main()
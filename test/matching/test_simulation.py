@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+from random1on1.matching.simulation import simulate
+
+
+class TestSimulation(unittest.TestCase):
+
+    def test_statistics_shapes(self):
+        """Every gamma gets its own result with one entry per replica and a histogram over all pairs of every replica."""
+        num_people, num_weeks, num_replicas = 7, 5, 3
+        results = simulate(num_people,
+                           num_weeks, [0.5, 1.0],
+                           num_replicas=num_replicas,
+                           seed=0)
+        self.assertEqual([0.5, 1.0], list(results.keys()))
+        for result in results.values():
+            self.assertEqual((num_weeks, ), result.repeat_rate.shape)
+            self.assertEqual((num_replicas, ),
+                             result.weeks_until_everyone_met.shape)
+            self.assertEqual(num_replicas * num_people * (num_people - 1) // 2,
+                             result.meetings_histogram.sum())
+            # Every week has 3 pairings for 7 people, one of which is a group of 3 (i.e. 3 pairs)
+            meetings = np.arange(len(result.meetings_histogram))
+            self.assertEqual(num_replicas * num_weeks * 5,
+                             (meetings * result.meetings_histogram).sum())
+
+    def test_small_gamma_avoids_repeats(self):
+        """With a tiny gamma 4 people always meet everyone in 3 weeks, while gamma = 1 repeats some pairs."""
+        results = simulate(4, 3, [1e-9, 1.0], num_replicas=50, seed=1)
+        self.assertTrue(
+            np.all(results[1e-9].weeks_until_everyone_met == 3))
+        self.assertEqual(0.0, results[1e-9].repeat_rate.max())
+        self.assertGreater(results[1.0].repeat_rate.max(), 0.0)
+
+    def test_invalid_gamma(self):
+        with self.assertRaises(ValueError):
+            simulate(4, 1, [0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
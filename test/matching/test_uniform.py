@@ -0,0 +1,91 @@
+import unittest
+from collections import Counter
+from datetime import datetime
+
+from networkx import connected_components
+from networkx import Graph
+
+from random1on1.api.pairings import Pairings
+from random1on1.matching.uniform import UniformMatchingAlgorithm
+
+
+def history_from_edges(edges):
+    return Pairings(pairing_graph=Graph(edges),
+                    date_of_pairing=datetime.now(),
+                    dry_run=False)
+
+
+def all_pairs(participants):
+    return [(i, j) for i in participants for j in participants if i < j]
+
+
+def groups_of(pairings):
+    return sorted(
+        sorted(group)
+        for group in connected_components(pairings.pairing_graph))
+
+
+class TestUniformMatchingAlgorithm(unittest.TestCase):
+
+    def test_generate_pairs_finds_the_only_perfect_matching(self):
+        """When the history leaves exactly one perfect matching, every seed finds it."""
+        participants = list(range(8))
+        matching = [(0, 1), (2, 3), (4, 5), (6, 7)]
+        history = [pair for pair in all_pairs(participants)
+                   if pair not in matching]
+        for seed in range(20):
+            algorithm = UniformMatchingAlgorithm(participants,
+                                                 history_from_edges(history),
+                                                 seed=seed)
+            pairings = algorithm.generate_pairs(dry_run=True)
+            self.assertEqual(groups_of(pairings),
+                             [list(pair) for pair in matching])
+
+    def test_generate_pairs_groups_three_for_odd_participants(self):
+        """An odd number of participants ends with everyone in pairs except for a single group of 3."""
+        participants = list(range(7))
+        for seed in range(20):
+            algorithm = UniformMatchingAlgorithm(participants,
+                                                 history_from_edges([]),
+                                                 seed=seed)
+            groups = groups_of(algorithm.generate_pairs(dry_run=True))
+            self.assertEqual(set(participants), set().union(*groups))
+            self.assertEqual(sorted(len(group) for group in groups),
+                             [2, 2, 3])
+
+    def test_generate_pairs_draws_perfect_matchings_uniformly(self):
+        """Without history, each of the 15 perfect matchings of 6 people is drawn about equally often and no one is left out."""
+        participants = list(range(6))
+        counts = Counter()
+        for seed in range(1500):
+            algorithm = UniformMatchingAlgorithm(participants,
+                                                 history_from_edges([]),
+                                                 seed=seed)
+            groups = groups_of(algorithm.generate_pairs(dry_run=True))
+            self.assertEqual([len(group) for group in groups], [2, 2, 2])
+            counts[tuple(map(tuple, groups))] += 1
+        self.assertEqual(len(counts), 15)
+        self.assertTrue(all(60 <= count <= 140 for count in counts.values()))
+
+    def test_generate_pairs_raises_when_stuck(self):
+        """
+        More than 3 people left without enough allowed pairs is still a dead end: both when no pair is allowed at all and when only a single pair
+        is left, which the algorithm does not draw.
+        """
+        participants = list(range(6))
+        algorithm = UniformMatchingAlgorithm(
+            participants, history_from_edges(all_pairs(participants)), seed=0)
+        with self.assertRaises(NotImplementedError):
+            algorithm.generate_pairs(dry_run=True)
+
+        participants = list(range(4))
+        history = [pair for pair in all_pairs(participants) if pair != (0, 1)]
+        algorithm = UniformMatchingAlgorithm(participants,
+                                             history_from_edges(history),
+                                             seed=0)
+        with self.assertRaises(NotImplementedError):
+            algorithm.generate_pairs(dry_run=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
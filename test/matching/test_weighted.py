@@ -0,0 +1,84 @@
+import unittest
+from datetime import datetime
+from datetime import timedelta
+
+from networkx import connected_components
+from networkx import Graph
+
+from random1on1.api.pairings import Pairings
+from random1on1.matching.weighted import WeightedMatchingAlgorithm
+
+
+def complete_history(participants, **edge_attributes):
+    graph = Graph()
+    for i in participants:
+        for j in participants:
+            if i < j:
+                graph.add_edge(i, j, **edge_attributes)
+    return Pairings(pairing_graph=graph,
+                    date_of_pairing=datetime.now(),
+                    dry_run=False)
+
+
+class TestWeightedMatchingAlgorithm(unittest.TestCase):
+
+    def assert_full_matching(self, participants, pairings):
+        groups = list(connected_components(pairings.pairing_graph))
+        self.assertEqual(set(participants), set().union(*groups))
+        self.assertEqual(len(groups), len(participants) // 2)
+
+    def test_full_matching_when_everyone_has_met(self):
+        """Where the uniform algorithm gives up, the weighted algorithm still matches everyone."""
+        for num_participants in [6, 7, 150]:
+            participants = list(range(num_participants))
+            algorithm = WeightedMatchingAlgorithm(
+                participants, complete_history(participants), seed=0)
+            self.assert_full_matching(participants,
+                                      algorithm.generate_pairs(dry_run=True))
+
+    def test_prefers_pairs_that_met_long_ago(self):
+        """Recent pairs are avoided in favour of pairs that met long ago, for both the exact and the local search solver."""
+        long_ago = datetime.now() - timedelta(weeks=156)
+        last_week = datetime.now() - timedelta(weeks=1)
+        for num_participants, exact_max_participants in [(8, 64), (200, 0)]:
+            participants = list(range(num_participants))
+            history = complete_history(participants,
+                                       meetings=1,
+                                       last_met=last_week)
+            for i in range(0, num_participants, 2):
+                history.pairing_graph.edges[i, i + 1]["last_met"] = long_ago
+            algorithm = WeightedMatchingAlgorithm(
+                participants,
+                history,
+                seed=1,
+                exact_max_participants=exact_max_participants)
+            pairings = algorithm.generate_pairs(dry_run=True)
+            self.assert_full_matching(participants, pairings)
+            for person_1, person_2 in pairings.pairing_graph.edges:
+                self.assertEqual(abs(person_1 - person_2), 1)
+
+    def test_zero_time_budget_falls_back_to_greedy(self):
+        """A zero time budget returns the greedy matching as is, for both the exact and the local search solver."""
+        for num_participants, exact_max_participants in [(500, 0), (20, 64)]:
+            participants = list(range(num_participants))
+            history = complete_history(participants[:10])
+
+            def algorithm():
+                return WeightedMatchingAlgorithm(
+                    participants,
+                    history,
+                    seed=2,
+                    time_budget=0.0,
+                    exact_max_participants=exact_max_participants)
+
+            pairings = algorithm().generate_pairs(dry_run=True)
+            self.assert_full_matching(participants, pairings)
+            greedy = algorithm().greedy_pairs()
+            self.assertEqual(
+                set(frozenset(group)
+                    for group in connected_components(pairings.pairing_graph)),
+                set(frozenset(participants[index] for index in pair)
+                    for pair in greedy))
+
+if __name__ == "__main__":
+    unittest.main()